@@ -0,0 +1,212 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+"""
+Benchmark the scan, generation and index stages of the sitemap generator
+against a synthetic namespace tree and store the results as JSON
+
+    python benchmarks/bench.py run --output before.json
+    python benchmarks/bench.py run --output after.json
+    python benchmarks/bench.py compare before.json after.json
+"""
+
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from synthetic import TreeSpec, make_namespace_tree
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.util import get_all_sitemap_sources
+
+STAGES = ("scan", "generate", "index")
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of the current process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def stage_scan(root: Path, output_dir: Path) -> tuple[float, int, str]:
+    start = time.perf_counter()
+    sources = get_all_sitemap_sources(root)
+    return time.perf_counter() - start, len(sources), "sources"
+
+
+def stage_generate(root: Path, output_dir: Path) -> tuple[float, int, str]:
+    handler = FileSystemHandler()
+    sources = get_all_sitemap_sources(root)
+    urls = 0
+    start = time.perf_counter()
+    for source in sources:
+        location = source.canonical_sitemap_name(root)
+        output_path = (output_dir / location).with_suffix(handler.sitemap_suffix)
+        urls += handler.write_sitemap(source, output_path).url_count
+    return time.perf_counter() - start, urls, "urls"
+
+
+def stage_index(root: Path, output_dir: Path) -> tuple[float, int, str]:
+    handler = FileSystemHandler()
+    sources = get_all_sitemap_sources(root)
+    start = time.perf_counter()
+    index = handler.make_sitemap_index("https://geoconnex.us", sources, root)
+    handler.write_sitemap_index(index, "https://geoconnex.us", output_dir)
+    root_element = index.getroot()
+    entries = len(root_element) if root_element is not None else 0
+    return time.perf_counter() - start, entries, "entries"
+
+
+STAGE_FUNCTIONS = {"scan": stage_scan, "generate": stage_generate, "index": stage_index}
+
+
+def run_stage(stage: str, root: str, work_dir: str) -> dict:
+    """Run a single stage; called in a fresh process so peak RSS is per stage"""
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        seconds, items, unit = STAGE_FUNCTIONS[stage](Path(root), Path(tmp))
+    return {
+        "seconds": seconds,
+        "items": items,
+        "unit": unit,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.group()
+def cli():
+    """Sitemap generator benchmarks"""
+
+
+@cli.command()
+@click.option("--namespaces", type=int, default=TreeSpec.namespaces)
+@click.option("--csvs-per-namespace", type=int, default=TreeSpec.csvs_per_namespace)
+@click.option("--csv-rows", type=int, default=TreeSpec.csv_rows)
+@click.option("--regex-ratio", type=float, default=TreeSpec.regex_ratio)
+@click.option("--xmls-per-namespace", type=int, default=TreeSpec.xmls_per_namespace)
+@click.option("--xml-urls", type=int, default=TreeSpec.xml_urls)
+@click.option("--seed", type=int, default=TreeSpec.seed)
+@click.option("--repeat", type=int, default=3, help="runs per stage; best is kept")
+@click.option(
+    "--stage", "stages", type=click.Choice(STAGES), multiple=True, default=STAGES
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="write the results as JSON to this file",
+)
+def run(repeat: int, stages: tuple[str, ...], output: Path | None, **spec_options):
+    """Benchmark each stage against a freshly generated synthetic tree"""
+    spec = TreeSpec(**spec_options)
+    context = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "namespaces"
+        summary = make_namespace_tree(root, spec)
+
+        results = {}
+        for stage in stages:
+            runs = []
+            for _ in range(repeat):
+                with context.Pool(1) as pool:
+                    runs.append(pool.apply(run_stage, (stage, str(root), tmp)))
+            best = min(runs, key=lambda r: r["seconds"])
+            throughput = best["items"] / best["seconds"] if best["seconds"] else 0.0
+            results[stage] = {
+                "seconds": round(best["seconds"], 6),
+                "items": best["items"],
+                "unit": best["unit"],
+                "items_per_second": round(throughput, 1),
+                "peak_rss_bytes": max(r["peak_rss_bytes"] for r in runs),
+            }
+            click.echo(
+                f"{stage:>9}: {best['seconds']:.3f}s  "
+                f"{throughput:,.0f} {best['unit']}/s  "
+                f"peak rss {results[stage]['peak_rss_bytes'] / 2**20:.1f} MiB"
+            )
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "spec": spec.as_dict(),
+        "tree": summary.__dict__,
+        "stages": results,
+    }
+    if output:
+        output.write_text(json.dumps(report, indent=2))
+
+
+@cli.command()
+@click.argument("baseline", type=click.Path(exists=True, path_type=Path))
+@click.argument("candidate", type=click.Path(exists=True, path_type=Path))
+def compare(baseline: Path, candidate: Path):
+    """Compare two JSON result files stage by stage"""
+    old = json.loads(baseline.read_text())
+    new = json.loads(candidate.read_text())
+    if old["spec"] != new["spec"]:
+        click.echo("warning: results were produced from different tree specs")
+
+    click.echo(f"{'stage':>9}  {'seconds':>23}  {'peak rss MiB':>23}")
+    for stage in STAGES:
+        if stage not in old["stages"] or stage not in new["stages"]:
+            continue
+        a, b = old["stages"][stage], new["stages"][stage]
+        time_change = (b["seconds"] - a["seconds"]) / a["seconds"] * 100
+        rss_a, rss_b = a["peak_rss_bytes"] / 2**20, b["peak_rss_bytes"] / 2**20
+        rss_change = (rss_b - rss_a) / rss_a * 100
+        click.echo(
+            f"{stage:>9}  {a['seconds']:7.3f} -> {b['seconds']:7.3f} "
+            f"{time_change:+5.0f}%  {rss_a:7.1f} -> {rss_b:7.1f} {rss_change:+5.0f}%"
+        )
+
+
+if __name__ == "__main__":
+    cli()
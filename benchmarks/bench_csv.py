@@ -0,0 +1,108 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+"""
+Compare the throughput of the csv readers on a synthetic one_to_one csv,
+either unquoted or with every field quoted like the reference csvs
+
+    python benchmarks/bench_csv.py --rows 2000000
+    python benchmarks/bench_csv.py --rows 2000000 --quoted
+"""
+
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import click
+from synthetic import write_one_to_one_csv
+
+from sitemap_generator.csv_reader import (
+    iter_column_batches,
+    iter_ids_and_rows,
+    pyarrow_available,
+)
+from sitemap_generator.util import csv_to_sitemap_url_list
+
+
+def count_url_list(path: Path) -> int:
+    return sum(1 for _ in csv_to_sitemap_url_list(path))
+
+
+def count_id_and_row(path: Path) -> int:
+    return sum(1 for _ in iter_ids_and_rows(path))
+
+
+def count_batches(batches: Iterator[list[str]]) -> int:
+    return sum(len(batch) for batch in batches)
+
+
+READERS: dict[str, Callable[[Path], int]] = {
+    "csv_to_sitemap_url_list": count_url_list,
+    "iter_ids_and_rows": count_id_and_row,
+    "iter_column (python)": lambda path: count_batches(
+        iter_column_batches(path, "id", backend="python")
+    ),
+}
+if pyarrow_available():
+    READERS["iter_column (pyarrow)"] = lambda path: count_batches(
+        iter_column_batches(path, "id", backend="pyarrow")
+    )
+
+
+@click.command()
+@click.option("--rows", type=int, default=1_000_000)
+@click.option("--repeat", type=int, default=3, help="runs per reader; best is kept")
+@click.option("--quoted", is_flag=True, help="quote every field")
+def main(rows: int, repeat: int, quoted: bool):
+    """Time every csv reader reading the id column of the same file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "source.csv"
+        write_one_to_one_csv(path, "namespace_0", rows, quoted)
+        size = path.stat().st_size
+        quoting = "quoted" if quoted else "unquoted"
+        click.echo(f"{rows:,} {quoting} rows, {size / 2**20:.1f} MiB")
+
+        baseline = None
+        for name, reader in READERS.items():
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                assert reader(path) == rows
+                best = min(best, time.perf_counter() - start)
+            baseline = baseline or best
+            click.echo(
+                f"{name:>24}: {best:.3f}s  {rows / best:,.0f} rows/s  "
+                f"{size / best / 2**20:,.0f} MiB/s  {baseline / best:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
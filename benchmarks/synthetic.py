@@ -0,0 +1,145 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+"""Generate synthetic namespace trees for benchmarking"""
+
+import json
+import random
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+URLSET_OPEN = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+
+
+@dataclass
+class TreeSpec:
+    """Shape of a synthetic namespace tree"""
+
+    namespaces: int = 20
+    csvs_per_namespace: int = 4
+    csv_rows: int = 10_000
+    regex_ratio: float = 0.25
+    xmls_per_namespace: int = 1
+    xml_urls: int = 5_000
+    seed: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class TreeSummary:
+    csv_files: int = 0
+    regex_csv_files: int = 0
+    xml_files: int = 0
+    urls: int = 0
+    bytes: int = 0
+
+
+def write_regex_csv(path: Path, namespace: str) -> None:
+    path.write_text(
+        "id,target,creator,description\n"
+        f"https://geoconnex.us/{namespace}/(.*),https://example.com/{namespace}/$1,"
+        "bench@example.com,regex redirect\n"
+    )
+
+
+def write_one_to_one_csv(
+    path: Path, namespace: str, rows: int, quoted: bool = False
+) -> None:
+    # quoted writes every field in double quotes, like the reference csvs
+    q = '"' if quoted else ""
+    with open(path, "w") as f:
+        f.write(f"{q}id{q},{q}target{q},{q}creator{q},{q}description{q}\n")
+        f.writelines(
+            f"{q}https://geoconnex.us/{namespace}/{path.stem}/{row}{q},"
+            f"{q}https://example.com/{namespace}/items/{row}{q},"
+            f"{q}bench@example.com{q},{q}synthetic feature {row}{q}\n"
+            for row in range(rows)
+        )
+
+
+def write_pregenerated_xml(path: Path, namespace: str, urls: int) -> None:
+    with open(path, "w") as f:
+        f.write(URLSET_OPEN)
+        f.writelines(
+            "<url>\n"
+            f"    <loc>https://geoconnex.us/{namespace}/{path.stem}/{url}</loc>\n"
+            "    <lastmod>2024-01-01T00:00:00Z</lastmod>\n"
+            "</url>"
+            for url in range(urls)
+        )
+        f.write("</urlset>")
+
+
+def make_namespace_tree(root: Path, spec: TreeSpec) -> TreeSummary:
+    """
+    Create a namespace tree below `root` laid out like the geoconnex
+    namespaces repository: one directory per dataset holding a
+    metadata.json plus its csv and xml sources
+    """
+    summary = TreeSummary()
+
+    # spread an exact share of regex csvs randomly across the tree
+    total_csvs = spec.namespaces * spec.csvs_per_namespace
+    regex_csvs = round(total_csvs * spec.regex_ratio)
+    is_regex = [True] * regex_csvs + [False] * (total_csvs - regex_csvs)
+    random.Random(spec.seed).shuffle(is_regex)
+
+    for n in range(spec.namespaces):
+        namespace = f"namespace_{n}"
+        directory = root / namespace / f"dataset_{n}"
+        directory.mkdir(parents=True)
+        (directory / "metadata.json").write_text(
+            json.dumps({"contact_email": f"{namespace}@example.com"})
+        )
+
+        for i in range(spec.csvs_per_namespace):
+            path = directory / f"source_{i}.csv"
+            if is_regex[n * spec.csvs_per_namespace + i]:
+                write_regex_csv(path, namespace)
+                summary.regex_csv_files += 1
+            else:
+                write_one_to_one_csv(path, namespace, spec.csv_rows)
+                summary.urls += spec.csv_rows
+            summary.csv_files += 1
+            summary.bytes += path.stat().st_size
+
+        for i in range(spec.xmls_per_namespace):
+            path = directory / f"links_{i}.xml"
+            write_pregenerated_xml(path, namespace, spec.xml_urls)
+            summary.xml_files += 1
+            summary.urls += spec.xml_urls
+            summary.bytes += path.stat().st_size
+
+    return summary
@@ -32,7 +32,23 @@ __version__ = "0.3.0"
 
 import click
 
+from sitemap_generator.catalog import IndexEntry, SitemapCatalog, SourceInfo
+from sitemap_generator.duplicates import duplicates
 from sitemap_generator.handler import run
+from sitemap_generator.plan import plan
+from sitemap_generator.resolve import resolve
+from sitemap_generator.resolve.resolver import PidResolver
+from sitemap_generator.serve import serve
+from sitemap_generator.shard import merge_index
+from sitemap_generator.watch import watch
+
+__all__ = [
+    "IndexEntry",
+    "PidResolver",
+    "SitemapCatalog",
+    "SourceInfo",
+    "cli",
+]
 
 
 @click.group()
@@ -43,3 +59,9 @@ def cli():
 
 
 cli.add_command(run)
+cli.add_command(serve)
+cli.add_command(resolve)
+cli.add_command(duplicates)
+cli.add_command(watch)
+cli.add_command(plan)
+cli.add_command(merge_index)
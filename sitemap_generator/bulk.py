@@ -0,0 +1,205 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Stream the pids of a bulk source from a local dump. A bulk directory's
+metadata.json names the dump with `bulk_dump`, relative to the directory,
+and says where the pid of each record is:
+
+    "bulk_dump": "gnis.ndjson.gz",
+    "bulk_pid_field": "uri",
+    "bulk_pid_pattern": "^https://geoconnex.us/usgs/gnis/"
+
+Dumps are NDJSON, CSV or N-Triples, optionally gzip compressed, and are
+read one record at a time so memory use does not depend on their size
+"""
+
+import csv
+import gzip
+import json
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Literal
+
+if TYPE_CHECKING:
+    from sitemap_generator.util import SitemapSourceWithMetadata
+
+DumpFormat = Literal["ndjson", "csv", "ntriples"]
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# formats guessed from the suffix of the dump, ignoring a trailing .gz
+DUMP_SUFFIXES: dict[str, DumpFormat] = {
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+    ".nt": "ntriples",
+}
+
+DEFAULT_PID_FIELD = "id"
+
+# metadata.json keys that configure the dump rather than describe the source
+BULK_DUMP_KEYS = frozenset(
+    ("bulk_dump", "bulk_dump_format", "bulk_pid_field", "bulk_pid_pattern")
+)
+
+
+@dataclass
+class BulkDump:
+    """Where a bulk source's dump is and how to find the pids in it"""
+
+    path: Path
+    format: DumpFormat
+    pid_field: str = DEFAULT_PID_FIELD
+    pid_pattern: re.Pattern | None = None
+
+    @classmethod
+    def from_metadata(cls, metadata: dict, directory: Path) -> "BulkDump | None":
+        """
+        Read the dump settings of a bulk directory, or `None` if its
+        metadata names no dump
+
+        :raises ValueError: if the format is unknown or can't be guessed,
+            or the pid pattern is not a valid regular expression
+        """
+        dump = metadata.get("bulk_dump")
+        if not dump:
+            return None
+        path = directory / dump
+        dump_format = metadata.get("bulk_dump_format")
+        if dump_format is None:
+            suffixes = path.suffixes
+            if suffixes and suffixes[-1] == ".gz":
+                suffixes = suffixes[:-1]
+            dump_format = DUMP_SUFFIXES.get(suffixes[-1] if suffixes else "")
+        if dump_format not in ("ndjson", "csv", "ntriples"):
+            raise ValueError(
+                f"Can't tell the format of bulk dump {path}; set bulk_dump_format "
+                "to ndjson, csv or ntriples"
+            )
+        pattern = metadata.get("bulk_pid_pattern")
+        try:
+            compiled = re.compile(pattern) if pattern else None
+        except re.error as e:
+            raise ValueError(f"Invalid bulk_pid_pattern {pattern!r}: {e}") from None
+        return cls(
+            path,
+            dump_format,
+            metadata.get("bulk_pid_field", DEFAULT_PID_FIELD),
+            compiled,
+        )
+
+    def open(self) -> IO[str]:
+        """Open the dump as text, decompressing it if it is gzip compressed"""
+        with open(self.path, "rb") as f:
+            compressed = f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+        if compressed:
+            return gzip.open(self.path, "rt", encoding="utf-8", newline="")
+        return open(self.path, encoding="utf-8", newline="")
+
+    def iter_pids(self) -> Iterator[str]:
+        """
+        Yield the pid of every record in the dump. With a pid pattern,
+        values that don't match it are skipped, and if it has a group the
+        pid is its first group. Repeats of the previous pid, like the
+        triples of one subject, are dropped
+        """
+        with self.open() as f:
+            yield from self.pids_in(f)
+
+    def pids_in(self, lines: Iterable[str]) -> Iterator[str]:
+        """Yield the pids of the records in `lines` of the dump"""
+        previous = None
+        for value in self._iter_values(lines):
+            if self.pid_pattern:
+                match = self.pid_pattern.search(value)
+                if not match:
+                    continue
+                if self.pid_pattern.groups:
+                    value = match.group(1)
+            if value and value != previous:
+                yield value
+            previous = value
+
+    def _iter_values(self, lines: Iterable[str]) -> Iterator[str]:
+        match self.format:
+            case "ndjson":
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    value = json.loads(line).get(self.pid_field)
+                    if value is not None:
+                        yield str(value)
+            case "csv":
+                reader = csv.reader(lines)
+                header = next(reader, None)
+                if header is None:
+                    return
+                try:
+                    index = header.index(self.pid_field)
+                except ValueError:
+                    raise ValueError(
+                        f"Bulk dump {self.path} has no {self.pid_field} column"
+                    ) from None
+                for row in reader:
+                    if len(row) > index:
+                        yield row[index]
+            case "ntriples":
+                for line in lines:
+                    # the pid is the subject; blank nodes and comments have none
+                    if line.startswith("<"):
+                        end = line.find(">")
+                        if end > 0:
+                            yield line[1:end]
+
+
+def source_dump(source: "SitemapSourceWithMetadata") -> BulkDump | None:
+    """The dump a source is generated from, if it is a bulk source with one"""
+    if source.file_type != "bulk":
+        return None
+    return BulkDump.from_metadata(source.metadata, source.path.parent)
+
+
+def count_dump_records(path: Path, block_size: int = 1024 * 1024) -> int:
+    """
+    Count the lines of a possibly compressed dump without parsing it, an
+    upper bound on the number of pids in it
+    """
+    with open(path, "rb") as f:
+        compressed = f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    lines = 0
+    last = b"\n"
+    with gzip.open(path, "rb") if compressed else open(path, "rb") as f:
+        while block := f.read(block_size):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines + (last != b"\n")
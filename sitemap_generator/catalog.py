@@ -0,0 +1,380 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Library interface for producing sitemaps in process, without writing to
+disk. A `SitemapCatalog` describes the sources of a namespace directory
+as plain data and renders the index and every sitemap either as an
+iterator of byte chunks or into any binary file-like object:
+
+    catalog = SitemapCatalog(Path("namespaces"), "https://geoconnex.us")
+    for source in catalog.sources():
+        for page in range(source.pages):
+            with open(f"{source.name}__{page}.xml", "wb") as f:
+                catalog.write_sitemap(source.name, f, page)
+
+    for chunk in catalog.iter_index():
+        response.write(chunk)
+
+Sitemaps are streamed a batch of urls at a time, so memory use depends on
+the page size rather than the size of the source. The index is built from
+one entry per page of every source and is held in memory while it is
+serialized
+"""
+
+import datetime
+import io
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import BinaryIO, Literal
+from xml.etree import ElementTree as ET
+
+from sitemap_generator.bulk import source_dump
+from sitemap_generator.csv_reader import iter_column
+from sitemap_generator.handler.base import SITEMAPINDEX, FileSystemHandler
+from sitemap_generator.util import (
+    SitemapSourceWithMetadata,
+    get_all_sitemap_sources,
+    write_tree,
+)
+from sitemap_generator.writer import (
+    MAX_SITEMAP_BYTES,
+    MAX_URLS_PER_SITEMAP,
+    SITEMAP_NS,
+    URLSET_FOOTER,
+    URLSET_HEADER,
+    count_urlset_entries,
+    iter_urlset_entries,
+    scan_url_entry_count,
+    shard_starts,
+    url_entry,
+)
+
+# urls serialized per chunk of a streamed sitemap
+URLS_PER_CHUNK = 1000
+FILE_CHUNK_SIZE = 64 * 1024
+
+# file types rendered page by page without building a tree
+PAGED_FILE_TYPES = ("one_to_one_csv", "pregenerated_xml")
+
+
+@dataclass
+class SourceInfo:
+    """A source in the namespace directory that has a sitemap"""
+
+    name: str
+    path: Path
+    file_type: str
+    last_modified: datetime.datetime
+    metadata: dict = field(default_factory=dict)
+    pages: int = 1
+    # the files the sitemap is rendered from: the source itself and, for a
+    # bulk source, its dump
+    inputs: list[Path] = field(default_factory=list)
+
+
+@dataclass
+class IndexEntry:
+    """One `<sitemap>` entry of the sitemap index"""
+
+    loc: str
+    lastmod: str
+    sitemap_id: str
+    source: str
+    page: int | None = None
+    metadata: dict[str, str] = field(default_factory=dict)
+
+
+class SitemapCatalog:
+    """
+    Sources of a namespace directory and the sitemaps rendered from them.
+    Sources with more than `max_urls_per_sitemap` urls or
+    `max_sitemap_bytes` bytes are split into pages exactly like the shards
+    `run` writes. In the index, pages are addressed like those files
+    (`name__N.xml`) or, with `page_urls="query"`, as `name.xml?page=N`
+    """
+
+    def __init__(
+        self,
+        namespace_input_dir: Path,
+        uri_base: str = "https://geoconnex.us",
+        max_urls_per_sitemap: int = MAX_URLS_PER_SITEMAP,
+        verify_pregenerated_xml: bool = True,
+        page_urls: Literal["shard", "query"] = "shard",
+        max_sitemap_bytes: int = MAX_SITEMAP_BYTES,
+    ):
+        self.namespace_input_dir = namespace_input_dir
+        self.uri_base = uri_base
+        self.page_urls = page_urls
+        self.handler = FileSystemHandler(
+            max_urls_per_sitemap=max_urls_per_sitemap,
+            max_sitemap_bytes=max_sitemap_bytes,
+            verify_pregenerated_xml=verify_pregenerated_xml,
+        )
+        self._sources: dict[str, SitemapSourceWithMetadata] = {}
+        # url count and page starts, keyed on the file they were read from
+        self._pages: dict[tuple[Path, int, int], tuple[int, list[int]]] = {}
+
+    @property
+    def max_urls_per_sitemap(self) -> int:
+        return self.handler.max_urls_per_sitemap
+
+    @property
+    def max_sitemap_bytes(self) -> int:
+        return self.handler.max_sitemap_bytes
+
+    def refresh(self) -> None:
+        """Rescan the namespace directory"""
+        self._sources = {
+            source.canonical_sitemap_name(self.namespace_input_dir): source
+            for source in get_all_sitemap_sources(self.namespace_input_dir)
+            if source.file_type != "regex_csv"
+            and not source.metadata.get("skip_crawling")
+        }
+
+    def sources(self) -> list[SourceInfo]:
+        """
+        Rescan the namespace directory and describe every source that has
+        a sitemap, in index order
+
+        :returns: `list` of `SourceInfo`
+        """
+        self.refresh()
+        return [self._info(name, source) for name, source in self._sources.items()]
+
+    def source(self, name: str) -> SourceInfo | None:
+        """Look up a source by sitemap name, rescanning if it is not known"""
+        source = self._find(name)
+        return self._info(name, source) if source else None
+
+    def _find(self, name: str) -> SitemapSourceWithMetadata | None:
+        source = self._sources.get(name)
+        if source is None or not source.path.exists():
+            self.refresh()
+            source = self._sources.get(name)
+        return source
+
+    def _info(self, name: str, source: SitemapSourceWithMetadata) -> SourceInfo:
+        dump = source_dump(source)
+        return SourceInfo(
+            name=name,
+            path=source.path,
+            file_type=source.file_type,
+            last_modified=source.last_modified,
+            metadata=source.metadata,
+            pages=self.page_count(source),
+            inputs=[source.path, dump.path] if dump else [source.path],
+        )
+
+    def url_count(self, source: SitemapSourceWithMetadata) -> int:
+        """Count the urls of a paged source, cached until it changes"""
+        return self._paginate(source)[0]
+
+    def page_starts(self, source: SitemapSourceWithMetadata) -> list[int]:
+        """
+        Index of the first url of every page of a source, split at the url
+        count and byte limits like the shards `run` writes
+
+        :returns: `list` with one entry per page
+        """
+        if source.file_type not in PAGED_FILE_TYPES and not source_dump(source):
+            return [0]
+        return self._paginate(source)[1]
+
+    def page_count(self, source: SitemapSourceWithMetadata) -> int:
+        return len(self.page_starts(source))
+
+    def _paginate(self, source: SitemapSourceWithMetadata) -> tuple[int, list[int]]:
+        dump = source_dump(source)
+        path = dump.path if dump else source.path
+        stat = path.stat()
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key in self._pages:
+            return self._pages[key]
+
+        count = None
+        if source.file_type == "pregenerated_xml" and not dump:
+            if self.handler.verify_pregenerated_xml:
+                count = count_urlset_entries(source.path)
+            else:
+                count = scan_url_entry_count(source.path)
+        if (
+            count is not None
+            and count <= self.max_urls_per_sitemap
+            and stat.st_size <= self.max_sitemap_bytes
+        ):
+            # copied as is by `run`
+            pages = (count, [0])
+        else:
+            counted = 0
+
+            def sizes() -> Iterator[int]:
+                nonlocal counted
+                for entry in self._entries(source):
+                    counted += 1
+                    yield len(entry)
+
+            starts = shard_starts(
+                sizes(), self.max_urls_per_sitemap, self.max_sitemap_bytes
+            )
+            pages = (counted, starts)
+        self._pages[key] = pages
+        return pages
+
+    def _entries(self, source: SitemapSourceWithMetadata) -> Iterator[bytes]:
+        """Serialized `<url>` entries of a paged source"""
+        dump = source_dump(source)
+        if dump:
+            return map(url_entry, dump.iter_pids())
+        if source.file_type == "one_to_one_csv":
+            return map(url_entry, iter_column(source.path, "id"))
+        return iter_urlset_entries(source.path)
+
+    def sitemap_url(self, name: str, page: int | None = None) -> str:
+        if page is None:
+            return f"{self.uri_base}/sitemap/{name}.xml"
+        if self.page_urls == "query":
+            return f"{self.uri_base}/sitemap/{name}.xml?page={page}"
+        return f"{self.uri_base}/sitemap/{name}__{page}.xml"
+
+    def _index_elements(
+        self, sources: list[SourceInfo] | None = None
+    ) -> Iterator[tuple[str, int | None, ET.Element]]:
+        for info in self.sources() if sources is None else sources:
+            source = self._sources[info.name]
+            for page in range(info.pages) if info.pages > 1 else [None]:
+                element = source.source_to_xml_for_index(
+                    self.uri_base, self.namespace_input_dir, shard=page
+                )
+                loc = element.find(f"{{{SITEMAP_NS}}}loc")
+                assert loc is not None
+                loc.text = self.sitemap_url(info.name, page)
+                ET.indent(element, space="  ")
+                yield info.name, page, element
+
+    def index_entries(
+        self, sources: list[SourceInfo] | None = None
+    ) -> list[IndexEntry]:
+        """
+        Describe every entry of the sitemap index as plain data. `sources`
+        may be passed to reuse the result of an earlier `sources()` call
+        instead of rescanning
+
+        :returns: `list` of `IndexEntry`
+        """
+        entries = []
+        for name, page, element in self._index_elements(sources):
+            values = {child.tag.split("}", 1)[1]: child.text or "" for child in element}
+            entries.append(
+                IndexEntry(
+                    loc=values.pop("loc"),
+                    lastmod=values.pop("lastmod"),
+                    sitemap_id=values.pop("sitemap_id"),
+                    source=name,
+                    page=page,
+                    metadata=values,
+                )
+            )
+        return entries
+
+    def iter_index(self, sources: list[SourceInfo] | None = None) -> Iterator[bytes]:
+        """Render the sitemap index, from `sources` if they are given"""
+        xml_root = ET.fromstring(SITEMAPINDEX)
+        xml_root.extend(element for _, _, element in self._index_elements(sources))
+        buffer = io.BytesIO()
+        write_tree(ET.ElementTree(xml_root), buffer)
+        yield buffer.getvalue()
+
+    def iter_sitemap(self, name: str, page: int = 0) -> Iterator[bytes]:
+        """
+        Render one page of the sitemap of a source as byte chunks. Only the
+        urls of the requested page are serialized
+
+        :raises KeyError: if there is no source with that name
+        :raises IndexError: if the source has no such page
+        """
+        source = self._find(name)
+        if source is None:
+            raise KeyError(name)
+        starts = self.page_starts(source)
+        if not 0 <= page < len(starts):
+            raise IndexError(f"{name} has {len(starts)} pages")
+        return self._iter_sitemap(source, page, starts)
+
+    def _iter_sitemap(
+        self, source: SitemapSourceWithMetadata, page: int, starts: list[int]
+    ) -> Iterator[bytes]:
+        if source.file_type == "pregenerated_xml" and len(starts) == 1:
+            with open(source.path, "rb") as f:
+                while chunk := f.read(FILE_CHUNK_SIZE):
+                    yield chunk
+            return
+
+        if source.file_type in PAGED_FILE_TYPES or source_dump(source):
+            stop = starts[page + 1] if page + 1 < len(starts) else None
+            entries = islice(self._entries(source), starts[page], stop)
+
+            yield URLSET_HEADER
+            while batch := list(islice(entries, URLS_PER_CHUNK)):
+                yield b"".join(batch)
+            yield URLSET_FOOTER
+            return
+
+        buffer = io.BytesIO()
+        write_tree(self.handler.make_sitemap(source), buffer)
+        yield buffer.getvalue()
+
+    def write_sitemap(self, name: str, f: BinaryIO, page: int = 0) -> int:
+        """
+        Write one page of the sitemap of a source to a binary file-like
+        object
+
+        :returns: `int` number of bytes written
+        """
+        return write_chunks(self.iter_sitemap(name, page), f)
+
+    def write_index(self, f: BinaryIO) -> int:
+        """
+        Write the sitemap index to a binary file-like object
+
+        :returns: `int` number of bytes written
+        """
+        return write_chunks(self.iter_index(), f)
+
+
+def write_chunks(chunks: Iterator[bytes], f: BinaryIO) -> int:
+    written = 0
+    for chunk in chunks:
+        f.write(chunk)
+        written += len(chunk)
+    return written
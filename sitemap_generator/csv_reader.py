@@ -0,0 +1,375 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Read a single column from large csvs without building a list for every
+row. The file is mapped into memory and split into blocks on newline
+boundaries. Blocks whose rows are unquoted, or quote every field without
+quotes or newlines inside it as geoconnex csvs do, are split with plain
+string operations, which is several times faster than `csv.reader`. From
+the first block with any other quoting or a bare carriage return the rest
+of the file is handed to the `csv` module, so escaped quotes and
+multi-line fields are still read correctly. pyarrow is used instead when
+it is installed.
+
+Large files can also be split into byte ranges on row boundaries, which
+are then read independently of each other
+"""
+
+import csv
+import io
+import logging
+import mmap
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Literal
+
+LOGGER = logging.getLogger(__name__)
+
+BLOCK_SIZE = 4 * 1024 * 1024
+
+# rows per batch once a file has fallen back to the csv module
+FALLBACK_BATCH_SIZE = 10_000
+
+# how far past a split point to look for the end of a row before giving up
+# on splitting a file
+MAX_ROW_BYTES = 1024 * 1024
+
+ByteRange = tuple[int, int]
+
+Backend = Literal["auto", "python", "pyarrow"]
+
+
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def iter_column(
+    path: Path, column: str, block_size: int = BLOCK_SIZE, backend: Backend = "auto"
+) -> Iterator[str]:
+    """Yield the value of `column` for every row of a csv"""
+    for batch in iter_column_batches(path, column, block_size, backend):
+        yield from batch
+
+
+def iter_column_batches(
+    path: Path,
+    column: str,
+    block_size: int = BLOCK_SIZE,
+    backend: Backend = "auto",
+    byte_range: ByteRange | None = None,
+) -> Iterator[list[str]]:
+    """
+    Yield the values of `column` for the rows of a csv in batches. Blank
+    lines are skipped. With the `auto` backend pyarrow is used when it is
+    installed, otherwise the pure python reader. With `byte_range`, from
+    `record_ranges`, only the rows in that range are read, always with the
+    python reader
+
+    :raises ValueError: if the csv has no such column
+    """
+    return _iter_batches(path, (column,), block_size, backend, byte_range=byte_range)
+
+
+def iter_columns_batches(
+    path: Path,
+    columns: Sequence[str],
+    block_size: int = BLOCK_SIZE,
+    backend: Backend = "auto",
+) -> Iterator[list[tuple[str, ...]]]:
+    """
+    Same as `iter_column_batches` but yield a tuple with the values of
+    each of `columns` for every row
+
+    :raises ValueError: if the csv is missing one of the columns
+    """
+    return _iter_batches(path, tuple(columns), block_size, backend, as_tuples=True)
+
+
+def _iter_batches(
+    path: Path,
+    columns: tuple[str, ...],
+    block_size: int,
+    backend: Backend,
+    as_tuples: bool = False,
+    byte_range: ByteRange | None = None,
+) -> Iterator[list]:
+    if byte_range is None and (
+        backend == "pyarrow" or (backend == "auto" and pyarrow_available())
+    ):
+        return _iter_pyarrow(path, columns, block_size, as_tuples)
+    return _iter_python(path, columns, block_size, as_tuples, byte_range)
+
+
+def read_header(path: Path) -> tuple[list[str], int]:
+    """
+    :returns: `tuple` of the column names of a csv and the offset of its
+        first row
+    """
+    with open(path, "rb") as f:
+        line = f.readline()
+    if not line:
+        raise ValueError(f"{path} has no header row")
+    return next(csv.reader([line.decode("utf-8")])), len(line)
+
+
+def _count_quotes(data: mmap.mmap, start: int, end: int, block_size: int) -> int:
+    return sum(
+        data[position : min(position + block_size, end)].count(b'"')
+        for position in range(start, end, block_size)
+    )
+
+
+def record_ranges(
+    path: Path, range_size: int, block_size: int = BLOCK_SIZE
+) -> list[ByteRange] | None:
+    """
+    Split the rows of a csv into consecutive byte ranges of about
+    `range_size` bytes that start and end on row boundaries. A newline
+    only ends a row if an even number of quotes precede it, so quoted
+    fields that contain newlines are never split
+
+    :returns: `list` of `(start, end)` offsets covering every row, or
+        `None` if no row ends within `MAX_ROW_BYTES` of a split point, as
+        happens with unbalanced quotes; such files have to be read whole
+    """
+    _, header_end = read_header(path)
+    with open(path, "rb") as f:
+        size = f.seek(0, io.SEEK_END)
+        if size <= header_end:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            ranges: list[ByteRange] = []
+            start = position = header_end
+            # whether `position` is inside a quoted field
+            quoted = False
+            while size - start > range_size:
+                target = start + range_size
+                quoted ^= bool(_count_quotes(data, position, target, block_size) % 2)
+                position = target
+                limit = min(target + MAX_ROW_BYTES, size)
+                while True:
+                    newline = data.find(b"\n", position, limit)
+                    if newline == -1:
+                        if limit < size:
+                            return None
+                        # the last row runs to the end of the file
+                        position = size
+                        break
+                    quoted ^= bool(data[position:newline].count(b'"') % 2)
+                    position = newline + 1
+                    if not quoted:
+                        break
+                if position >= size:
+                    break
+                ranges.append((start, position))
+                start = position
+            ranges.append((start, size))
+    return ranges
+
+
+def iter_rows(path: Path, byte_range: ByteRange | None = None) -> Iterator[list[str]]:
+    """
+    Yield every row of a csv after the header as parsed by the `csv`
+    module, or only the rows in `byte_range`. Blank lines are skipped
+    """
+    _, header_end = read_header(path)
+    with open(path, "rb") as f:
+        start, end = byte_range or (header_end, f.seek(0, io.SEEK_END))
+        f.seek(start)
+        text = io.TextIOWrapper(
+            io.BufferedReader(_RangeReader(f, end)), encoding="utf-8", newline=""
+        )
+        for row in csv.reader(text):
+            if row:
+                yield row
+
+
+def iter_ids_and_rows(
+    path: Path, byte_range: ByteRange | None = None, column: str = "id"
+) -> Iterator[tuple[str, list[str]]]:
+    """
+    Yield the value of `column` in every row of a csv, or of the rows in
+    `byte_range`, along with the whole row. Blank lines are skipped
+    """
+    index = read_header(path)[0].index(column)
+    for row in iter_rows(path, byte_range):
+        yield row[index], row
+
+
+def _iter_pyarrow(
+    path: Path, columns: tuple[str, ...], block_size: int, as_tuples: bool
+) -> Iterator[list]:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=list(columns),
+            column_types={column: pa.string() for column in columns},
+        ),
+    )
+    for batch in reader:
+        values = [batch.column(column).to_pylist() for column in columns]
+        yield list(zip(*values)) if as_tuples else values[0]
+
+
+def _iter_python(
+    path: Path,
+    columns: tuple[str, ...],
+    block_size: int,
+    as_tuples: bool,
+    byte_range: ByteRange | None = None,
+) -> Iterator[list]:
+    header, header_end = read_header(path)
+    indexes = [header.index(column) for column in columns]
+    split_block = _split_block_tuples if as_tuples else _split_block
+    with open(path, "rb") as f:
+        size = f.seek(0, io.SEEK_END)
+        position, stop = byte_range or (header_end, size)
+        if position >= stop:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            while position < stop:
+                end = data.find(b"\n", position + block_size, stop)
+                end = stop if end == -1 else end + 1
+                block = data[position:end]
+                if b"\r" in block.replace(b"\r\n", b""):
+                    rows = None
+                elif b'"' not in block:
+                    rows = split_block(block.decode("utf-8"), indexes)
+                else:
+                    rows = _split_quoted_block(
+                        block.decode("utf-8"), indexes, len(header), as_tuples
+                    )
+                if rows is None:
+                    LOGGER.debug(f"Falling back to the csv module for {path}")
+                    f.seek(position)
+                    reader = io.BufferedReader(_RangeReader(f, stop))
+                    yield from _iter_csv_module(reader, indexes, as_tuples)
+                    return
+                yield rows
+                position = end
+
+
+def _split_block(text: str, indexes: list[int]) -> list[str]:
+    (index,) = indexes
+    lines = text.replace("\r\n", "\n").split("\n")
+    if index == 0:
+        return [line.partition(",")[0] for line in lines if line]
+    return [line.split(",", index + 1)[index] for line in lines if line]
+
+
+def _split_block_tuples(text: str, indexes: list[int]) -> list[tuple[str, ...]]:
+    lines = text.replace("\r\n", "\n").split("\n")
+    last = max(indexes)
+    rows = []
+    for line in lines:
+        if line:
+            fields = line.split(",", last + 1)
+            rows.append(tuple(fields[index] for index in indexes))
+    return rows
+
+
+def _split_quoted_block(
+    text: str, indexes: list[int], columns: int, as_tuples: bool
+) -> list | None:
+    """
+    Split a block whose rows either have no quotes or quote every one of
+    their `columns` fields, with no quote or newline inside a field. Such a
+    row holds exactly two quotes per field, all of them next to a separator
+    or at an end of the line
+
+    :returns: `list` of values, or `None` if a row is quoted any other way
+    """
+    quotes = 2 * columns
+    last = max(indexes)
+    values: list = []
+    for line in text.replace("\r\n", "\n").split("\n"):
+        if not line:
+            continue
+        if '"' not in line:
+            fields = line.split(",", last + 1)
+        elif line[0] == line[-1] == '"' and line.count('"') == quotes:
+            fields = line[1:-1].split('","')
+            if len(fields) != columns:
+                return None
+        else:
+            return None
+        if as_tuples:
+            values.append(tuple(fields[index] for index in indexes))
+        else:
+            values.append(fields[indexes[0]])
+    return values
+
+
+def _iter_csv_module(
+    f: io.BufferedIOBase, indexes: list[int], as_tuples: bool
+) -> Iterator[list]:
+    text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+    batch = []
+    for row in csv.reader(text):
+        if not row:
+            continue
+        if as_tuples:
+            batch.append(tuple(row[index] for index in indexes))
+        else:
+            batch.append(row[indexes[0]])
+        if len(batch) == FALLBACK_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+    text.detach()
+
+
+class _RangeReader(io.RawIOBase):
+    """Read a file from its current position up to the offset `end`"""
+
+    def __init__(self, f: io.BufferedIOBase, end: int):
+        self.f = f
+        self.end = end
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        remaining = self.end - self.f.tell()
+        if remaining <= 0:
+            return 0
+        return self.f.readinto(memoryview(buffer)[:remaining])
@@ -0,0 +1,349 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Delta sitemaps listing the urls added or removed since the previous run"""
+
+import json
+import struct
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+from xml.etree import ElementTree as ET
+
+from sitemap_generator.fingerprint import fingerprint
+from sitemap_generator.sorting import SORT_CHUNK_SIZE, external_sort
+from sitemap_generator.staging import (
+    commit_file,
+    final_path,
+    staged_path,
+    staging_dir,
+)
+from sitemap_generator.writer import (
+    MAX_SITEMAP_BYTES,
+    MAX_URLS_PER_SITEMAP,
+    SITEMAP_NS,
+    WRITE_BUFFER_SIZE,
+    ShardedUrlsetWriter,
+)
+
+SNAPSHOT_DIR = ".snapshots"
+SNAPSHOT_SUFFIX = ".snapshot"
+DELTA_DIR = "delta"
+DELTA_INDEX = "sitemap-delta.xml"
+DELTA_REMOVED = "sitemap-delta-removed.json"
+
+# (pid hash, length of pid in bytes) followed by the utf-8 pid
+RECORD_HEADER = struct.Struct(">qI")
+
+
+def write_records(records: Iterable[tuple[int, str]], f: BinaryIO) -> int:
+    count = 0
+    for pid_hash, pid in records:
+        encoded = pid.encode("utf-8")
+        f.write(RECORD_HEADER.pack(pid_hash, len(encoded)))
+        f.write(encoded)
+        count += 1
+    return count
+
+
+def read_records(path: Path) -> Iterator[tuple[int, str]]:
+    with open(path, "rb", buffering=WRITE_BUFFER_SIZE) as f:
+        while header := f.read(RECORD_HEADER.size):
+            pid_hash, length = RECORD_HEADER.unpack(header)
+            yield pid_hash, f.read(length).decode("utf-8")
+
+
+def write_snapshot(
+    pids: Iterable[str], path: Path, chunk_size: int = SORT_CHUNK_SIZE
+) -> int:
+    """
+    Write the pids of a source to `path` sorted by their 64-bit hash. Pids
+    are sorted with an external sort in chunks of `chunk_size`, so memory
+    is bounded by the chunk size rather than the number of pids. Duplicate
+    pids are dropped
+
+    :returns: `int` number of distinct pids in the snapshot
+    """
+    records = ((fingerprint(pid.encode("utf-8")), pid) for pid in pids)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        count = write_records(
+            external_sort(
+                records, path.parent, write_records, read_records, chunk_size
+            ),
+            f,
+        )
+    tmp_path.replace(path)
+    return count
+
+
+def diff_snapshots(
+    old: Iterator[tuple[int, str]], new: Iterator[tuple[int, str]]
+) -> Iterator[tuple[bool, str]]:
+    """
+    Merge two snapshots sorted by `(hash, pid)` in a single pass
+
+    :returns: iterator of `(added, pid)`, where `added` is `False` for pids
+        that were removed
+    """
+    sentinel = (float("inf"), "")
+    a = next(old, sentinel)
+    b = next(new, sentinel)
+    while a is not sentinel or b is not sentinel:
+        if a == b:
+            a = next(old, sentinel)
+            b = next(new, sentinel)
+        elif b is sentinel or (a is not sentinel and a < b):
+            yield False, a[1]
+            a = next(old, sentinel)
+        else:
+            yield True, b[1]
+            b = next(new, sentinel)
+
+
+@dataclass
+class DeltaResult:
+    """Sizes and locations of the delta written for one source"""
+
+    name: str
+    added: int = 0
+    removed: int = 0
+    added_outputs: list[Path] = field(default_factory=list)
+    removed_output: Path | None = None
+
+
+def snapshot_path(sitemap_output_dir: Path, name: str) -> Path:
+    return sitemap_output_dir / SNAPSHOT_DIR / f"{name}{SNAPSHOT_SUFFIX}"
+
+
+def write_delta(
+    name: str,
+    old_snapshot: Iterator[tuple[int, str]],
+    new_snapshot: Iterator[tuple[int, str]],
+    sitemap_output_dir: Path,
+    suffix: str = ".xml",
+    max_urls: int = MAX_URLS_PER_SITEMAP,
+    max_bytes: int = MAX_SITEMAP_BYTES,
+) -> DeltaResult:
+    """
+    Write `delta/<name>.xml` with the urls added since the old snapshot and
+    `delta/<name>.removed.txt` with one removed url per line to the staging
+    directory. Files are only created when there is something to list; the
+    outputs in the result are the paths they will be committed to
+    """
+    delta = DeltaResult(name)
+    delta_dir = staging_dir(sitemap_output_dir) / DELTA_DIR
+    removed_path = delta_dir / f"{name}.removed.txt"
+    writer = ShardedUrlsetWriter(
+        (delta_dir / name).with_suffix(suffix), max_urls=max_urls, max_bytes=max_bytes
+    )
+    removed_file = None
+    with ExitStack() as stack:
+        for added, pid in diff_snapshots(old_snapshot, new_snapshot):
+            if added:
+                writer.write_loc(pid)
+                delta.added += 1
+                continue
+            if removed_file is None:
+                removed_path.parent.mkdir(parents=True, exist_ok=True)
+                removed_file = stack.enter_context(
+                    open(removed_path, "w", buffering=WRITE_BUFFER_SIZE)
+                )
+                delta.removed_output = final_path(removed_path, sitemap_output_dir)
+            removed_file.write(f"{pid}\n")
+            delta.removed += 1
+    if delta.added:
+        delta.added_outputs = [
+            final_path(output, sitemap_output_dir) for output in writer.close()
+        ]
+    return delta
+
+
+def update_snapshot(
+    name: str,
+    pids: Iterable[str],
+    sitemap_output_dir: Path,
+    record_delta: bool,
+    suffix: str = ".xml",
+    max_urls: int = MAX_URLS_PER_SITEMAP,
+    max_bytes: int = MAX_SITEMAP_BYTES,
+) -> DeltaResult | None:
+    """
+    Stage a new snapshot of a source with its current pids and, if
+    `record_delta` is set, write the delta against the previous snapshot.
+    A source without a previous snapshot is new, so all its pids are added.
+    The previous snapshot stays in place until `commit_snapshots` runs once
+    the run has been published
+
+    :returns: `DeltaResult` or `None` if no delta was recorded
+    """
+    path = snapshot_path(sitemap_output_dir, name)
+    staged = staged_path(path, sitemap_output_dir)
+    write_snapshot(pids, staged)
+    if not record_delta:
+        return None
+    old_records = read_records(path) if path.exists() else iter(())
+    return write_delta(
+        name,
+        old_records,
+        read_records(staged),
+        sitemap_output_dir,
+        suffix,
+        max_urls,
+        max_bytes,
+    )
+
+
+def snapshot_names(sitemap_output_dir: Path) -> list[str]:
+    """Names of the sources with a snapshot from a previous run"""
+    snapshot_dir = sitemap_output_dir / SNAPSHOT_DIR
+    if not snapshot_dir.exists():
+        return []
+    return sorted(
+        path.relative_to(snapshot_dir).as_posix().removesuffix(SNAPSHOT_SUFFIX)
+        for path in snapshot_dir.rglob(f"*{SNAPSHOT_SUFFIX}")
+    )
+
+
+def delta_deleted_sources(
+    sitemap_output_dir: Path,
+    current: set[str],
+    suffix: str = ".xml",
+    max_urls: int = MAX_URLS_PER_SITEMAP,
+    max_bytes: int = MAX_SITEMAP_BYTES,
+) -> list[DeltaResult]:
+    """Record every pid of the sources that no longer exist as removed"""
+    return [
+        write_delta(
+            name,
+            read_records(snapshot_path(sitemap_output_dir, name)),
+            iter(()),
+            sitemap_output_dir,
+            suffix,
+            max_urls,
+            max_bytes,
+        )
+        for name in snapshot_names(sitemap_output_dir)
+        if name not in current
+    ]
+
+
+def commit_snapshots(sitemap_output_dir: Path, current: set[str]) -> None:
+    """
+    Move the snapshots staged by this run into place and drop those of
+    sources that no longer exist, so the next delta is taken against what
+    was published
+    """
+    staged_dir = staging_dir(sitemap_output_dir) / SNAPSHOT_DIR
+    if staged_dir.exists():
+        for staged in sorted(staged_dir.rglob(f"*{SNAPSHOT_SUFFIX}")):
+            commit_file(staged, final_path(staged, sitemap_output_dir))
+    for name in snapshot_names(sitemap_output_dir):
+        if name not in current:
+            snapshot_path(sitemap_output_dir, name).unlink()
+
+
+def delta_url(base_uri: str, path: Path | None, sitemap_output_dir: Path) -> str | None:
+    if path is None:
+        return None
+    return f"{base_uri}/sitemap/{path.relative_to(sitemap_output_dir).as_posix()}"
+
+
+def delta_sitemap_id(delta: DeltaResult) -> str:
+    return delta.name.replace("/", ":").removeprefix("bulk:")
+
+
+def make_delta_index(
+    base_uri: str, deltas: list[DeltaResult], sitemap_output_dir: Path, lastmod: str
+) -> ET.ElementTree:
+    """
+    Build the index of delta sitemaps. Every entry carries the number of
+    urls added and removed and, if any were removed, the location of the
+    removed list. Removed lists are not sitemaps, so a source that only
+    lost urls has no entry and is only listed by `make_removed_manifest`
+    """
+    GEOCONNEX_NS = "https://geoconnex.us"
+    root = ET.Element(f"{{{SITEMAP_NS}}}sitemapindex")
+    for delta in deltas:
+        removed_loc = delta_url(base_uri, delta.removed_output, sitemap_output_dir)
+        for output in delta.added_outputs:
+            loc = delta_url(base_uri, output, sitemap_output_dir)
+            sitemap_el = ET.SubElement(root, f"{{{SITEMAP_NS}}}sitemap")
+            ET.SubElement(sitemap_el, f"{{{SITEMAP_NS}}}loc").text = loc
+            ET.SubElement(sitemap_el, f"{{{SITEMAP_NS}}}lastmod").text = lastmod
+            ET.SubElement(
+                sitemap_el, f"{{{GEOCONNEX_NS}}}sitemap_id"
+            ).text = delta_sitemap_id(delta)
+            ET.SubElement(sitemap_el, f"{{{GEOCONNEX_NS}}}added").text = str(
+                delta.added
+            )
+            ET.SubElement(sitemap_el, f"{{{GEOCONNEX_NS}}}removed").text = str(
+                delta.removed
+            )
+            if removed_loc:
+                ET.SubElement(
+                    sitemap_el, f"{{{GEOCONNEX_NS}}}removed_list"
+                ).text = removed_loc
+            ET.indent(sitemap_el, space="  ")
+    return ET.ElementTree(root)
+
+
+def make_removed_manifest(
+    base_uri: str, deltas: list[DeltaResult], sitemap_output_dir: Path, lastmod: str
+) -> dict:
+    """
+    List the removed list of every source that lost urls, including the
+    sources that were deleted outright and so have no delta sitemap
+    """
+    return {
+        "lastmod": lastmod,
+        "sources": [
+            {
+                "sitemap_id": delta_sitemap_id(delta),
+                "added": delta.added,
+                "removed": delta.removed,
+                "removed_list": delta_url(
+                    base_uri, delta.removed_output, sitemap_output_dir
+                ),
+            }
+            for delta in deltas
+            if delta.removed_output is not None
+        ],
+    }
+
+
+def write_removed_manifest(manifest: dict, path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2))
+    return path
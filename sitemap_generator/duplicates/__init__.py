@@ -0,0 +1,100 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Check a namespace directory for pids mapped more than once"""
+
+import json
+from pathlib import Path
+
+import click
+
+from sitemap_generator.duplicates.detector import (
+    SORT_CHUNK_SIZE,
+    find_duplicates,
+    pid_sources,
+)
+from sitemap_generator.util import OPTION_VERBOSITY, get_all_sitemap_sources
+
+
+@click.command()
+@click.pass_context
+@OPTION_VERBOSITY
+@click.argument(
+    "namespace-input-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--work-dir",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    envvar="SITEMAP_WORK_DIR",
+    help="directory for the sorted runs of pid hashes, 8 bytes per pid",
+)
+@click.option(
+    "--sort-chunk-size",
+    type=click.IntRange(min=1),
+    default=SORT_CHUNK_SIZE,
+    help="pid hashes sorted in memory at once",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    help="print the report as JSON",
+)
+def duplicates(
+    ctx,
+    verbosity,
+    namespace_input_dir: Path,
+    work_dir: Path | None,
+    sort_chunk_size: int,
+    as_json: bool,
+):
+    """
+    Find pids that more than one csv row or pregenerated xml url maps,
+    printing each with the sources it was found in and their targets
+    """
+    if work_dir:
+        work_dir.mkdir(parents=True, exist_ok=True)
+    sources = pid_sources(get_all_sitemap_sources(namespace_input_dir))
+    report = find_duplicates(sources, work_dir, sort_chunk_size)
+
+    if as_json:
+        click.echo(json.dumps(report.to_dict(namespace_input_dir), indent=2))
+    else:
+        for duplicate in report.duplicates:
+            kind = "conflicting" if duplicate.conflicting else "duplicate"
+            click.echo(f"{duplicate.pid}\t{kind}")
+            for occurrence in duplicate.occurrences:
+                source = occurrence.path.relative_to(namespace_input_dir).as_posix()
+                click.echo(f"\t{source}\t{occurrence.target or ''}")
+    click.echo(report.summary(), err=True)
+    if report.duplicates:
+        ctx.exit(1)
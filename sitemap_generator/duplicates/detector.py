@@ -0,0 +1,315 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Find geoconnex pids that more than one row or file of a namespace directory
+maps, across every one to one csv, pregenerated xml and bulk dump
+"""
+
+import heapq
+import logging
+import tempfile
+import time
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from itertools import chain, islice
+from pathlib import Path
+from typing import Literal
+
+from sitemap_generator.bulk import BulkDump, source_dump
+from sitemap_generator.csv_reader import iter_column_batches, iter_columns_batches
+from sitemap_generator.fingerprint import fingerprint
+from sitemap_generator.util import SitemapSourceWithMetadata, classify_csv
+from sitemap_generator.writer import iter_urlset_locs
+
+LOGGER = logging.getLogger(__name__)
+
+# every pid becomes one unsigned 64-bit key: the top bits of its hash with
+# the index of the source it came from in the low bits
+SOURCE_BITS = 20
+MAX_SOURCES = 1 << SOURCE_BITS
+SOURCE_MASK = MAX_SOURCES - 1
+HASH_MASK = ((1 << 64) - 1) ^ SOURCE_MASK
+
+# keys sorted in memory at once; spilled runs take 8 bytes per pid on disk
+SORT_CHUNK_SIZE = 4_000_000
+
+# keys read at once from each sorted run while merging
+MERGE_BLOCK_SIZE = 65_536
+
+# locs read at once from a pregenerated xml, or pids from a bulk dump
+XML_BATCH_SIZE = 10_000
+
+
+@dataclass
+class PidSource:
+    """
+    A file that maps geoconnex pids, read as a csv, a urlset or the bulk
+    dump in `dump`
+    """
+
+    path: Path
+    file_type: Literal["csv", "xml", "dump"]
+    dump: BulkDump | None = None
+
+    def iter_pid_batches(self) -> Iterator[list[str]]:
+        if self.file_type == "csv":
+            return iter_column_batches(self.path, "id")
+        pids = self._iter_pids()
+        return iter(lambda: list(islice(pids, XML_BATCH_SIZE)), [])
+
+    def iter_pids_and_targets(self) -> Iterator[tuple[str, str | None]]:
+        """Yield every pid with its target, which is `None` for xml and dumps"""
+        if self.file_type != "csv":
+            for pid in self._iter_pids():
+                yield pid, None
+            return
+        batches = iter_columns_batches(self.path, ("id", "target"))
+        try:
+            first = next(batches)
+        except StopIteration:
+            return
+        except ValueError:
+            # a csv without a target column still contributes its ids
+            for batch in iter_column_batches(self.path, "id"):
+                for pid in batch:
+                    yield pid, None
+            return
+        for batch in chain([first], batches):
+            yield from batch
+
+    def _iter_pids(self) -> Iterator[str]:
+        if self.dump is not None:
+            return self.dump.iter_pids()
+        return iter_urlset_locs(self.path)
+
+
+@dataclass
+class PidOccurrence:
+    path: Path
+    target: str | None = None
+
+
+@dataclass
+class DuplicatePid:
+    """A pid found more than once, with every place it was found"""
+
+    pid: str
+    occurrences: list[PidOccurrence]
+
+    @property
+    def targets(self) -> set[str]:
+        return {o.target for o in self.occurrences if o.target is not None}
+
+    @property
+    def conflicting(self) -> bool:
+        """Whether the occurrences disagree on where the pid resolves to"""
+        return len(self.targets) > 1
+
+
+@dataclass
+class DuplicateReport:
+    sources: int = 0
+    pids: int = 0
+    # distinct hashes seen more than once, before confirming the pids
+    candidates: int = 0
+    seconds: float = 0.0
+    duplicates: list[DuplicatePid] = field(default_factory=list)
+
+    @property
+    def conflicts(self) -> list[DuplicatePid]:
+        return [duplicate for duplicate in self.duplicates if duplicate.conflicting]
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.duplicates)} duplicate pids, {len(self.conflicts)} with "
+            f"conflicting targets, in {self.pids} pids from {self.sources} sources"
+        )
+
+    def log(self, namespace_input_dir: Path) -> None:
+        for duplicate in self.duplicates:
+            places = ", ".join(
+                f"{o.path.relative_to(namespace_input_dir).as_posix()}"
+                + (f" -> {o.target}" if o.target is not None else "")
+                for o in duplicate.occurrences
+            )
+            kind = "Conflicting" if duplicate.conflicting else "Duplicate"
+            LOGGER.warning(f"{kind} pid {duplicate.pid}: {places}")
+        LOGGER.info(f"Checked for duplicates: {self.summary()}")
+
+    def to_dict(self, namespace_input_dir: Path) -> dict:
+        return {
+            "sources": self.sources,
+            "pids": self.pids,
+            "seconds": self.seconds,
+            "duplicate_pids": len(self.duplicates),
+            "conflicting_pids": len(self.conflicts),
+            "duplicates": [
+                {
+                    "pid": duplicate.pid,
+                    "conflicting": duplicate.conflicting,
+                    "occurrences": [
+                        {
+                            "source": o.path.relative_to(
+                                namespace_input_dir
+                            ).as_posix(),
+                            "target": o.target,
+                        }
+                        for o in duplicate.occurrences
+                    ],
+                }
+                for duplicate in self.duplicates
+            ],
+        }
+
+
+def pid_sources(sources: Iterable[SitemapSourceWithMetadata]) -> list[PidSource]:
+    """
+    Files among `sources` that map individual pids, including ones that are
+    not crawled, one to one csvs in bulk directories and the dumps of bulk
+    directories. A dump whose settings are invalid is skipped with a warning
+    """
+    found = []
+    dumps: set[Path] = set()
+    for source in sources:
+        match source.file_type:
+            case "one_to_one_csv":
+                found.append(PidSource(source.path, "csv"))
+            case "pregenerated_xml":
+                found.append(PidSource(source.path, "xml"))
+            case "bulk":
+                try:
+                    dump = source_dump(source)
+                except ValueError as e:
+                    LOGGER.warning(f"Not checking the bulk dump of {source.path}: {e}")
+                    dump = None
+                # every csv of a bulk directory shares its dump
+                if dump is not None and dump.path not in dumps:
+                    dumps.add(dump.path)
+                    found.append(PidSource(dump.path, "dump", dump))
+                if source.path.suffix == ".csv" and not classify_csv(
+                    source.path, source.path.stat().st_size
+                ):
+                    found.append(PidSource(source.path, "csv"))
+    return found
+
+
+def _pid_hash(pid: str) -> int:
+    return fingerprint(pid.encode("utf-8")) & HASH_MASK
+
+
+def _read_run(path: Path) -> Iterator[int]:
+    with open(path, "rb") as f:
+        while True:
+            block = array("Q")
+            try:
+                block.fromfile(f, MERGE_BLOCK_SIZE)
+            except EOFError:
+                # fromfile keeps the items read before the end of the file
+                yield from block
+                return
+            yield from block
+
+
+def find_duplicates(
+    sources: Sequence[PidSource],
+    work_dir: Path | None = None,
+    chunk_size: int = SORT_CHUNK_SIZE,
+) -> DuplicateReport:
+    """
+    Find pids that occur more than once in `sources`, in the same file or
+    in different ones. Every pid is reduced to a 64-bit key which is sorted
+    externally: chunks of `chunk_size` keys are sorted in memory and spilled
+    to `work_dir`, then merged, so memory is bounded by the chunk size
+    rather than the number of pids. Equal hashes are only candidates; a
+    second pass over the sources they came from compares the pids
+    themselves and collects their targets
+
+    :returns: `DuplicateReport` with the confirmed duplicates in pid order
+    """
+    if len(sources) > MAX_SOURCES:
+        raise ValueError(f"Can't check more than {MAX_SOURCES} sources at once")
+    start = time.perf_counter()
+    report = DuplicateReport(sources=len(sources))
+
+    with tempfile.TemporaryDirectory(dir=work_dir, prefix=".duplicates-") as tmp:
+        runs: list[Path] = []
+        chunk = array("Q")
+
+        def spill():
+            run = Path(tmp) / f"run_{len(runs)}"
+            with open(run, "wb") as f:
+                array("Q", sorted(chunk)).tofile(f)
+            runs.append(run)
+            del chunk[:]
+
+        for index, source in enumerate(sources):
+            for batch in source.iter_pid_batches():
+                chunk.extend([_pid_hash(pid) | index for pid in batch])
+                report.pids += len(batch)
+                if len(chunk) >= chunk_size:
+                    spill()
+
+        if runs:
+            if chunk:
+                spill()
+            keys = heapq.merge(*(_read_run(run) for run in runs))
+        else:
+            keys = iter(sorted(chunk))
+
+        # hash -> indices of the sources it was seen in
+        candidates: dict[int, set[int]] = {}
+        previous_hash = previous_source = None
+        for key in keys:
+            pid_hash, source_index = key & HASH_MASK, key & SOURCE_MASK
+            if pid_hash == previous_hash:
+                candidates.setdefault(pid_hash, set()).update(
+                    (previous_source, source_index)
+                )
+            previous_hash, previous_source = pid_hash, source_index
+        del chunk[:]
+
+    report.candidates = len(candidates)
+    involved = sorted(set().union(*candidates.values()))
+    occurrences: dict[str, list[PidOccurrence]] = {}
+    for index in involved:
+        path = sources[index].path
+        for pid, target in sources[index].iter_pids_and_targets():
+            if _pid_hash(pid) in candidates:
+                occurrences.setdefault(pid, []).append(PidOccurrence(path, target))
+
+    report.duplicates = [
+        DuplicatePid(pid, found)
+        for pid, found in sorted(occurrences.items())
+        if len(found) > 1
+    ]
+    report.seconds = time.perf_counter() - start
+    return report
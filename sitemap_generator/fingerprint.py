@@ -0,0 +1,152 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Persistent store of row fingerprints used to give urls a stable lastmod"""
+
+import datetime
+import hashlib
+import sqlite3
+from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING
+
+from sitemap_generator.util import datettime_to_sitemap_iso_format
+
+if TYPE_CHECKING:
+    from typing import Self
+
+# Separates csv fields when hashing a row; can't occur in decoded csv text
+FIELD_SEPARATOR = b"\x1f"
+
+
+def fingerprint(value: bytes) -> int:
+    """Signed 64-bit hash of `value`, which fits in an sqlite INTEGER"""
+    return int.from_bytes(
+        hashlib.blake2b(value, digest_size=8).digest(), "big", signed=True
+    )
+
+
+def row_fingerprint(row: list[str]) -> int:
+    return fingerprint(FIELD_SEPARATOR.join(field.encode("utf-8") for field in row))
+
+
+class LastmodStore:
+    """
+    Maps the 64-bit hash of every geoconnex pid to the hash of its csv row
+    and the time that row hash last changed. Only fixed width integers are
+    stored, so tens of millions of pids take a few hundred megabytes on
+    disk, and lookups and updates are done in batches so memory stays
+    bounded by the batch size
+    """
+
+    def __init__(self, path: Path, now: datetime.datetime | None = None):
+        self.now = int(
+            (now or datetime.datetime.now(datetime.timezone.utc)).timestamp()
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # several worker processes may update the store at once
+        self.connection = sqlite3.connect(path, timeout=300)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                pid_hash INTEGER PRIMARY KEY,
+                row_hash INTEGER NOT NULL,
+                lastmod INTEGER NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self.connection.commit()
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def lastmods(self, rows: list[tuple[str, list[str]]]) -> list[str]:
+        """
+        Return the lastmod for every `(pid, row)` in a batch, recording
+        the current time for any pid that is new or whose row changed
+
+        :returns: `list` of lastmods in sitemap format, in the order of `rows`
+        """
+        pid_hashes = [fingerprint(pid.encode("utf-8")) for pid, _ in rows]
+        row_hashes = [row_fingerprint(row) for _, row in rows]
+
+        known: dict[int, tuple[int, int]] = {}
+        # stay below the sqlite limit on bound parameters per statement
+        for start in range(0, len(pid_hashes), 30_000):
+            chunk = pid_hashes[start : start + 30_000]
+            placeholders = ",".join("?" * len(chunk))
+            for pid_hash, row_hash, lastmod in self.connection.execute(
+                "SELECT pid_hash, row_hash, lastmod FROM fingerprints "
+                f"WHERE pid_hash IN ({placeholders})",
+                chunk,
+            ):
+                known[pid_hash] = (row_hash, lastmod)
+
+        timestamps = []
+        changed = []
+        for pid_hash, row_hash in zip(pid_hashes, row_hashes):
+            previous = known.get(pid_hash)
+            if previous is not None and previous[0] == row_hash:
+                timestamps.append(previous[1])
+            else:
+                timestamps.append(self.now)
+                changed.append((pid_hash, row_hash, self.now))
+                known[pid_hash] = (row_hash, self.now)
+
+        if changed:
+            self.connection.executemany(
+                "INSERT INTO fingerprints (pid_hash, row_hash, lastmod) "
+                "VALUES (?, ?, ?) ON CONFLICT(pid_hash) DO UPDATE SET "
+                "row_hash = excluded.row_hash, lastmod = excluded.lastmod",
+                changed,
+            )
+            self.connection.commit()
+
+        formatted: dict[int, str] = {}
+        for timestamp in timestamps:
+            if timestamp not in formatted:
+                formatted[timestamp] = datettime_to_sitemap_iso_format(
+                    datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+                )
+        return [formatted[timestamp] for timestamp in timestamps]
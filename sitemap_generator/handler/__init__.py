@@ -31,10 +31,27 @@
 """Handler classs"""
 
 import click
+import logging
+from contextlib import nullcontext
 from pathlib import Path
 
-from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.handler.base import FileSystemHandler, SitemapGenerationError
+from sitemap_generator.profiling import Profiler
+from sitemap_generator.sharding import Shard
+from sitemap_generator.sink import S3Sink, is_s3_url
 from sitemap_generator.util import OPTION_VERBOSITY
+from sitemap_generator.writer import DEFAULT_COMPRESSION_LEVEL
+
+LOGGER = logging.getLogger(__name__)
+
+
+def parse_shard(ctx, param, value: str | None) -> Shard | None:
+    if value is None:
+        return None
+    try:
+        return Shard.parse(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from None
 
 
 @click.command()
@@ -54,20 +71,199 @@ from sitemap_generator.util import OPTION_VERBOSITY
 @click.option(
     "-o",
     "--sitemap-output-dir",
-    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    type=str,
     envvar="SITEMAP_DIR",
-    default=Path("/tmp/sitemaps"),
+    default="/tmp/sitemaps",
+    help="directory to write sitemaps to, or an s3://bucket/prefix url to "
+    "upload them to",
+)
+@click.option(
+    "--work-dir",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    envvar="SITEMAP_WORK_DIR",
+    default=Path("/tmp/sitemap-work"),
+    help="local directory for the build manifest, snapshots and staged files "
+    "when writing to s3",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    default=False,
+    help="rebuild every sitemap even if its source is unchanged since the last run",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    envvar="SITEMAP_WORKERS",
+    default=1,
+    help="number of processes used to generate sitemaps in parallel",
+)
+@click.option(
+    "--gzip",
+    "compress",
+    is_flag=True,
+    default=False,
+    help="write gzip compressed sitemaps (.xml.gz)",
+)
+@click.option(
+    "--compression-level",
+    type=click.IntRange(min=0, max=9),
+    default=DEFAULT_COMPRESSION_LEVEL,
+    help="gzip compression level used with --gzip",
+)
+@click.option(
+    "--skip-xml-validation",
+    is_flag=True,
+    default=False,
+    help="count urls in pregenerated xml with a byte scan instead of parsing it",
+)
+@click.option(
+    "--hardlink-xml",
+    is_flag=True,
+    default=False,
+    help="hard link pregenerated xml into the output instead of copying it",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="write timings, url counts and sizes for every source as JSON",
+)
+@click.option(
+    "--prometheus-textfile",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="write run metrics in the node_exporter textfile collector format",
+)
+@click.option(
+    "--lastmod-store",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="SITEMAP_LASTMOD_STORE",
+    help="sqlite file of row fingerprints used to give every csv url a lastmod "
+    "that only changes when its row changes",
+)
+@click.option(
+    "--delta",
+    is_flag=True,
+    default=False,
+    help="also write delta sitemaps of the urls added or removed since the "
+    "previous run, indexed by sitemap-delta.xml; removed urls are listed "
+    "in files indexed by sitemap-delta-removed.json",
+)
+@click.option(
+    "--split-csv-mib",
+    type=click.IntRange(min=0),
+    envvar="SITEMAP_SPLIT_CSV_MIB",
+    default=0,
+    help="split one_to_one csvs larger than this many MiB into byte ranges "
+    "that are generated in parallel, each into sitemaps of its own; 0 disables",
+)
+@click.option(
+    "--check-duplicates",
+    type=click.Choice(["warn", "fail"]),
+    help="check every csv and pregenerated xml for pids mapped more than once "
+    "before generating, and log them or fail the run",
+)
+@click.option(
+    "--sort-ids",
+    is_flag=True,
+    default=False,
+    help="sort the ids of one_to_one csvs and drop duplicates with a disk "
+    "backed sort, so their sitemaps list every pid once in a stable order",
+)
+@click.option(
+    "--shard",
+    type=str,
+    envvar="SITEMAP_SHARD",
+    callback=parse_shard,
+    help="generate only shard i/N of the sources and write an index fragment "
+    "for merge-index instead of the sitemap index",
+)
+@click.option(
+    "--profile",
+    type=click.Choice(["spans", "full"]),
+    envvar="SITEMAP_PROFILE",
+    help="time every stage of the run; 'full' also writes a cProfile "
+    "profile, collapsed stacks for flame graphs and the peak memory of "
+    "each stage",
+)
+@click.option(
+    "--profile-dir",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    envvar="SITEMAP_PROFILE_DIR",
+    default=Path("/tmp/sitemap-profile"),
+    help="directory to write the profile to",
 )
 def run(
-    ctx, verbosity, namespace_input_dir: Path, uri_base: str, sitemap_output_dir: Path
+    ctx,
+    verbosity,
+    namespace_input_dir: Path,
+    uri_base: str,
+    sitemap_output_dir: str,
+    work_dir: Path,
+    full: bool,
+    workers: int,
+    compress: bool,
+    compression_level: int,
+    skip_xml_validation: bool,
+    hardlink_xml: bool,
+    metrics_file: Path | None,
+    prometheus_textfile: Path | None,
+    lastmod_store: Path | None,
+    delta: bool,
+    split_csv_mib: int,
+    check_duplicates: str | None,
+    sort_ids: bool,
+    shard: Shard | None,
+    profile: str | None,
+    profile_dir: Path,
 ):
     """Generate sitemaps from data in the filesystem and write them to disk"""
-    handler = FileSystemHandler()
-    handler.generate(
-        namespace_input_dir=namespace_input_dir,
-        uri_base=uri_base,
-        sitemap_output_dir=sitemap_output_dir,
+    sink = None
+    output_dir = Path(sitemap_output_dir)
+    if is_s3_url(sitemap_output_dir):
+        sink = S3Sink.from_url(sitemap_output_dir)
+        output_dir = work_dir
+
+    handler = FileSystemHandler(
+        compress=compress,
+        compression_level=compression_level,
+        verify_pregenerated_xml=not skip_xml_validation,
+        hardlink_pregenerated_xml=hardlink_xml,
+        lastmod_store=lastmod_store,
+        delta=delta,
+        sink=sink,
+        check_duplicates=check_duplicates,
+        csv_range_size=split_csv_mib * 2**20,
+        shard=shard,
+        sort_ids=sort_ids,
+        profiler=Profiler(profile) if profile else None,
     )
+    if profile == "full" and workers > 1:
+        LOGGER.warning(
+            "The full profile only covers this process, not the workers "
+            "generating sitemaps; profile with one worker to include them"
+        )
+    metrics = None
+    try:
+        with handler.profiler or nullcontext():
+            metrics = handler.generate(
+                namespace_input_dir=namespace_input_dir,
+                uri_base=uri_base,
+                sitemap_output_dir=output_dir,
+                full=full,
+                workers=workers,
+            )
+    except SitemapGenerationError as e:
+        metrics = e.metrics
+        raise
+    finally:
+        if handler.profiler:
+            LOGGER.info(f"Profile of the run:\n{handler.profiler.summary()}")
+            handler.profiler.write(profile_dir)
+        if metrics and metrics_file:
+            metrics.write_json(metrics_file)
+        if metrics and prometheus_textfile:
+            metrics.write_prometheus(prometheus_textfile)
 
 
 if __name__ == "__main__":
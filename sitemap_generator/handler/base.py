@@ -29,10 +29,67 @@
 # =================================================================
 
 import logging
+import time
+from collections import deque
+from collections.abc import Callable, Collection, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
+from itertools import islice
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 from xml.etree import ElementTree as ET
 
+from sitemap_generator.bulk import BulkDump, source_dump
+from sitemap_generator.csv_reader import (
+    ByteRange,
+    iter_column,
+    iter_column_batches,
+    iter_ids_and_rows,
+    record_ranges,
+)
+from sitemap_generator.delta import (
+    DELTA_DIR,
+    DELTA_INDEX,
+    DELTA_REMOVED,
+    SNAPSHOT_DIR,
+    commit_snapshots,
+    delta_deleted_sources,
+    make_delta_index,
+    make_removed_manifest,
+    update_snapshot,
+    write_removed_manifest,
+)
+from sitemap_generator.duplicates.detector import find_duplicates, pid_sources
+from sitemap_generator.fingerprint import LastmodStore
+from sitemap_generator.manifest import (
+    MANIFEST_FILENAME,
+    BuildManifest,
+    make_manifest_entry,
+)
+from sitemap_generator.metrics import RunMetrics, SourceResult
+from sitemap_generator.profiling import Profiler
+from sitemap_generator.sharding import (
+    Shard,
+    assign_shards,
+    make_index_fragment,
+    write_index_fragment,
+)
+from sitemap_generator.sink import LocalSink, OutputSink
+from sitemap_generator.sorting import (
+    SORT_CHUNK_SIZE,
+    external_sort,
+    read_pairs,
+    write_pairs,
+)
+from sitemap_generator.staging import (
+    STAGING_DIR,
+    OutputChanges,
+    final_path,
+    remove_stale_outputs,
+    reset_staging_dir,
+    staged_path,
+    staging_dir,
+)
 from sitemap_generator.util import (
     SitemapSourceWithMetadata,
     csv_to_sitemap_url_list,
@@ -40,10 +97,31 @@ from sitemap_generator.util import (
     get_all_sitemap_sources,
     write_tree_to_file,
 )
+from sitemap_generator.writer import (
+    DEFAULT_COMPRESSION_LEVEL,
+    MAX_SITEMAP_BYTES,
+    MAX_URLS_PER_SITEMAP,
+    SITEMAP_NS,
+    ShardedUrlsetWriter,
+    compress_file,
+    copy_file,
+    count_urlset_entries,
+    iter_urlset_entries,
+    iter_urlset_locs,
+    scan_url_entry_count,
+    shard_path,
+    sitemap_suffix,
+)
 
 
 LOGGER = logging.getLogger(__name__)
 
+# file types whose pids are tracked between runs for delta sitemaps
+DELTA_FILE_TYPES = ("one_to_one_csv", "pregenerated_xml")
+
+# rows read from a csv at a time when streaming it into a sitemap
+CSV_BATCH_SIZE = 10_000
+
 URLSET = """<?xml version="1.0"?>
 <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
 </urlset>
@@ -68,41 +146,986 @@ BULK_SITEMAP_TEMPLATE = """<?xml version='1.0' encoding='utf-8'?>
 </urlset>"""
 
 
+class SitemapGenerationError(RuntimeError):
+    """Raised once a run has finished if any source failed to generate"""
+
+    def __init__(self, message: str, metrics: RunMetrics):
+        super().__init__(message)
+        self.metrics = metrics
+
+
+def generate_source(
+    handler: "FileSystemHandler",
+    source: SitemapSourceWithMetadata,
+    output_path: Path,
+    sitemap_output_dir: Path,
+    record_delta: bool = False,
+) -> SourceResult:
+    """
+    Write the sitemaps for one source and describe the result. Exceptions
+    are captured in the result so one failing source doesn't abort the
+    others when running in a process pool. The sitemaps are written to the
+    staging directory; the outputs in the result are the paths they will
+    be committed to
+    """
+    start = time.perf_counter()
+    try:
+        result = handler.write_sitemap(
+            source, staged_path(output_path, sitemap_output_dir, handler.staging_name)
+        )
+        result.bytes_written = sum(output.stat().st_size for output in result.outputs)
+        result.outputs = [
+            final_path(staged, sitemap_output_dir, handler.staging_name)
+            for staged in result.outputs
+        ]
+        if result.outputs:
+            describe_source(
+                handler, source, output_path, sitemap_output_dir, result, record_delta
+            )
+        else:
+            result.skip_reason = "no_sitemap"
+    except Exception as e:  # noqa: BLE001 - reported in the source's result
+        result = SourceResult(source.path, error=f"{type(e).__name__}: {e}")
+    result.file_type = source.file_type
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def describe_source(
+    handler: "FileSystemHandler",
+    source: SitemapSourceWithMetadata,
+    output_path: Path,
+    sitemap_output_dir: Path,
+    result: SourceResult,
+    record_delta: bool = False,
+) -> None:
+    """
+    Add the manifest entry for the outputs in `result` and, with deltas
+    enabled, update the snapshot of the pids of the source
+    """
+    result.manifest_entry = make_manifest_entry(
+        source,
+        result.outputs,
+        sitemap_output_dir,
+        result.url_count,
+        result.bytes_written,
+    )
+    if handler.delta and source.file_type in DELTA_FILE_TYPES:
+        name = output_path.relative_to(sitemap_output_dir).as_posix()
+        result.delta = update_snapshot(
+            name.removesuffix(handler.sitemap_suffix),
+            handler.iter_source_pids(source),
+            sitemap_output_dir,
+            record_delta,
+            handler.sitemap_suffix,
+            handler.max_urls_per_sitemap,
+            handler.max_sitemap_bytes,
+        )
+
+
+def range_output_path(output_path: Path, part: int) -> Path:
+    """Where the shards of one byte range of a split csv are first written"""
+    suffix = sitemap_suffix(output_path)
+    stem = output_path.name.removesuffix(suffix)
+    return output_path.with_name(f"{stem}.part{part}{suffix}")
+
+
+def generate_range(
+    handler: "FileSystemHandler",
+    source: SitemapSourceWithMetadata,
+    output_path: Path,
+    sitemap_output_dir: Path,
+    part: int,
+    byte_range: ByteRange,
+) -> SourceResult:
+    """
+    Write the rows in one byte range of a one_to_one_csv to shards of
+    their own in the staging directory. Like `generate_source`,
+    exceptions are captured in the result
+    """
+    start = time.perf_counter()
+    try:
+        staged = staged_path(
+            range_output_path(output_path, part),
+            sitemap_output_dir,
+            handler.staging_name,
+        )
+        result = handler._write_one_to_one_csv(source, staged, byte_range)
+        result.bytes_written = sum(output.stat().st_size for output in result.outputs)
+    except Exception as e:  # noqa: BLE001 - reported in the source's result
+        result = SourceResult(source.path, error=f"{type(e).__name__}: {e}")
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def describe_split_source(
+    handler: "FileSystemHandler",
+    source: SitemapSourceWithMetadata,
+    output_path: Path,
+    sitemap_output_dir: Path,
+    record_delta: bool = False,
+) -> SourceResult:
+    """
+    Hash a split csv for the manifest and update its delta snapshot,
+    concurrently with the ranges being written. The outputs are filled
+    in once every range is done
+    """
+    start = time.perf_counter()
+    result = SourceResult(source.path)
+    try:
+        describe_source(
+            handler, source, output_path, sitemap_output_dir, result, record_delta
+        )
+    except Exception as e:  # noqa: BLE001 - reported in the source's result
+        result = SourceResult(source.path, error=f"{type(e).__name__}: {e}")
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def merge_ranges(
+    source: SitemapSourceWithMetadata,
+    output_path: Path,
+    sitemap_output_dir: Path,
+    parts: list[SourceResult],
+    described: SourceResult,
+    staging_name: str = STAGING_DIR,
+) -> SourceResult:
+    """
+    Number the shards written for every byte range of a split csv in range
+    order, as if one writer had produced them, and combine the results
+    """
+    result = SourceResult(source.path, file_type=source.file_type)
+    errors = [part.error for part in [*parts, described] if part.error]
+    if errors:
+        result.error = errors[0]
+        return result
+
+    # ranges holding only blank lines leave an empty urlset behind, which
+    # is dropped unless the whole csv is empty
+    has_urls = any(part.url_count for part in parts)
+    kept = []
+    for index, part in enumerate(parts):
+        if part.url_count or (index == 0 and not has_urls):
+            kept.append(part)
+        else:
+            for empty in part.outputs:
+                empty.unlink()
+
+    shards = [shard for part in kept for shard in part.outputs]
+    for number, shard in enumerate(shards):
+        target = output_path if len(shards) == 1 else shard_path(output_path, number)
+        staged = staged_path(target, sitemap_output_dir, staging_name)
+        shard.replace(staged)
+        result.outputs.append(final_path(staged, sitemap_output_dir, staging_name))
+    for part in kept:
+        result.url_count += part.url_count
+        result.bytes_written += part.bytes_written
+    for part in parts:
+        result.parse_seconds += part.parse_seconds
+        result.write_seconds += part.write_seconds
+    result.seconds = max(part.seconds for part in [*parts, described])
+
+    assert described.manifest_entry is not None
+    result.manifest_entry = described.manifest_entry
+    result.manifest_entry.outputs = [
+        output.relative_to(sitemap_output_dir).as_posix() for output in result.outputs
+    ]
+    result.manifest_entry.url_count = result.url_count
+    result.manifest_entry.bytes_written = result.bytes_written
+    result.delta = described.delta
+    return result
+
+
+def sorted_id_batches(
+    batches: Iterator[list],
+    store: LastmodStore | None,
+    work_dir: Path,
+    chunk_size: int = SORT_CHUNK_SIZE,
+) -> Iterator[list[tuple[str, str]]]:
+    """
+    Sort the ids of a csv and drop duplicates with an external sort that
+    spills below `work_dir`, so the sitemaps of a csv list every pid once
+    in the same order however its rows are arranged. Lastmods are looked
+    up before sorting, in row order; a pid on several rows keeps the
+    latest of them
+
+    :returns: iterator of batches of `(pid, lastmod)`, with an empty
+        lastmod when there is no store
+    """
+
+    def records() -> Iterator[tuple[str, str]]:
+        for batch in batches:
+            if store:
+                yield from zip((pid for pid, _ in batch), store.lastmods(batch))
+            else:
+                for pid in batch:
+                    yield pid, ""
+
+    def latest(pairs: Iterator[tuple[str, str]]) -> Iterator[tuple[str, str]]:
+        # pairs of the same pid are adjacent with the latest lastmod last
+        previous = None
+        for pair in pairs:
+            if previous is not None and pair[0] != previous[0]:
+                yield previous
+            previous = pair
+        if previous is not None:
+            yield previous
+
+    pairs = latest(
+        external_sort(records(), work_dir, write_pairs, read_pairs, chunk_size)
+    )
+    return iter(lambda: list(islice(pairs, CSV_BATCH_SIZE)), [])
+
+
 class FileSystemHandler:
     """Generate sitemaps from data in the filesystem and write them to disk"""
 
+    def __init__(
+        self,
+        max_urls_per_sitemap: int = MAX_URLS_PER_SITEMAP,
+        max_sitemap_bytes: int = MAX_SITEMAP_BYTES,
+        compress: bool = False,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+        verify_pregenerated_xml: bool = True,
+        hardlink_pregenerated_xml: bool = False,
+        lastmod_store: Path | None = None,
+        delta: bool = False,
+        sink: OutputSink | None = None,
+        check_duplicates: Literal["warn", "fail"] | None = None,
+        csv_range_size: int = 0,
+        shard: Shard | None = None,
+        sort_ids: bool = False,
+        profiler: Profiler | None = None,
+    ):
+        if shard and delta:
+            raise ValueError("Delta sitemaps can't be written by a sharded build")
+        self.max_urls_per_sitemap = max_urls_per_sitemap
+        self.max_sitemap_bytes = max_sitemap_bytes
+        self.compress = compress
+        self.compression_level = compression_level
+        self.verify_pregenerated_xml = verify_pregenerated_xml
+        self.hardlink_pregenerated_xml = hardlink_pregenerated_xml
+        self.lastmod_store = lastmod_store
+        self.delta = delta
+        self.sink = sink
+        self.check_duplicates = check_duplicates
+        self.csv_range_size = csv_range_size
+        self.shard = shard
+        self.sort_ids = sort_ids
+        self.profiler = profiler
+
+    def __getstate__(self) -> dict:
+        # sinks and profilers hold clients and threads; workers only write
+        # to staging
+        state = self.__dict__.copy()
+        state["sink"] = None
+        state["profiler"] = None
+        return state
+
+    def span(self, name: str) -> AbstractContextManager[None]:
+        """Profiler span named `name`, if the handler has a profiler"""
+        return self.profiler.span(name) if self.profiler else nullcontext()
+
+    @property
+    def manifest_settings(self) -> dict:
+        """Settings that change the output; recorded in the build manifest"""
+        settings = {
+            "max_urls_per_sitemap": self.max_urls_per_sitemap,
+            "max_sitemap_bytes": self.max_sitemap_bytes,
+            "compress": self.compress,
+            "compression_level": self.compression_level,
+            "lastmod": self.lastmod_store is not None,
+            "delta": self.delta,
+        }
+        # only recorded when set, so manifests of runs without splitting
+        # stay valid
+        if self.csv_range_size:
+            settings["csv_range_size"] = self.csv_range_size
+        if self.sort_ids:
+            settings["sort_ids"] = True
+        return settings
+
+    @property
+    def staging_name(self) -> str:
+        """Staging directory of this handler's runs in the output directory"""
+        return self.shard.staging_name if self.shard else STAGING_DIR
+
+    @property
+    def manifest_name(self) -> str:
+        """
+        Build manifest of this handler's runs. The shards of a split build
+        each keep their own, which `merge-index` combines
+        """
+        return self.shard.manifest_name if self.shard else MANIFEST_FILENAME
+
+    @property
+    def sitemap_suffix(self) -> str:
+        """Extension of the sitemap files written by this handler"""
+        return ".xml.gz" if self.compress else ".xml"
+
     def generate(
-        self, namespace_input_dir: Path, uri_base: str, sitemap_output_dir: Path
-    ) -> None:
+        self,
+        namespace_input_dir: Path,
+        uri_base: str,
+        sitemap_output_dir: Path,
+        full: bool = False,
+        workers: int = 1,
+        rebuild: Collection[Path] = (),
+    ) -> RunMetrics:
         """
         Generate a sitemap index xml and sitemaps from the input directory
-        and write them to disk in the output directory
+        and write them to disk in the output directory. Sources whose inputs
+        are unchanged since the last run, according to the build manifest
+        in the output directory, are not regenerated unless `full` is set
+        or their path is in `rebuild`.
+        With more than one worker, sources are generated in a process pool;
+        the index is still written by this process in source order.
+
+        If the handler has a sink, finished files are published to it and
+        the output directory only holds the manifest, snapshots and staged
+        files of the run; otherwise they are committed to the output
+        directory itself.
 
-        :returns: `None`
+        With `check_duplicates`, pids mapped more than once across the
+        sources are logged before anything is generated, and with "fail"
+        the run stops there if any are found
+
+        :returns: `RunMetrics` with timings and sizes for every source
         """
-        sources = get_all_sitemap_sources(namespace_input_dir)
+        with self.sink or LocalSink(sitemap_output_dir) as sink:
+            metrics = self._generate(
+                namespace_input_dir,
+                uri_base,
+                sitemap_output_dir,
+                full,
+                workers,
+                sink,
+                rebuild,
+            )
 
-        for source in sources:
-            if source.metadata.get("skip_crawling"):
-                LOGGER.info(f"Skipping generating sitemap for {source.path}")
-                continue
+        failures = [result for result in metrics.sources if result.error]
+        if failures:
+            failed = ", ".join(str(result.source_path) for result in failures)
+            raise SitemapGenerationError(
+                f"Failed to generate sitemaps for {len(failures)} sources: {failed}",
+                metrics,
+            )
+        return metrics
+
+    def _generate(
+        self,
+        namespace_input_dir: Path,
+        uri_base: str,
+        sitemap_output_dir: Path,
+        full: bool,
+        workers: int,
+        sink: OutputSink,
+        rebuild: Collection[Path] = (),
+    ) -> RunMetrics:
+        metrics = RunMetrics(namespace_input_dir)
+        run_start = time.perf_counter()
+
+        with self.span("scan"):
+            sources = get_all_sitemap_sources(namespace_input_dir)
+        metrics.scan_seconds = time.perf_counter() - run_start
+        shard_counts: dict[Path, int] = {}
+
+        settings = self.manifest_settings
+        with self.span("manifest"):
+            previous = (
+                BuildManifest(settings)
+                if full
+                else BuildManifest.load(
+                    sitemap_output_dir, settings, self.manifest_name
+                )
+            )
+            recorded = BuildManifest.read(
+                sitemap_output_dir, self.manifest_name
+            ) or BuildManifest(settings)
+        manifest = BuildManifest(settings)
+        changes = OutputChanges()
+        kept: set[str] = set()
+        staging = reset_staging_dir(sitemap_output_dir, self.staging_name)
+
+        if self.check_duplicates:
+            staging.mkdir(parents=True, exist_ok=True)
+            with self.span("duplicates"):
+                report = find_duplicates(pid_sources(sources), work_dir=staging)
+            report.log(namespace_input_dir)
+            metrics.duplicate_pids = len(report.duplicates)
+            metrics.conflicting_pids = len(report.conflicts)
+            if report.duplicates and self.check_duplicates == "fail":
+                raise SitemapGenerationError(f"Found {report.summary()}", metrics)
+
+        # the first run with deltas enabled only records the baseline snapshots
+        record_delta = self.delta and (sitemap_output_dir / SNAPSHOT_DIR).exists()
+
+        # results are kept in source order, with None for sources that
+        # still have to be generated
+        results: list[SourceResult | None] = []
+        tasks: list[tuple[str, SitemapSourceWithMetadata, Path]] = []
+        task_slots: list[int] = []
+        with self.span("select"):
+            own_shard = self.shard.index if self.shard else 0
+            assignment = (
+                assign_shards(sources, namespace_input_dir, self.shard.count)
+                if self.shard
+                else [own_shard] * len(sources)
+            )
+            for position, source in enumerate(sources):
+                if assignment[position] != own_shard:
+                    # another machine generates this source now; its sitemaps
+                    # are left for that machine, and merge-index, to replace
+                    key = source.path.relative_to(namespace_input_dir).as_posix()
+                    if key in recorded.entries:
+                        kept.update(recorded.entries[key].outputs)
+                    continue
+                if source.metadata.get("skip_crawling"):
+                    LOGGER.info(f"Skipping generating sitemap for {source.path}")
+                    results.append(
+                        SourceResult(
+                            source.path,
+                            file_type=source.file_type,
+                            skip_reason="skip_crawling",
+                        )
+                    )
+                    continue
+
+                manifest_key = source.path.relative_to(namespace_input_dir).as_posix()
+                unchanged = (
+                    None
+                    if source.path in rebuild
+                    else previous.unchanged_outputs(
+                        manifest_key, source, sitemap_output_dir, sink.exists
+                    )
+                )
+                if unchanged is not None:
+                    LOGGER.info(f"Skipping unchanged source {source.path}")
+                    entry = previous.entries[manifest_key]
+                    manifest.entries[manifest_key] = entry
+                    shard_counts[source.path] = len(unchanged)
+                    changes.unchanged.extend(unchanged)
+                    results.append(
+                        SourceResult(
+                            source.path,
+                            outputs=unchanged,
+                            url_count=entry.url_count,
+                            bytes_written=entry.bytes_written,
+                            file_type=source.file_type,
+                            skip_reason="unchanged",
+                        )
+                    )
+                    continue
+
+                sitemap_location = source.canonical_sitemap_name(namespace_input_dir)
+                output_path = (sitemap_output_dir / sitemap_location).with_suffix(
+                    self.sitemap_suffix
+                )
+                tasks.append((manifest_key, source, output_path))
+                task_slots.append(len(results))
+                results.append(None)
+
+        generate_start = time.perf_counter()
+        with self.span("generate"):
+            generated = self._run_tasks(
+                tasks, sitemap_output_dir, workers, record_delta
+            )
+            for slot, (manifest_key, _, _), result in zip(task_slots, tasks, generated):
+                results[slot] = result
+                if result.error:
+                    LOGGER.error(
+                        f"Failed to generate {result.source_path}: {result.error}"
+                    )
+                    # keep the last good sitemaps of a failing source on disk
+                    if manifest_key in recorded.entries:
+                        kept.update(recorded.entries[manifest_key].outputs)
+                    continue
+                if not result.outputs:
+                    continue
+                assert result.manifest_entry is not None
+                manifest.entries[manifest_key] = result.manifest_entry
+                shard_counts[result.source_path] = len(result.outputs)
+                with self.span("commit"):
+                    for path in result.outputs:
+                        name = path.relative_to(sitemap_output_dir).as_posix()
+                        changed = sink.commit(
+                            staged_path(path, sitemap_output_dir, self.staging_name),
+                            name,
+                        )
+                        changes.record(path, changed)
+                        if changed:
+                            LOGGER.info(f"Wrote {name} to {sink}")
+                        else:
+                            LOGGER.debug(f"Left unchanged {name} in {sink}")
+                LOGGER.debug(
+                    f"Generated {result.url_count} urls ({result.bytes_written} bytes) "
+                    f"from {result.source_path} in {result.seconds:.3f}s"
+                )
+        metrics.generate_seconds = time.perf_counter() - generate_start
+        metrics.sources = [result for result in results if result is not None]
+
+        index_start = time.perf_counter()
+        with self.span("index"):
+            sink.flush()
+            if self.shard:
+                self.publish_index_fragment(
+                    sources,
+                    namespace_input_dir,
+                    shard_counts,
+                    uri_base,
+                    staging,
+                    sitemap_output_dir,
+                    sink,
+                    changes,
+                )
+                # the index belongs to merge-index
+                manifest.run_outputs.append(self.shard.fragment_name)
+            else:
+                index = self.make_sitemap_index(
+                    base_uri=uri_base,
+                    sources=[src for src in sources if src.path in shard_counts],
+                    root_dir=namespace_input_dir,
+                    shard_counts=shard_counts,
+                )
+                # the top level index is committed last, once every sitemap it
+                # points at is in place
+                staged_index = self.write_sitemap_index(index, uri_base, staging)
+                with self.span("commit"):
+                    for staged in staged_index:
+                        name = staged.relative_to(staging).as_posix()
+                        changes.record(
+                            final_path(staged, sitemap_output_dir),
+                            sink.commit(staged, name),
+                        )
+                        manifest.run_outputs.append(name)
+                LOGGER.info(f"Wrote sitemap index to {sink}/sitemap.xml")
+        if self.delta:
+            with self.span("delta"):
+                current = self.delta_source_names(sources, namespace_input_dir)
+                if record_delta:
+                    self.write_delta_index(
+                        uri_base, current, metrics, sitemap_output_dir
+                    )
+                self.publish_delta(staging, sitemap_output_dir, sink, manifest, changes)
+        with self.span("publish"):
+            sink.flush()
+            if self.delta:
+                commit_snapshots(sitemap_output_dir, current)
+            manifest.save(sitemap_output_dir, self.manifest_name)
+            changes.removed = remove_stale_outputs(
+                sink, recorded.outputs(), manifest.outputs() | kept
+            )
+            reset_staging_dir(sitemap_output_dir, self.staging_name)
+        metrics.files_changed = len(changes.changed)
+        metrics.files_unchanged = len(changes.unchanged)
+        metrics.files_removed = len(changes.removed)
+        LOGGER.info(changes.summary())
+        metrics.index_seconds = time.perf_counter() - index_start
+        metrics.total_seconds = time.perf_counter() - run_start
+        return metrics
 
-            tree = self.make_sitemap(source)
-            skip_including_in_sitemap_index = not tree
-            if skip_including_in_sitemap_index:
+    def publish_index_fragment(
+        self,
+        sources: list[SitemapSourceWithMetadata],
+        namespace_input_dir: Path,
+        shard_counts: dict[Path, int],
+        uri_base: str,
+        staging: Path,
+        sitemap_output_dir: Path,
+        sink: OutputSink,
+        changes: OutputChanges,
+    ) -> None:
+        """
+        Commit the index fragment of this machine's shard of the build,
+        for `merge-index` to combine with the others
+        """
+        assert self.shard is not None
+        name = self.shard.fragment_name
+        fragment = make_index_fragment(
+            self.shard,
+            sources,
+            namespace_input_dir,
+            shard_counts,
+            uri_base,
+            self.manifest_settings,
+        )
+        staged = write_index_fragment(fragment, staging / name)
+        changes.record(
+            final_path(staged, sitemap_output_dir, self.staging_name),
+            sink.commit(staged, name),
+        )
+        LOGGER.info(f"Wrote index fragment to {sink}/{name}")
+
+    def publish_delta(
+        self,
+        staging: Path,
+        sitemap_output_dir: Path,
+        sink: OutputSink,
+        manifest: BuildManifest,
+        changes: OutputChanges,
+    ) -> None:
+        """
+        Commit the delta sitemaps staged by this run to the sink, with the
+        delta index last, and record them in the manifest. Deltas only
+        describe a single run, so those of the previous one are removed
+        with the other stale outputs
+        """
+        delta_dir = staging / DELTA_DIR
+        staged = (
+            sorted(path for path in delta_dir.rglob("*") if path.is_file())
+            if delta_dir.exists()
+            else []
+        )
+        staged += [staging / DELTA_REMOVED, staging / DELTA_INDEX]
+        for path in staged:
+            if not path.exists():
                 continue
+            name = path.relative_to(staging).as_posix()
+            changes.record(
+                final_path(path, sitemap_output_dir), sink.commit(path, name)
+            )
+            manifest.run_outputs.append(name)
+
+    def split_ranges(self, source: SitemapSourceWithMetadata) -> list[ByteRange]:
+        """
+        Byte ranges a one_to_one_csv larger than `csv_range_size` is
+        generated in, or an empty list if it is generated whole. They only
+        depend on the file, so the shards are the same with any number of
+        workers
+        """
+        if not self.csv_range_size or source.file_type != "one_to_one_csv":
+            return []
+        # ids are sorted across the whole file
+        if self.sort_ids:
+            return []
+        if source.path.stat().st_size <= self.csv_range_size:
+            return []
+        with self.span("scan"):
+            ranges = record_ranges(source.path, self.csv_range_size)
+        if ranges is None:
+            LOGGER.warning(
+                f"Can't find row boundaries in {source.path}, likely because of "
+                "unbalanced quotes; generating it without splitting"
+            )
+            return []
+        return ranges if len(ranges) > 1 else []
+
+    def _run_tasks(
+        self,
+        tasks: list[tuple[str, SitemapSourceWithMetadata, Path]],
+        sitemap_output_dir: Path,
+        workers: int,
+        record_delta: bool = False,
+    ) -> Iterator[SourceResult]:
+        """
+        Generate every task, yielding results in the same order as `tasks`.
+        Csvs that are split into byte ranges become one job per range plus
+        one that describes the whole source, and all jobs share the pool
+        """
+        task_jobs = []
+        for _, source, output_path in tasks:
+            ranges = self.split_ranges(source)
+            if ranges:
+                LOGGER.info(f"Generating {source.path} in {len(ranges)} ranges")
+            task_jobs.append(
+                [
+                    (generate_range, (source, output_path, sitemap_output_dir, *job))
+                    for job in enumerate(ranges)
+                ]
+                + [
+                    (
+                        describe_split_source if ranges else generate_source,
+                        (source, output_path, sitemap_output_dir, record_delta),
+                    )
+                ]
+            )
+        results = self._run_jobs([job for jobs in task_jobs for job in jobs], workers)
+
+        for (_, source, output_path), jobs in zip(tasks, task_jobs):
+            done = [next(results) for _ in jobs]
+            if len(done) == 1:
+                yield done[0]
+            else:
+                yield merge_ranges(
+                    source,
+                    output_path,
+                    sitemap_output_dir,
+                    done[:-1],
+                    done[-1],
+                    self.staging_name,
+                )
 
-            sitemap_location = source.canonical_sitemap_name(namespace_input_dir)
-            output_path = (sitemap_output_dir / sitemap_location).with_suffix(".xml")
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            write_tree_to_file(tree, output_path)
-            LOGGER.info(f"Wrote {output_path} to disk")
+    def _run_jobs(
+        self, jobs: list[tuple[Callable, tuple]], workers: int
+    ) -> Iterator[SourceResult]:
+        """
+        Call every job with this handler, yielding results in job order. In
+        a pool, the next job is only submitted once the oldest one finished
+        """
+        if workers <= 1 or len(jobs) <= 1:
+            for function, args in jobs:
+                with self.span(args[0].file_type):
+                    result = function(self, *args)
+                yield result
+            return
+
+        # only as many jobs as there are workers are in flight, so staged
+        # output is committed as it finishes rather than piling up
+        remaining = iter(jobs)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending: deque[tuple[Future, tuple]] = deque(
+                (executor.submit(function, self, *args), args)
+                for function, args in islice(remaining, workers)
+            )
+            while pending:
+                future, args = pending.popleft()
+                try:
+                    result = future.result()
+                except Exception as e:  # noqa: BLE001
+                    # the worker process itself died, e.g. it was OOM killed
+                    source = args[0]
+                    result = SourceResult(source.path, error=f"{type(e).__name__}: {e}")
+                for function, next_args in islice(remaining, 1):
+                    pending.append(
+                        (executor.submit(function, self, *next_args), next_args)
+                    )
+                yield result
 
-        index = self.make_sitemap_index(
-            base_uri=uri_base, sources=sources, root_dir=namespace_input_dir
+    def delta_source_names(
+        self, sources: list[SitemapSourceWithMetadata], namespace_input_dir: Path
+    ) -> set[str]:
+        """Names of the sources whose pids are snapshotted for deltas"""
+        return {
+            src.canonical_sitemap_name(namespace_input_dir)
+            for src in sources
+            if src.file_type in DELTA_FILE_TYPES
+            and not src.metadata.get("skip_crawling")
+        }
+
+    def write_delta_index(
+        self,
+        base_uri: str,
+        current: set[str],
+        metrics: RunMetrics,
+        sitemap_output_dir: Path,
+    ) -> None:
+        """
+        Record the pids of deleted sources as removed and stage the index
+        of delta sitemaps, along with the manifest of removed lists, to be
+        published next to `sitemap.xml`
+        """
+        deltas = [result.delta for result in metrics.sources if result.delta]
+        deltas += delta_deleted_sources(
+            sitemap_output_dir,
+            current,
+            self.sitemap_suffix,
+            self.max_urls_per_sitemap,
+            self.max_sitemap_bytes,
+        )
+        lastmod = datettime_to_sitemap_iso_format(metrics.started_at)
+        staging = staging_dir(sitemap_output_dir)
+        write_removed_manifest(
+            make_removed_manifest(base_uri, deltas, sitemap_output_dir, lastmod),
+            staging / DELTA_REMOVED,
+        )
+        index = make_delta_index(base_uri, deltas, sitemap_output_dir, lastmod)
+        staging.mkdir(parents=True, exist_ok=True)
+        write_tree_to_file(index, staging / DELTA_INDEX)
+        LOGGER.info(f"Staged delta index for {len(deltas)} sources")
+
+    def iter_source_pids(self, source: SitemapSourceWithMetadata) -> Iterator[str]:
+        """Yield every geoconnex pid a source contributes to the sitemaps"""
+        match source.file_type:
+            case "one_to_one_csv":
+                yield from iter_column(source.path, "id")
+            case "pregenerated_xml":
+                yield from iter_urlset_locs(source.path)
+            case "bulk":
+                dump = source_dump(source)
+                if dump:
+                    yield from dump.iter_pids()
+
+    def write_sitemap(
+        self, source: SitemapSourceWithMetadata, output_path: Path
+    ) -> SourceResult:
+        """
+        Write the sitemap associated with a source to `output_path`.
+        one_to_one_csv, pregenerated_xml and bulk sources with a dump are
+        streamed entry by entry so memory use does not depend on the size of
+        the source, and are split into numbered shards once they exceed the
+        sitemap limits.
+        pregenerated_xml sources within the limits are copied as is.
+        Everything else is serialized from the tree returned by `make_sitemap`
+
+        :returns: `SourceResult` listing the files written, which is empty if
+            the source was skipped
+        """
+        match source.file_type:
+            case "one_to_one_csv":
+                return self._write_one_to_one_csv(source, output_path)
+            case "pregenerated_xml":
+                return self._write_pregenerated_xml(source, output_path)
+            case "bulk":
+                dump = source_dump(source)
+                if dump:
+                    return self._write_bulk_dump(source, dump, output_path)
+
+        start = time.perf_counter()
+        tree = self.make_sitemap(source)
+        parse_seconds = time.perf_counter() - start
+        if not tree:
+            return SourceResult(source.path, parse_seconds=parse_seconds)
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        write_tree_to_file(tree, output_path, self.compression_level)
+        root = tree.getroot()
+        return SourceResult(
+            source.path,
+            [output_path],
+            len(root) if root is not None else 0,
+            parse_seconds=parse_seconds,
+            write_seconds=time.perf_counter() - start - parse_seconds,
+        )
+
+    def _write_one_to_one_csv(
+        self,
+        source: SitemapSourceWithMetadata,
+        output_path: Path,
+        byte_range: ByteRange | None = None,
+    ) -> SourceResult:
+        """
+        Stream the ids of a one_to_one_csv, or of the rows in `byte_range`,
+        into sharded urlsets. Rows are read in batches so csv parsing and
+        xml writing can be timed separately without a clock call per row.
+        Only the id column is read, unless a lastmod store needs every url
+        to get the time its csv row last changed. With `sort_ids` the ids
+        are sorted and deduplicated before they are written.
+        Each batch is profiled in the read, resolve and write spans, and
+        finishing the shards in the compress span
+        """
+        parse_seconds = 0.0
+        write_seconds = 0.0
+        if self.lastmod_store:
+            rows = iter_ids_and_rows(source.path, byte_range)
+            batches = iter(lambda: list(islice(rows, CSV_BATCH_SIZE)), [])
+        else:
+            batches = iter_column_batches(source.path, "id", byte_range=byte_range)
+        with (
+            (
+                LastmodStore(self.lastmod_store)
+                if self.lastmod_store
+                else nullcontext()
+            ) as store,
+            self._sharded_writer(output_path) as writer,
+        ):
+            if self.sort_ids:
+                batches = sorted_id_batches(batches, store, output_path.parent)
+            while True:
+                start = time.perf_counter()
+                with self.span("read"):
+                    batch = next(batches, None)
+                parsed = time.perf_counter()
+                parse_seconds += parsed - start
+                if batch is None:
+                    break
+                lastmods: list[str] = []
+                if store and not self.sort_ids:
+                    # sorted batches had their lastmods looked up before sorting
+                    with self.span("resolve"):
+                        lastmods = store.lastmods(batch)
+                with self.span("write"):
+                    if self.sort_ids:
+                        for pid, lastmod in batch:
+                            writer.write_loc(pid, lastmod or None)
+                    elif store:
+                        for (pid, _), lastmod in zip(batch, lastmods):
+                            writer.write_loc(pid, lastmod)
+                    else:
+                        for pid in batch:
+                            writer.write_loc(pid)
+                write_seconds += time.perf_counter() - parsed
+            start = time.perf_counter()
+            # closing a shard flushes the compressor and writes the footer
+            with self.span("compress"):
+                writer.close()
+            write_seconds += time.perf_counter() - start
+        return SourceResult(
+            source.path,
+            writer.shards,
+            writer.url_count,
+            parse_seconds=parse_seconds,
+            write_seconds=write_seconds,
+        )
+
+    def _write_bulk_dump(
+        self, source: SitemapSourceWithMetadata, dump: BulkDump, output_path: Path
+    ) -> SourceResult:
+        """
+        Stream the pids of a bulk source's dump into sharded urlsets,
+        sorting and deduplicating them with `sort_ids`
+        """
+        parse_seconds = 0.0
+        write_seconds = 0.0
+        pids = dump.iter_pids()
+        batches = iter(lambda: list(islice(pids, CSV_BATCH_SIZE)), [])
+        if self.sort_ids:
+            batches = (
+                [pid for pid, _ in batch]
+                for batch in sorted_id_batches(batches, None, output_path.parent)
+            )
+        with self._sharded_writer(output_path) as writer:
+            while True:
+                start = time.perf_counter()
+                batch = next(batches, None)
+                parsed = time.perf_counter()
+                parse_seconds += parsed - start
+                if batch is None:
+                    break
+                for pid in batch:
+                    writer.write_loc(pid)
+                write_seconds += time.perf_counter() - parsed
+        return SourceResult(
+            source.path,
+            writer.shards,
+            writer.url_count,
+            parse_seconds=parse_seconds,
+            write_seconds=write_seconds,
+        )
+
+    def _write_pregenerated_xml(
+        self, source: SitemapSourceWithMetadata, output_path: Path
+    ) -> SourceResult:
+        """
+        Copy a pregenerated sitemap to the output byte for byte when it is
+        within the sitemap limits, only reserializing it when it has to be
+        split into shards
+        """
+        size = source.path.stat().st_size
+        if self.verify_pregenerated_xml:
+            url_count = count_urlset_entries(source.path)
+        else:
+            url_count = scan_url_entry_count(source.path)
+
+        if url_count > self.max_urls_per_sitemap or size > self.max_sitemap_bytes:
+            with self._sharded_writer(output_path) as writer:
+                for entry in iter_urlset_entries(source.path):
+                    writer.write(entry)
+            return SourceResult(source.path, writer.shards, writer.url_count)
+
+        if self.compress:
+            with self.span("compress"):
+                compress_file(source.path, output_path, self.compression_level)
+        else:
+            copy_file(source.path, output_path, hardlink=self.hardlink_pregenerated_xml)
+        return SourceResult(source.path, [output_path], url_count)
+
+    def _sharded_writer(self, output_path: Path) -> ShardedUrlsetWriter:
+        return ShardedUrlsetWriter(
+            output_path,
+            max_urls=self.max_urls_per_sitemap,
+            max_bytes=self.max_sitemap_bytes,
+            compression_level=self.compression_level,
         )
-        write_tree_to_file(index, sitemap_output_dir / "sitemap.xml")
-        LOGGER.info(f"Wrote sitemap index to disk at {sitemap_output_dir}/sitemap.xml")
 
     def make_sitemap(self, source: SitemapSourceWithMetadata) -> ET.ElementTree | Any:
         """
@@ -140,10 +1163,15 @@ class FileSystemHandler:
                 raise ValueError(f"Unknown file type: {source.file_type}")
 
     def make_sitemap_index(
-        self, base_uri: str, sources: list[SitemapSourceWithMetadata], root_dir: Path
+        self,
+        base_uri: str,
+        sources: list[SitemapSourceWithMetadata],
+        root_dir: Path,
+        shard_counts: dict[Path, int] | None = None,
     ) -> ET.ElementTree:
         """
         Builds a sitemap index XML from CSV files and their metadata.
+        Sources that were split into several shards get one entry per shard
         """
 
         xml_root = ET.fromstring(SITEMAPINDEX)
@@ -157,8 +1185,86 @@ class FileSystemHandler:
                 continue
             if src.metadata.get("skip_crawling"):
                 continue
-            sitemap_element = src.source_to_xml_for_index(base_uri, root_dir)
-            ET.indent(sitemap_element, space="  ")
-            xml_root.append(sitemap_element)
+            shards = (shard_counts or {}).get(src.path, 1)
+            for shard in range(shards) if shards > 1 else [None]:
+                sitemap_element = src.source_to_xml_for_index(
+                    base_uri, root_dir, shard=shard, suffix=self.sitemap_suffix
+                )
+                ET.indent(sitemap_element, space="  ")
+                xml_root.append(sitemap_element)
 
         return tree
+
+    def split_index_entries(self, entries: list[ET.Element]) -> list[list[ET.Element]]:
+        """
+        Group sitemap index entries so that no index file holds more than
+        `max_urls_per_sitemap` entries or `max_sitemap_bytes` bytes. An
+        entry is measured serialized on its own, with its own namespace
+        declarations, which overestimates its size inside the index
+
+        :returns: `list` of entry groups, one per index file
+        """
+        header = ET.fromstring(SITEMAPINDEX)
+        overhead = len(ET.tostring(header, encoding="utf-8", xml_declaration=True))
+        groups: list[list[ET.Element]] = [[]]
+        size = overhead
+        for entry in entries:
+            entry_size = len(ET.tostring(entry, encoding="utf-8"))
+            group = groups[-1]
+            if group and (
+                len(group) >= self.max_urls_per_sitemap
+                or size + entry_size > self.max_sitemap_bytes
+            ):
+                group = []
+                groups.append(group)
+                size = overhead
+            group.append(entry)
+            size += entry_size
+        return groups
+
+    def write_sitemap_index(
+        self, index: ET.ElementTree, base_uri: str, sitemap_output_dir: Path
+    ) -> list[Path]:
+        """
+        Write the sitemap index to `sitemap.xml` in the output directory.
+        If it has more entries or bytes than a single sitemap may hold, the
+        entries are split into `sitemap__N.xml` child indexes and
+        `sitemap.xml` becomes a nested index pointing at them, each dated by
+        the newest entry it lists
+
+        :returns: `list` of the index files written
+        """
+        index_path = sitemap_output_dir / "sitemap.xml"
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        root = index.getroot()
+        assert root is not None
+        entries = list(root)
+        groups = self.split_index_entries(entries)
+        if len(groups) == 1:
+            write_tree_to_file(index, index_path)
+            return [index_path]
+
+        written = []
+        top_root = ET.fromstring(SITEMAPINDEX)
+        for shard, group in enumerate(groups):
+            child_root = ET.fromstring(SITEMAPINDEX)
+            child_root.extend(group)
+            child_path = shard_path(index_path, shard)
+            write_tree_to_file(ET.ElementTree(child_root), child_path)
+            written.append(child_path)
+
+            sitemap_el = ET.SubElement(top_root, f"{{{SITEMAP_NS}}}sitemap")
+            loc = ET.SubElement(sitemap_el, f"{{{SITEMAP_NS}}}loc")
+            loc.text = f"{base_uri}/sitemap/{child_path.name}"
+            # timestamps share one utc format, so the newest sorts last
+            lastmods = [
+                el.text for el in child_root.iter(f"{{{SITEMAP_NS}}}lastmod") if el.text
+            ]
+            if lastmods:
+                lastmod = ET.SubElement(sitemap_el, f"{{{SITEMAP_NS}}}lastmod")
+                lastmod.text = max(lastmods)
+            ET.indent(sitemap_el, space="  ")
+
+        write_tree_to_file(ET.ElementTree(top_root), index_path)
+        written.append(index_path)
+        return written
@@ -0,0 +1,268 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Persisted build manifest used to skip regenerating unchanged sources"""
+
+import hashlib
+import json
+import logging
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from sitemap_generator.bulk import source_dump
+from sitemap_generator.util import SitemapSourceWithMetadata
+
+LOGGER = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = ".sitemap-manifest.json"
+MANIFEST_VERSION = 1
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    """Hash a file in fixed size chunks so memory use stays constant"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def metadata_sha256(metadata: dict) -> str:
+    """Hash the metadata associated with a source independent of key order"""
+    return hashlib.sha256(
+        json.dumps(metadata, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    size: int
+    mtime_ns: int
+    sha256: str
+    metadata_sha256: str
+    outputs: list[str] = field(default_factory=list)
+    url_count: int = 0
+    bytes_written: int = 0
+    # size and mtime of the dump of a bulk source
+    dump_size: int | None = None
+    dump_mtime_ns: int | None = None
+
+
+class BuildManifest:
+    """
+    Maps every source path (relative to the namespace directory) to the
+    state of its inputs and the sitemaps produced from it during a run.
+    The manifest is stored in the output directory next to `sitemap.xml`
+    """
+
+    def __init__(
+        self,
+        settings: dict,
+        entries: dict[str, ManifestEntry] | None = None,
+        run_outputs: list[str] | None = None,
+    ):
+        self.settings = settings
+        self.entries: dict[str, ManifestEntry] = entries or {}
+        # outputs of the run as a whole rather than of one source, like
+        # the sitemap index and delta sitemaps
+        self.run_outputs: list[str] = run_outputs or []
+        self.version = MANIFEST_VERSION
+
+    @classmethod
+    def read(
+        cls, sitemap_output_dir: Path, filename: str = MANIFEST_FILENAME
+    ) -> "BuildManifest | None":
+        """
+        Read the manifest from the output directory whatever settings it
+        was produced with, or `None` if there is none or it can't be read
+        """
+        path = sitemap_output_dir / filename
+        if not path.exists():
+            return None
+
+        try:
+            data = json.loads(path.read_text())
+            manifest = cls(
+                data.get("settings"),
+                {key: ManifestEntry(**entry) for key, entry in data["entries"].items()},
+                data.get("run_outputs", []),
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            LOGGER.warning(f"Ignoring unreadable build manifest {path}: {e}")
+            return None
+        manifest.version = data.get("version")
+        return manifest
+
+    @classmethod
+    def load(
+        cls, sitemap_output_dir: Path, settings: dict, filename: str = MANIFEST_FILENAME
+    ) -> "BuildManifest":
+        """
+        Load the manifest from the output directory. An empty manifest is
+        returned if there is none, it can't be read, or it was produced with
+        different settings, forcing every source to be rebuilt
+        """
+        manifest = cls.read(sitemap_output_dir, filename)
+        if manifest is None:
+            return cls(settings)
+
+        if manifest.version != MANIFEST_VERSION or manifest.settings != settings:
+            LOGGER.info("Build settings changed; rebuilding all sources")
+            return cls(settings)
+
+        return manifest
+
+    @classmethod
+    def combine(
+        cls, manifests: list["BuildManifest"], settings: dict
+    ) -> "BuildManifest":
+        """
+        Combine the manifests of runs that each generated part of the
+        sources, like the shards of a split build, into the manifest of
+        the whole tree
+        """
+        combined = cls(settings)
+        for manifest in manifests:
+            combined.entries.update(manifest.entries)
+            combined.run_outputs.extend(
+                name
+                for name in manifest.run_outputs
+                if name not in combined.run_outputs
+            )
+        return combined
+
+    def outputs(self) -> set[str]:
+        """Every file in the output directory recorded by this manifest"""
+        outputs = set(self.run_outputs)
+        for entry in self.entries.values():
+            outputs.update(entry.outputs)
+        return outputs
+
+    def save(self, sitemap_output_dir: Path, filename: str = MANIFEST_FILENAME) -> None:
+        path = sitemap_output_dir / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "entries": {key: asdict(entry) for key, entry in self.entries.items()},
+            "run_outputs": self.run_outputs,
+        }
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2, sort_keys=True))
+        tmp_path.replace(path)
+
+    def unchanged_outputs(
+        self,
+        key: str,
+        source: SitemapSourceWithMetadata,
+        sitemap_output_dir: Path,
+        exists: Callable[[str], bool] | None = None,
+    ) -> list[Path] | None:
+        """
+        Return the outputs recorded for a source if its inputs have not
+        changed since they were produced and they all still exist,
+        otherwise `None`. The content hash is only computed when the size
+        and mtime alone can't prove the source is unchanged. `exists` is
+        called with the name of each output; by default outputs are looked
+        for on disk below the output directory
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.metadata_sha256 != metadata_sha256(source.metadata):
+            return None
+
+        stat = source.path.stat()
+        if stat.st_size != entry.size:
+            return None
+        if stat.st_mtime_ns != entry.mtime_ns:
+            if file_sha256(source.path) != entry.sha256:
+                return None
+            entry.mtime_ns = stat.st_mtime_ns
+
+        if exists is None:
+            missing = [
+                o for o in entry.outputs if not (sitemap_output_dir / o).exists()
+            ]
+        else:
+            missing = [o for o in entry.outputs if not exists(o)]
+        if missing or not self.dump_unchanged(entry, source):
+            return None
+        return [sitemap_output_dir / output for output in entry.outputs]
+
+    @staticmethod
+    def dump_unchanged(entry: ManifestEntry, source: SitemapSourceWithMetadata) -> bool:
+        """
+        Whether the dump of a bulk source has the size and mtime recorded
+        for it. Dumps can be far larger than any csv, so they are not hashed
+        """
+        try:
+            dump = source_dump(source)
+            stat = dump.path.stat() if dump else None
+        except (OSError, ValueError):
+            # let generating the source report the problem
+            return False
+        if stat is None:
+            return entry.dump_size is None
+        return (stat.st_size, stat.st_mtime_ns) == (
+            entry.dump_size,
+            entry.dump_mtime_ns,
+        )
+
+
+def make_manifest_entry(
+    source: SitemapSourceWithMetadata,
+    outputs: list[Path],
+    sitemap_output_dir: Path,
+    url_count: int = 0,
+    bytes_written: int = 0,
+) -> ManifestEntry:
+    """Describe the current state of a source and the outputs produced from it"""
+    stat = source.path.stat()
+    dump = source_dump(source)
+    dump_stat = dump.path.stat() if dump else None
+    return ManifestEntry(
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        sha256=file_sha256(source.path),
+        metadata_sha256=metadata_sha256(source.metadata),
+        outputs=[
+            output.relative_to(sitemap_output_dir).as_posix() for output in outputs
+        ],
+        url_count=url_count,
+        bytes_written=bytes_written,
+        dump_size=dump_stat.st_size if dump_stat else None,
+        dump_mtime_ns=dump_stat.st_mtime_ns if dump_stat else None,
+    )
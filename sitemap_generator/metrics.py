@@ -0,0 +1,278 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Structured metrics describing a sitemap generation run"""
+
+import datetime
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sitemap_generator.delta import DeltaResult
+from sitemap_generator.manifest import ManifestEntry
+
+
+@dataclass
+class SourceResult:
+    """
+    Summary of the sitemaps generated for a single source. Only this small
+    record is sent back to the parent when sources are generated in a
+    process pool, never the sitemap contents
+    """
+
+    source_path: Path
+    outputs: list[Path] = field(default_factory=list)
+    url_count: int = 0
+    bytes_written: int = 0
+    seconds: float = 0.0
+    parse_seconds: float = 0.0
+    write_seconds: float = 0.0
+    file_type: str | None = None
+    skip_reason: str | None = None
+    manifest_entry: ManifestEntry | None = None
+    delta: DeltaResult | None = None
+    error: str | None = None
+
+    @property
+    def status(self) -> str:
+        if self.error:
+            return "failed"
+        if self.skip_reason:
+            return "skipped"
+        return "written"
+
+
+@dataclass
+class RunMetrics:
+    """Timings and sizes for a whole run and every source in it"""
+
+    namespace_input_dir: Path
+    started_at: datetime.datetime = field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
+    )
+    scan_seconds: float = 0.0
+    generate_seconds: float = 0.0
+    index_seconds: float = 0.0
+    total_seconds: float = 0.0
+    files_changed: int = 0
+    files_unchanged: int = 0
+    files_removed: int = 0
+    # only set when the run checked for duplicate pids
+    duplicate_pids: int | None = None
+    conflicting_pids: int | None = None
+    sources: list[SourceResult] = field(default_factory=list)
+
+    def source_name(self, result: SourceResult) -> str:
+        """Path of a source relative to the namespace directory"""
+        return result.source_path.relative_to(self.namespace_input_dir).as_posix()
+
+    def count(self, status: str) -> int:
+        return sum(1 for result in self.sources if result.status == status)
+
+    @property
+    def url_count(self) -> int:
+        return sum(result.url_count for result in self.sources)
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(result.bytes_written for result in self.sources)
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "scan_seconds": self.scan_seconds,
+            "generate_seconds": self.generate_seconds,
+            "index_seconds": self.index_seconds,
+            "total_seconds": self.total_seconds,
+            "url_count": self.url_count,
+            "bytes": self.bytes_written,
+            "sources_written": self.count("written"),
+            "sources_skipped": self.count("skipped"),
+            "sources_failed": self.count("failed"),
+            "files_changed": self.files_changed,
+            "files_unchanged": self.files_unchanged,
+            "files_removed": self.files_removed,
+            "duplicate_pids": self.duplicate_pids,
+            "conflicting_pids": self.conflicting_pids,
+            "sources": [
+                {
+                    "source": self.source_name(result),
+                    "file_type": result.file_type,
+                    "status": result.status,
+                    "skip_reason": result.skip_reason,
+                    "error": result.error,
+                    "outputs": len(result.outputs),
+                    "url_count": result.url_count,
+                    "bytes": result.bytes_written,
+                    "seconds": result.seconds,
+                    "parse_seconds": result.parse_seconds,
+                    "write_seconds": result.write_seconds,
+                }
+                for result in self.sources
+            ],
+        }
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format"""
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help: str, samples: list[tuple[dict, float]]):
+            lines.append(f"# HELP sitemap_generator_{name} {help}")
+            lines.append(f"# TYPE sitemap_generator_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(
+                    f'{key}="{escape_label_value(str(val))}"'
+                    for key, val in labels.items()
+                )
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"sitemap_generator_{name}{label_text} {value}")
+
+        metric(
+            "run_duration_seconds",
+            "gauge",
+            "Wall time of each stage of the last run",
+            [
+                ({"stage": "scan"}, self.scan_seconds),
+                ({"stage": "generate"}, self.generate_seconds),
+                ({"stage": "index"}, self.index_seconds),
+                ({"stage": "total"}, self.total_seconds),
+            ],
+        )
+        metric(
+            "run_sources",
+            "gauge",
+            "Number of sources by outcome in the last run",
+            [
+                ({"status": status}, self.count(status))
+                for status in ("written", "skipped", "failed")
+            ],
+        )
+        metric(
+            "run_files",
+            "gauge",
+            "Number of files in the output directory by change in the last run",
+            [
+                ({"change": "changed"}, self.files_changed),
+                ({"change": "unchanged"}, self.files_unchanged),
+                ({"change": "removed"}, self.files_removed),
+            ],
+        )
+        if self.duplicate_pids is not None:
+            metric(
+                "run_duplicate_pids",
+                "gauge",
+                "Number of pids mapped more than once in the last run",
+                [
+                    ({"kind": "duplicate"}, self.duplicate_pids),
+                    ({"kind": "conflicting"}, self.conflicting_pids or 0),
+                ],
+            )
+        metric(
+            "run_urls",
+            "gauge",
+            "Number of urls in all sitemaps after the last run",
+            [({}, self.url_count)],
+        )
+        metric(
+            "run_timestamp_seconds",
+            "gauge",
+            "Unix time the last run started",
+            [({}, self.started_at.timestamp())],
+        )
+
+        def source_labels(result: SourceResult) -> dict:
+            return {
+                "source": self.source_name(result),
+                "file_type": result.file_type or "",
+            }
+
+        metric(
+            "source_urls",
+            "gauge",
+            "Number of urls generated from a source",
+            [(source_labels(r), r.url_count) for r in self.sources],
+        )
+        metric(
+            "source_bytes",
+            "gauge",
+            "Size in bytes of the sitemaps generated from a source",
+            [(source_labels(r), r.bytes_written) for r in self.sources],
+        )
+        metric(
+            "source_duration_seconds",
+            "gauge",
+            "Time spent generating the sitemaps for a source in the last run",
+            [
+                ({**source_labels(r), "stage": stage}, seconds)
+                for r in self.sources
+                for stage, seconds in (
+                    ("parse", r.parse_seconds),
+                    ("write", r.write_seconds),
+                    ("total", r.seconds),
+                )
+            ],
+        )
+        metric(
+            "source_status",
+            "gauge",
+            "Outcome of a source in the last run, labelled with the skip reason",
+            [
+                (
+                    {
+                        **source_labels(r),
+                        "status": r.status,
+                        "reason": r.skip_reason or "",
+                    },
+                    1,
+                )
+                for r in self.sources
+            ],
+        )
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Path) -> None:
+        write_atomically(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: Path) -> None:
+        # node_exporter may read the textfile at any time, so never expose
+        # a partially written file
+        write_atomically(path, self.to_prometheus())
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_atomically(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text)
+    tmp_path.replace(path)
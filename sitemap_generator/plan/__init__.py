@@ -0,0 +1,179 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Estimate what a run would produce without generating sitemaps"""
+
+import json
+from pathlib import Path
+
+import click
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.plan.planner import plan_run
+from sitemap_generator.sink import is_s3_url
+from sitemap_generator.util import OPTION_VERBOSITY
+from sitemap_generator.writer import DEFAULT_COMPRESSION_LEVEL
+
+
+@click.command()
+@click.pass_context
+@OPTION_VERBOSITY
+@click.argument(
+    "namespace-input-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "-o",
+    "--sitemap-output-dir",
+    type=str,
+    envvar="SITEMAP_DIR",
+    default="/tmp/sitemaps",
+    help="output directory or s3://bucket/prefix url of the run to plan",
+)
+@click.option(
+    "--work-dir",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    envvar="SITEMAP_WORK_DIR",
+    default=Path("/tmp/sitemap-work"),
+    help="local directory holding the build manifest when writing to s3",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    default=False,
+    help="plan a run that rebuilds every sitemap",
+)
+@click.option(
+    "--gzip",
+    "compress",
+    is_flag=True,
+    default=False,
+    help="plan a run that writes gzip compressed sitemaps",
+)
+@click.option(
+    "--compression-level",
+    type=click.IntRange(min=0, max=9),
+    default=DEFAULT_COMPRESSION_LEVEL,
+    help="gzip compression level used with --gzip",
+)
+@click.option(
+    "--lastmod-store",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="SITEMAP_LASTMOD_STORE",
+    help="plan a run that gives every csv url a lastmod",
+)
+@click.option(
+    "--delta",
+    is_flag=True,
+    default=False,
+    help="plan a run that also writes delta sitemaps",
+)
+@click.option(
+    "--split-csv-mib",
+    type=click.IntRange(min=0),
+    envvar="SITEMAP_SPLIT_CSV_MIB",
+    default=0,
+    help="plan a run that splits csvs larger than this many MiB into ranges",
+)
+@click.option(
+    "--sort-ids",
+    is_flag=True,
+    default=False,
+    help="plan a run that sorts and deduplicates csv ids",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    default=False,
+    help="print the plan as JSON",
+)
+@click.option(
+    "--fail-on-warning",
+    is_flag=True,
+    default=False,
+    help="exit with status 1 if the plan has any warnings",
+)
+def plan(
+    ctx,
+    verbosity,
+    namespace_input_dir: Path,
+    sitemap_output_dir: str,
+    work_dir: Path,
+    full: bool,
+    compress: bool,
+    compression_level: int,
+    lastmod_store: Path | None,
+    delta: bool,
+    split_csv_mib: int,
+    sort_ids: bool,
+    as_json: bool,
+    fail_on_warning: bool,
+):
+    """
+    Estimate the sitemaps, urls and bytes a run would produce and which
+    sources changed since the last run, without generating anything
+    """
+    output_dir = Path(sitemap_output_dir)
+    exists = None
+    if is_s3_url(sitemap_output_dir):
+        # the manifest is all there is to go on without listing the bucket
+        output_dir = work_dir
+        exists = lambda name: True
+
+    handler = FileSystemHandler(
+        compress=compress,
+        compression_level=compression_level,
+        lastmod_store=lastmod_store,
+        delta=delta,
+        csv_range_size=split_csv_mib * 2**20,
+        sort_ids=sort_ids,
+    )
+    result = plan_run(handler, namespace_input_dir, output_dir, full, exists)
+
+    if as_json:
+        click.echo(json.dumps(result.to_dict(), indent=2))
+    else:
+        for source in result.sources:
+            if source.status in ("new", "changed"):
+                click.echo(
+                    f"{source.status:>9}  {source.source}  {source.urls} urls  "
+                    f"{source.sitemaps} sitemaps"
+                )
+        for source in result.removed_sources:
+            click.echo(f"{'removed':>9}  {source}")
+        if result.settings_changed:
+            click.echo("Settings differ from the last run; every source is rebuilt")
+        for warning in result.warnings:
+            click.echo(f"warning: {warning}", err=True)
+        click.echo(result.summary())
+
+    if fail_on_warning and result.warnings:
+        ctx.exit(1)
@@ -0,0 +1,341 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Estimate what a run would produce, and what it would change, without
+generating any sitemaps
+"""
+
+import csv
+import io
+import math
+import mmap
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from pathlib import Path
+
+from sitemap_generator.bulk import count_dump_records, source_dump
+from sitemap_generator.csv_reader import BLOCK_SIZE
+from sitemap_generator.handler.base import BULK_SITEMAP_TEMPLATE, FileSystemHandler
+from sitemap_generator.manifest import BuildManifest
+from sitemap_generator.util import (
+    SitemapSourceWithMetadata,
+    datettime_to_sitemap_iso_format,
+    get_all_sitemap_sources,
+)
+from sitemap_generator.writer import (
+    URLSET_FOOTER,
+    URLSET_HEADER,
+    scan_url_entry_count,
+    url_entry,
+)
+
+# start of a csv parsed to estimate the share of every row taken by its id
+SAMPLE_SIZE = 64 * 1024
+
+URL_ENTRY_BYTES = len(url_entry(""))
+LASTMOD_BYTES = len(url_entry("", "1970-01-01T00:00:00Z")) - URL_ENTRY_BYTES
+URLSET_BYTES = len(URLSET_HEADER) + len(URLSET_FOOTER)
+
+# lines read from the start of a bulk dump to estimate its pids
+DUMP_SAMPLE_LINES = 10_000
+
+
+def count_lines(path: Path, block_size: int = BLOCK_SIZE) -> int:
+    """
+    Count the lines of a file by counting newlines in blocks of the mapped
+    file, without decoding or parsing it. A last line without a newline is
+    counted too
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            lines = sum(
+                mapped[start : start + block_size].count(b"\n")
+                for start in range(0, size, block_size)
+            )
+            if mapped[size - 1] != ord("\n"):
+                lines += 1
+    return lines
+
+
+def id_share(path: Path) -> tuple[float, int]:
+    """
+    Parse the start of a csv to estimate what share of the bytes after the
+    header belongs to the id column
+
+    :returns: `tuple` of that share and the length of the header in bytes
+    """
+    with open(path, "rb") as f:
+        chunk = f.read(SAMPLE_SIZE)
+    header_end = chunk.find(b"\n") + 1 or len(chunk)
+    body = chunk[header_end : chunk.rfind(b"\n") + 1]
+    reader = csv.reader(
+        io.StringIO(chunk[: header_end + len(body)].decode("utf-8", errors="replace"))
+    )
+    column = next(reader, []).index("id")
+    id_bytes = sum(len(row[column].encode("utf-8")) for row in reader if row)
+    return (id_bytes / len(body) if body else 0.0), header_end
+
+
+@dataclass
+class SourcePlan:
+    source: str
+    file_type: str
+    # "new", "changed", "unchanged" or "skipped"
+    status: str
+    urls: int = 0
+    # uncompressed, which is what the sitemap limits apply to
+    bytes: int = 0
+    sitemaps: int = 0
+    # files the last run wrote for this source
+    recorded_sitemaps: int = 0
+
+    @property
+    def over_limit(self) -> bool:
+        return self.sitemaps > 1
+
+
+@dataclass
+class RunPlan:
+    sources: list[SourcePlan] = field(default_factory=list)
+    removed_sources: list[str] = field(default_factory=list)
+    removed_sitemaps: int = 0
+    settings_changed: bool = False
+    warnings: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def urls(self) -> int:
+        return sum(source.urls for source in self.sources)
+
+    @property
+    def bytes(self) -> int:
+        return sum(source.bytes for source in self.sources)
+
+    @property
+    def sitemaps(self) -> int:
+        return sum(source.sitemaps for source in self.sources)
+
+    def count(self, status: str) -> int:
+        return sum(1 for source in self.sources if source.status == status)
+
+    @property
+    def files_changed(self) -> int:
+        """
+        Upper bound of the sitemaps the run writes, plus the index; files
+        whose bytes come out the same are left as they are
+        """
+        changed = sum(
+            source.sitemaps
+            for source in self.sources
+            if source.status in ("new", "changed")
+        )
+        if changed or self.removed_sitemaps:
+            changed += 1
+        return changed
+
+    def summary(self) -> str:
+        return (
+            f"{self.sitemaps} sitemaps with {self.urls} urls and about "
+            f"{self.bytes / 2**20:.1f} MiB from {len(self.sources)} sources; "
+            f"{self.count('new')} new, {self.count('changed')} changed and "
+            f"{len(self.removed_sources)} removed sources; up to "
+            f"{self.files_changed} files written and {self.removed_sitemaps} removed"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "urls": self.urls,
+            "bytes": self.bytes,
+            "sitemaps": self.sitemaps,
+            "sources_new": self.count("new"),
+            "sources_changed": self.count("changed"),
+            "sources_unchanged": self.count("unchanged"),
+            "sources_skipped": self.count("skipped"),
+            "sources_removed": len(self.removed_sources),
+            "files_changed": self.files_changed,
+            "files_removed": self.removed_sitemaps,
+            "settings_changed": self.settings_changed,
+            "seconds": self.seconds,
+            "warnings": self.warnings,
+            "sources": [
+                {**asdict(source), "over_limit": source.over_limit}
+                for source in self.sources
+            ],
+            "removed_sources": self.removed_sources,
+        }
+
+
+def estimate_source(
+    handler: FileSystemHandler, source: SitemapSourceWithMetadata, plan: SourcePlan
+) -> None:
+    """Fill in the urls, bytes and sitemaps a source will produce"""
+    match source.file_type:
+        case "one_to_one_csv":
+            share, header_bytes = id_share(source.path)
+            plan.urls = max(count_lines(source.path) - 1, 0)
+            entry_bytes = URL_ENTRY_BYTES
+            if handler.lastmod_store:
+                entry_bytes += LASTMOD_BYTES
+            ids = round(share * (source.path.stat().st_size - header_bytes))
+            plan.bytes = URLSET_BYTES + plan.urls * entry_bytes + ids
+        case "pregenerated_xml":
+            plan.urls = scan_url_entry_count(source.path)
+            plan.bytes = source.path.stat().st_size
+        case "bulk" if dump := source_dump(source):
+            # the first lines tell how many pids a line holds and how long
+            # they are, e.g. several triples share a subject in N-Triples
+            with dump.open() as f:
+                head = list(islice(f, DUMP_SAMPLE_LINES))
+            pids = list(dump.pids_in(head))
+            lines = count_dump_records(dump.path)
+            if dump.format == "csv":
+                head, lines = head[1:], lines - 1
+            plan.urls = round(lines * len(pids) / len(head)) if head else 0
+            pid_bytes = sum(len(pid.encode("utf-8")) for pid in pids) / max(
+                len(pids), 1
+            )
+            plan.bytes = URLSET_BYTES + round(plan.urls * (URL_ENTRY_BYTES + pid_bytes))
+        case "bulk":
+            plan.urls = 1
+            plan.bytes = len(
+                BULK_SITEMAP_TEMPLATE.format(
+                    source.metadata.get("bulk_container_image"),
+                    datettime_to_sitemap_iso_format(source.last_modified),
+                ).encode("utf-8")
+            )
+        case _:
+            return
+
+    # a split csv starts new shards at every range, which is assumed to
+    # hold its share of the urls and bytes
+    size = source.path.stat().st_size
+    shares = [(end - start) / size for start, end in handler.split_ranges(source)]
+    plan.sitemaps = sum(
+        max(
+            math.ceil(plan.urls * share / handler.max_urls_per_sitemap),
+            math.ceil(plan.bytes * share / handler.max_sitemap_bytes),
+            1,
+        )
+        for share in shares or [1.0]
+    )
+    if plan.sitemaps > 1:
+        # every shard repeats the urlset header and footer
+        plan.bytes += (plan.sitemaps - 1) * URLSET_BYTES
+
+
+def plan_run(
+    handler: FileSystemHandler,
+    namespace_input_dir: Path,
+    sitemap_output_dir: Path,
+    full: bool = False,
+    exists: Callable[[str], bool] | None = None,
+) -> RunPlan:
+    """
+    Predict the outcome of `handler.generate` from the source scan and the
+    build manifest in `sitemap_output_dir`. Unchanged sources are taken
+    from the manifest as they are. Sources that changed are estimated from
+    a count of their lines or `</url>` tags and the average share of their
+    rows taken by the id, instead of being parsed
+
+    :returns: `RunPlan` for every source, in the order the run uses
+    """
+    start = time.perf_counter()
+    plan = RunPlan()
+    settings = handler.manifest_settings
+    recorded = BuildManifest.read(sitemap_output_dir)
+    plan.settings_changed = recorded is not None and recorded.settings != settings
+    previous = (
+        BuildManifest(settings)
+        if full
+        else BuildManifest.load(sitemap_output_dir, settings)
+    )
+
+    sources = get_all_sitemap_sources(namespace_input_dir)
+    keys = set()
+    for source in sources:
+        key = source.path.relative_to(namespace_input_dir).as_posix()
+        keys.add(key)
+        entry = previous.entries.get(key)
+        source_plan = SourcePlan(
+            key, source.file_type, "new" if entry is None else "changed"
+        )
+        if entry is not None:
+            source_plan.recorded_sitemaps = len(entry.outputs)
+        plan.sources.append(source_plan)
+
+        if source.metadata.get("skip_crawling") or source.file_type == "regex_csv":
+            # neither produces a sitemap
+            source_plan.status = "skipped"
+            continue
+        if entry is not None and (
+            previous.unchanged_outputs(key, source, sitemap_output_dir, exists)
+            is not None
+        ):
+            source_plan.status = "unchanged"
+            source_plan.urls = entry.url_count
+            source_plan.bytes = entry.bytes_written
+            source_plan.sitemaps = len(entry.outputs)
+            continue
+
+        try:
+            estimate_source(handler, source, source_plan)
+        except (OSError, ValueError) as e:
+            # e.g. a bulk dump that is missing or misconfigured
+            plan.warnings.append(f"Can't estimate {key}: {e}")
+            continue
+        plan.removed_sitemaps += max(
+            source_plan.recorded_sitemaps - source_plan.sitemaps, 0
+        )
+        if source_plan.over_limit:
+            plan.warnings.append(
+                f"{key} has about {source_plan.urls} urls and "
+                f"{source_plan.bytes} bytes and will be split into "
+                f"{source_plan.sitemaps} sitemaps"
+            )
+
+    if recorded is not None:
+        for key, entry in recorded.entries.items():
+            if key not in keys:
+                plan.removed_sources.append(key)
+                plan.removed_sitemaps += len(entry.outputs)
+
+    if plan.sitemaps > handler.max_urls_per_sitemap:
+        plan.warnings.append(
+            f"The sitemap index would list {plan.sitemaps} sitemaps, more than "
+            f"the limit of {handler.max_urls_per_sitemap}"
+        )
+    plan.seconds = time.perf_counter() - start
+    return plan
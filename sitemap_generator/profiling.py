@@ -0,0 +1,239 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Profile a run stage by stage. Stages are wrapped in named spans; the
+cheap "spans" mode only times them, while "full" also runs cProfile,
+samples the call stack for flame graphs and records the peak memory
+allocated in each span with tracemalloc
+"""
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import TYPE_CHECKING, Literal
+
+if TYPE_CHECKING:
+    from typing import Self
+
+LOGGER = logging.getLogger(__name__)
+
+ProfileMode = Literal["spans", "full"]
+
+SPANS_FILENAME = "spans.json"
+PSTATS_FILENAME = "profile.pstats"
+COLLAPSED_FILENAME = "profile.collapsed"
+
+# wall clock seconds between stack samples in full mode
+SAMPLE_INTERVAL = 0.005
+
+
+@dataclass
+class SpanStats:
+    """Time spent in one span, named by its path of nested spans"""
+
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    # peak bytes allocated by python while in the span; full mode only
+    peak_memory_bytes: int | None = None
+
+
+@functools.cache
+def code_name(code: CodeType) -> str:
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    Collect span timings and, in full mode, a cProfile profile and
+    sampled stacks. Spans are always timed; the profilers themselves only
+    run between entering and leaving the profiler as a context manager,
+    and only profile the thread that entered it
+    """
+
+    def __init__(self, mode: ProfileMode = "spans", interval: float = SAMPLE_INTERVAL):
+        self.mode = mode
+        self.interval = interval
+        self.spans: dict[str, SpanStats] = {}
+        self.samples: Counter[str] = Counter()
+        self._stack: list[str] = []
+        # running memory peak of every open span
+        self._peaks: list[int] = []
+        self._profile = cProfile.Profile() if mode == "full" else None
+        self._sampling = False
+        # the SIGALRM handler and interval timer sampling replaced
+        self._previous_handler: Callable | int | None = None
+        self._previous_timer = (0.0, 0.0)
+        self._started = 0.0
+
+    @property
+    def full(self) -> bool:
+        return self.mode == "full"
+
+    def __enter__(self) -> "Self":
+        if self._profile:
+            tracemalloc.start()
+            # a timer signal samples the interrupted frame itself, so unlike
+            # a sampling thread it adds nothing to the cProfile stats
+            self._sampling = (
+                hasattr(signal, "setitimer")
+                and threading.current_thread() is threading.main_thread()
+            )
+            if self._sampling:
+                self._previous_handler = signal.signal(signal.SIGALRM, self._sample)
+                self._previous_timer = signal.setitimer(
+                    signal.ITIMER_REAL, self.interval, self.interval
+                )
+                self._started = time.monotonic()
+            else:
+                LOGGER.warning(
+                    "Stacks can only be sampled in the main thread on unix; "
+                    "no collapsed stacks will be written"
+                )
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._profile:
+            self._profile.disable()
+            if self._sampling:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                self._restore_timer()
+                self._sampling = False
+            tracemalloc.stop()
+
+    def _restore_timer(self) -> None:
+        """
+        Put back the SIGALRM handler and interval timer that were in place
+        before sampling, less the time spent sampling. A timer that would
+        have fired in the meantime fires straight away
+        """
+        handler = self._previous_handler
+        # `None` means the handler was not installed from python
+        signal.signal(signal.SIGALRM, signal.SIG_DFL if handler is None else handler)
+        self._previous_handler = None
+
+        delay, interval = self._previous_timer
+        if not delay:
+            return
+        remaining = delay - (time.monotonic() - self._started)
+        # a zero delay would disarm the timer rather than fire it
+        signal.setitimer(signal.ITIMER_REAL, max(remaining, 1e-6), interval)
+
+    def _sample(self, signum: int, frame: FrameType | None) -> None:
+        """Count the interrupted stack below the spans open at the time"""
+        frames = []
+        while frame is not None:
+            frames.append(code_name(frame.f_code))
+            frame = frame.f_back
+        self.samples[";".join(self._stack + frames[::-1])] += 1
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the body as `name`, nested below any span already open"""
+        self._stack.append(name)
+        path = ";".join(self._stack)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # fold the peak so far into the open spans before resetting it
+            peak = tracemalloc.get_traced_memory()[1]
+            self._peaks = [max(p, peak) for p in self._peaks]
+            tracemalloc.reset_peak()
+        self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = self._peaks.pop()
+            stats = self.spans.setdefault(path, SpanStats(path))
+            stats.calls += 1
+            stats.seconds += seconds
+            if tracing and tracemalloc.is_tracing():
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                self._peaks = [max(p, peak) for p in self._peaks]
+                stats.peak_memory_bytes = max(stats.peak_memory_bytes or 0, peak)
+            self._stack.pop()
+
+    def summary(self) -> str:
+        lines = []
+        for stats in self.spans.values():
+            line = f"{stats.name}: {stats.seconds:.3f}s in {stats.calls} calls"
+            if stats.peak_memory_bytes is not None:
+                line += f", peak {stats.peak_memory_bytes / 2**20:.1f} MiB"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def write(self, directory: Path) -> list[Path]:
+        """
+        Write the span timings and, in full mode, the cProfile stats and
+        the sampled stacks in the collapsed format flame graph tools read
+
+        :returns: `list` of the files written
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        spans_path = directory / SPANS_FILENAME
+        spans_path.write_text(
+            json.dumps(
+                {
+                    "mode": self.mode,
+                    "spans": [asdict(stats) for stats in self.spans.values()],
+                },
+                indent=2,
+            )
+        )
+        written = [spans_path]
+        if self._profile:
+            pstats_path = directory / PSTATS_FILENAME
+            self._profile.dump_stats(pstats_path)
+            collapsed_path = directory / COLLAPSED_FILENAME
+            collapsed_path.write_text(
+                "".join(
+                    f"{stack} {count}\n"
+                    for stack, count in sorted(self.samples.items())
+                )
+            )
+            written += [pstats_path, collapsed_path]
+        LOGGER.info(f"Wrote profile of the run to {directory}")
+        return written
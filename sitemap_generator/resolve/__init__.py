@@ -0,0 +1,96 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Resolve geoconnex pids offline"""
+
+from pathlib import Path
+
+import click
+
+from sitemap_generator.resolve.resolver import PidResolver
+from sitemap_generator.util import OPTION_VERBOSITY
+
+
+@click.command()
+@click.pass_context
+@OPTION_VERBOSITY
+@click.argument(
+    "namespace-input-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.argument("pids", nargs=-1)
+@click.option(
+    "-i",
+    "--input",
+    "input_file",
+    type=click.File("r"),
+    help="file with one pid per line; - reads stdin",
+)
+@click.option(
+    "--index",
+    "index_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    envvar="SITEMAP_RESOLVER_INDEX",
+    help="where to keep the compiled resolver index between runs",
+)
+@click.option(
+    "--unresolved-only",
+    is_flag=True,
+    default=False,
+    help="only print pids that no mapping or rule resolves",
+)
+def resolve(
+    ctx,
+    verbosity,
+    namespace_input_dir: Path,
+    pids: tuple[str, ...],
+    input_file,
+    index_path: Path | None,
+    unresolved_only: bool,
+):
+    """
+    Resolve pids to their targets with the mappings and regex rules of the
+    namespace directory, printing one tab separated pid and target per line
+    """
+    resolver = PidResolver.load_or_build(namespace_input_dir, index_path)
+    lines = (line.strip() for line in input_file) if input_file else ()
+    queries = (pid for source in (pids, lines) for pid in source if pid)
+
+    unresolved = 0
+    for pid, target in resolver.resolve_many(queries):
+        if target is None:
+            unresolved += 1
+            click.echo(f"{pid}\t")
+        elif not unresolved_only:
+            click.echo(f"{pid}\t{target}")
+    if unresolved:
+        click.echo(f"{unresolved} pids could not be resolved", err=True)
+        ctx.exit(1)
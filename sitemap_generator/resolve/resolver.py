@@ -0,0 +1,354 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Resolve geoconnex pids to their targets offline, applying the same one to
+one mappings and regex redirect rules as the geoconnex resolver
+"""
+
+import json
+import logging
+import os
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import astuple, dataclass
+from pathlib import Path
+
+from sitemap_generator.csv_reader import iter_columns_batches
+from sitemap_generator.util import classify_csv, get_all_sitemap_sources
+
+LOGGER = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+
+REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+# stands in for an unescaped `.` in a literal prefix; rules commonly leave
+# the dots of host names unescaped and would otherwise all share one prefix
+WILDCARD = "\x00"
+
+# `$1`, `$2`, ... in a target are replaced with the groups of the rule
+TARGET_GROUP = re.compile(r"\$(\d+)")
+
+# patterns that refer to their own groups can't be renumbered into a
+# combined pattern
+BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Leading part of a regex that every string it matches must start with.
+    Unescaped dots are kept as `WILDCARD`
+    """
+    if "|" in pattern:
+        return ""
+    prefix: list[str] = []
+    chars = iter(pattern.removeprefix("^"))
+    for char in chars:
+        if char == "\\":
+            escaped = next(chars, "")
+            if not escaped or escaped.isalnum():
+                break
+            prefix.append(escaped)
+        elif char == ".":
+            prefix.append(WILDCARD)
+        elif char in REGEX_METACHARACTERS:
+            # a quantifier that allows zero repeats makes the previous
+            # character optional
+            if char in "*?{" and prefix:
+                prefix.pop()
+            break
+        else:
+            prefix.append(char)
+    return "".join(prefix)
+
+
+def substitute(target: str, match: re.Match, offset: int = 0) -> str:
+    """Replace `$N` in a target with group N of a rule matched at `offset`"""
+    if "$" not in target:
+        return target
+    groups = match.re.groups
+
+    def group(m: re.Match) -> str:
+        index = offset + int(m.group(1))
+        return (match.group(index) or "") if index <= groups else ""
+
+    return TARGET_GROUP.sub(group, target)
+
+
+@dataclass
+class RegexRule:
+    pattern: str
+    target: str
+    source: str
+
+
+class RuleBucket:
+    """
+    Regex rules that share a literal prefix, compiled into a single
+    alternation so a pid is checked against all of them in one match.
+    Rules are tried in the order they were added; `positions` holds where
+    each rule was declared among all rules
+    """
+
+    def __init__(self, rules: list[RegexRule], positions: list[int] | None = None):
+        self.rules = rules
+        self.positions = positions or list(range(len(rules)))
+        self.combined: re.Pattern | None = None
+        self.offsets: dict[int, int] = {}
+        self.compiled = [re.compile(rule.pattern) for rule in rules]
+
+        if len(rules) < 2 or any(BACKREFERENCE.search(r.pattern) for r in rules):
+            return
+        parts, group = [], 1
+        for position, compiled in enumerate(self.compiled):
+            parts.append(f"({compiled.pattern})")
+            self.offsets[group] = position
+            group += 1 + compiled.groups
+        try:
+            self.combined = re.compile("|".join(parts))
+        except re.error:
+            self.combined = None
+
+    def resolve(self, pid: str) -> tuple[str, RegexRule] | None:
+        resolved = self.first_match(pid)
+        return resolved[1:] if resolved else None
+
+    def first_match(self, pid: str) -> tuple[int, str, RegexRule] | None:
+        """
+        Match a pid against the rules of the bucket
+
+        :returns: `tuple` of declaration position, target and rule of the
+                  first rule that matches, or `None`
+        """
+        if self.combined is not None:
+            match = self.combined.match(pid)
+            if match is None or match.lastindex is None:
+                return None
+            index = self.offsets[match.lastindex]
+            rule = self.rules[index]
+            target = substitute(rule.target, match, match.lastindex)
+            return self.positions[index], target, rule
+
+        for index, (rule, compiled) in enumerate(zip(self.rules, self.compiled)):
+            match = compiled.match(pid)
+            if match:
+                return self.positions[index], substitute(rule.target, match), rule
+        return None
+
+
+class PidResolver:
+    """
+    Hash index of exact pids plus regex rules bucketed by their literal
+    prefix. Exact pids win over rules; among rules, the first one declared
+    that matches wins, as in the live resolver. Only buckets whose prefix
+    the pid starts with are checked
+    """
+
+    def __init__(
+        self,
+        exact: dict[str, str] | None = None,
+        rules: list[RegexRule] | None = None,
+        fingerprint: list[tuple] | None = None,
+    ):
+        self.exact = exact or {}
+        self.rules = rules or []
+        self.fingerprint = fingerprint or []
+
+        grouped: dict[str, list[int]] = {}
+        for position, rule in enumerate(self.rules):
+            grouped.setdefault(literal_prefix(rule.pattern), []).append(position)
+        self.buckets = {
+            prefix: RuleBucket([self.rules[p] for p in positions], positions)
+            for prefix, positions in grouped.items()
+        }
+        # every distinct prefix length with the positions of its wildcards,
+        # longest first
+        self.prefix_shapes = sorted(
+            {
+                (len(prefix), tuple(i for i, c in enumerate(prefix) if c == WILDCARD))
+                for prefix in self.buckets
+            },
+            reverse=True,
+        )
+
+    @classmethod
+    def build(cls, namespace_input_dir: Path) -> "PidResolver":
+        """Load the mappings and rules of every csv in a namespace directory"""
+        exact: dict[str, str] = {}
+        rules: list[RegexRule] = []
+        for path, is_regex in iter_resolver_csvs(namespace_input_dir):
+            name = path.relative_to(namespace_input_dir).as_posix()
+            for batch in iter_columns_batches(path, ("id", "target")):
+                if not is_regex:
+                    exact.update((pid, target.strip()) for pid, target in batch)
+                    continue
+                for pattern, target in batch:
+                    pattern = pattern.strip()
+                    try:
+                        re.compile(pattern)
+                    except re.error as e:
+                        LOGGER.warning(
+                            f"Skipping invalid rule {pattern} in {name}: {e}"
+                        )
+                        continue
+                    rules.append(RegexRule(pattern, target.strip(), name))
+        LOGGER.info(f"Loaded {len(exact)} pids and {len(rules)} regex rules")
+        return cls(exact, rules, source_fingerprint(namespace_input_dir))
+
+    def save(self, path: Path) -> None:
+        """Persist the index so it can be reloaded without reading the csvs"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "fingerprint": self.fingerprint,
+                    "exact": self.exact,
+                    "rules": [astuple(rule) for rule in self.rules],
+                },
+                f,
+                separators=(",", ":"),
+            )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "PidResolver":
+        """
+        Read an index written by `save`. It is plain JSON, so loading an
+        index from an untrusted path can't run code
+
+        :raises ValueError: if the file is not an index of this version
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path} was written by another version")
+        try:
+            rules = [RegexRule(*rule) for rule in data["rules"]]
+            fingerprint = [tuple(entry) for entry in data["fingerprint"]]
+            exact = dict(data["exact"])
+        except TypeError as e:
+            raise ValueError(f"{path} is not a resolver index: {e}") from e
+        return cls(exact, rules, fingerprint)
+
+    @classmethod
+    def load_or_build(
+        cls, namespace_input_dir: Path, index_path: Path | None = None
+    ) -> "PidResolver":
+        """
+        Reuse the index saved at `index_path` if no csv in the namespace
+        directory changed since it was built, otherwise rebuild and save it
+        """
+        if index_path is None:
+            return cls.build(namespace_input_dir)
+        if index_path.exists():
+            try:
+                resolver = cls.load(index_path)
+            except (OSError, ValueError, KeyError) as e:
+                LOGGER.warning(f"Ignoring unreadable resolver index {index_path}: {e}")
+            else:
+                if resolver.fingerprint == source_fingerprint(namespace_input_dir):
+                    return resolver
+                LOGGER.info("Namespace csvs changed; rebuilding resolver index")
+        resolver = cls.build(namespace_input_dir)
+        resolver.save(index_path)
+        return resolver
+
+    def match(self, pid: str) -> tuple[str, RegexRule | None] | None:
+        """
+        Find the target of a pid and the rule that produced it, which is
+        `None` for exact pids
+
+        :returns: `tuple` of target and rule, or `None` if nothing matches
+        """
+        target = self.exact.get(pid)
+        if target is not None:
+            return target, None
+        best: tuple[int, str, RegexRule] | None = None
+        for length, wildcards in self.prefix_shapes:
+            if len(pid) < length:
+                continue
+            key = pid[:length]
+            if wildcards:
+                chars = list(key)
+                for position in wildcards:
+                    chars[position] = WILDCARD
+                key = "".join(chars)
+            bucket = self.buckets.get(key)
+            # a bucket whose rules were all declared after the best match
+            # so far can't change the result
+            if bucket is None or (best and bucket.positions[0] > best[0]):
+                continue
+            resolved = bucket.first_match(pid)
+            if resolved and (best is None or resolved[0] < best[0]):
+                best = resolved
+        return best[1:] if best else None
+
+    def resolve(self, pid: str) -> str | None:
+        resolved = self.match(pid)
+        return resolved[0] if resolved else None
+
+    def resolve_many(self, pids: Iterable[str]) -> Iterator[tuple[str, str | None]]:
+        """Resolve a stream of pids, yielding each with its target"""
+        for pid in pids:
+            resolved = self.match(pid)
+            yield pid, resolved[0] if resolved else None
+
+
+def iter_resolver_csvs(namespace_input_dir: Path) -> Iterator[tuple[Path, bool]]:
+    """
+    Yield every csv in a namespace directory along with whether it holds
+    regex rules, including csvs that are not crawled
+    """
+    for source in get_all_sitemap_sources(namespace_input_dir):
+        if source.path.suffix != ".csv":
+            continue
+        if source.file_type == "bulk":
+            yield source.path, classify_csv(source.path, source.path.stat().st_size)
+        else:
+            yield source.path, source.file_type == "regex_csv"
+
+
+def source_fingerprint(namespace_input_dir: Path) -> list[tuple]:
+    """Size and mtime of every csv, to tell whether a saved index is stale"""
+    fingerprint = []
+    for path, _ in iter_resolver_csvs(namespace_input_dir):
+        stat = os.stat(path)
+        fingerprint.append(
+            (
+                path.relative_to(namespace_input_dir).as_posix(),
+                stat.st_size,
+                stat.st_mtime_ns,
+            )
+        )
+    return fingerprint
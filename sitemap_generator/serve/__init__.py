@@ -0,0 +1,86 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Serve sitemaps over HTTP"""
+
+import asyncio
+from pathlib import Path
+
+import click
+
+from sitemap_generator.serve.server import DEFAULT_CACHE_BYTES, SitemapServer
+from sitemap_generator.util import OPTION_VERBOSITY
+from sitemap_generator.writer import MAX_URLS_PER_SITEMAP
+
+
+@click.command()
+@click.pass_context
+@OPTION_VERBOSITY
+@click.argument(
+    "namespace-input-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "-u",
+    "--uri-base",
+    type=str,
+    default="https://geoconnex.us",
+    help="uri stem to be removed from short url for keyword",
+)
+@click.option("--host", type=str, default="127.0.0.1", envvar="SITEMAP_HOST")
+@click.option("--port", type=int, default=8000, envvar="SITEMAP_PORT")
+@click.option(
+    "--cache-bytes",
+    type=click.IntRange(min=0),
+    default=DEFAULT_CACHE_BYTES,
+    help="size of the in memory cache of rendered sitemaps",
+)
+@click.option(
+    "--page-size",
+    type=click.IntRange(min=1),
+    default=MAX_URLS_PER_SITEMAP,
+    help="urls per page of a sitemap; larger sources are split with ?page=N",
+)
+def serve(
+    ctx,
+    verbosity,
+    namespace_input_dir: Path,
+    uri_base: str,
+    host: str,
+    port: int,
+    cache_bytes: int,
+    page_size: int,
+):
+    """Render sitemaps from data in the filesystem on request over HTTP"""
+    server = SitemapServer(
+        namespace_input_dir, uri_base, page_size, cache_bytes=cache_bytes
+    )
+    asyncio.run(server.serve_forever(host, port))
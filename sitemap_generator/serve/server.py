@@ -0,0 +1,386 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Render sitemaps on request over HTTP instead of writing them to disk.
+Sources are looked up in the namespace directory when a sitemap is
+requested; large sources are split into pages selected with `?page=N`
+"""
+
+import asyncio
+import email.utils
+import hashlib
+import json
+import logging
+import re
+from collections.abc import Iterator
+from contextlib import suppress
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from sitemap_generator.catalog import SitemapCatalog, SourceInfo
+from sitemap_generator.serve.cache import LRUByteCache
+from sitemap_generator.writer import MAX_SITEMAP_BYTES, MAX_URLS_PER_SITEMAP
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+SITEMAP_PATH = re.compile(r"^/sitemap/(?P<name>.+)\.xml$")
+
+STATUS_REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+def http_date(timestamp: float) -> str:
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+def is_not_modified(headers: dict[str, str], etag: str, last_modified: float) -> bool:
+    """
+    Decide whether a conditional request can be answered with `304`.
+    `If-None-Match` takes precedence over `If-Modified-Since` when both are
+    sent, as required by RFC 9110
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # http dates only have second resolution
+    return int(last_modified) <= since.timestamp()
+
+
+def input_stats(source: SourceInfo) -> list[tuple[str, int, int]]:
+    """
+    Path, mtime and size of every file a sitemap is rendered from, which
+    for a bulk source includes its dump
+
+    :returns: `list` of `(path, st_mtime_ns, st_size)`
+    """
+    stats = []
+    for path in source.inputs:
+        stat = path.stat()
+        stats.append((str(path), stat.st_mtime_ns, stat.st_size))
+    return stats
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(
+        "\x1f".join(str(part) for part in parts).encode("utf-8"), digest_size=8
+    )
+    return f'"{digest.hexdigest()}"'
+
+
+class SitemapServer:
+    """
+    Serve `/sitemap.xml` and `/sitemap/<name>.xml` from a namespace
+    directory, rendered by a `SitemapCatalog`. Sources with more than
+    `max_urls_per_sitemap` urls or `max_sitemap_bytes` bytes are split
+    into pages selected with `?page=N`. Rendered responses are kept in an
+    LRU cache keyed by the page and the path, mtime and size of every file
+    the sitemap is rendered from, so a source or bulk dump that changes on
+    disk is rendered again on its next request
+    """
+
+    def __init__(
+        self,
+        namespace_input_dir: Path,
+        uri_base: str,
+        max_urls_per_sitemap: int = MAX_URLS_PER_SITEMAP,
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        max_sitemap_bytes: int = MAX_SITEMAP_BYTES,
+    ):
+        self.catalog = SitemapCatalog(
+            namespace_input_dir,
+            uri_base,
+            max_urls_per_sitemap,
+            page_urls="query",
+            max_sitemap_bytes=max_sitemap_bytes,
+        )
+        self.cache = LRUByteCache(cache_bytes)
+
+    def render_index(self) -> tuple[bytes, str, float]:
+        """
+        Render the sitemap index with one entry per page of every source
+
+        :returns: `tuple` of the document, its ETag and last modified time
+        """
+        sources = self.catalog.sources()
+        stats = [input_stats(source) for source in sources]
+        etag = make_etag(
+            self.catalog.uri_base,
+            self.catalog.max_urls_per_sitemap,
+            self.catalog.max_sitemap_bytes,
+            *(
+                f"{stat}:{source.pages}:{json.dumps(source.metadata, sort_keys=True)}"
+                for source, stat in zip(sources, stats)
+            ),
+        )
+        last_modified = max(
+            (mtime_ns / 1e9 for stat in stats for _, mtime_ns, _ in stat),
+            default=0.0,
+        )
+        body = self.cache.get(("index", etag))
+        if body is None:
+            body = b"".join(self.catalog.iter_index(sources))
+            self.cache.put(("index", etag), body)
+        return body, etag, last_modified
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer a single HTTP/1.1 request and close the connection"""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            if len(request_line) != 3:
+                await self.send(writer, "GET", 400)
+                return
+            method, target, version = request_line
+            try:
+                await self.respond(writer, method, target, headers, version)
+            except Exception:
+                LOGGER.exception(f"Failed to serve {target}")
+                if not writer.transport.is_closing():
+                    await self.send(writer, method, 500)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def respond(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        target: str,
+        headers: dict[str, str],
+        version: str = "HTTP/1.1",
+    ) -> None:
+        if method not in ("GET", "HEAD"):
+            await self.send(writer, method, 405)
+            return
+
+        loop = asyncio.get_running_loop()
+        url = urlsplit(target)
+        if url.path == "/sitemap.xml":
+            body, etag, last_modified = await loop.run_in_executor(
+                None, self.render_index
+            )
+            await self.send_cacheable(
+                writer, method, headers, etag, last_modified, body
+            )
+            return
+
+        match = SITEMAP_PATH.match(url.path)
+        name = unquote(match["name"]) if match else None
+        source = (
+            await loop.run_in_executor(None, self.catalog.source, name)
+            if name
+            else None
+        )
+        if source is None:
+            await self.send(writer, method, 404)
+            return
+
+        try:
+            page = int(parse_qs(url.query).get("page", ["0"])[0])
+        except ValueError:
+            await self.send(writer, method, 400)
+            return
+        if not 0 <= page < source.pages:
+            await self.send(writer, method, 404)
+            return
+
+        stats = input_stats(source)
+        key = (*stats, page)
+        etag = make_etag(
+            *key,
+            self.catalog.max_urls_per_sitemap,
+            self.catalog.max_sitemap_bytes,
+            json.dumps(source.metadata, sort_keys=True),
+        )
+        last_modified = max(mtime_ns for _, mtime_ns, _ in stats) / 1e9
+        cached = self.cache.get(key)
+        if cached is not None or is_not_modified(headers, etag, last_modified):
+            await self.send_cacheable(
+                writer, method, headers, etag, last_modified, cached
+            )
+            return
+
+        chunks = self.catalog.iter_sitemap(source.name, page)
+        await self.send_stream(
+            writer,
+            method,
+            etag,
+            last_modified,
+            key,
+            chunks,
+            chunked=version != "HTTP/1.0",
+        )
+
+    async def send(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        status: int,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+    ) -> None:
+        headers = dict(headers or {})
+        if status != 304:
+            headers.setdefault("Content-Length", str(len(body)))
+        self.write_head(writer, status, headers)
+        if method != "HEAD" and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+    async def send_cacheable(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        request_headers: dict[str, str],
+        etag: str,
+        last_modified: float,
+        body: bytes | None,
+    ) -> None:
+        headers = self.validator_headers(etag, last_modified)
+        if is_not_modified(request_headers, etag, last_modified):
+            await self.send(writer, method, 304, headers)
+            return
+        assert body is not None
+        await self.send(writer, method, 200, headers, body)
+
+    async def send_stream(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        etag: str,
+        last_modified: float,
+        cache_key: tuple,
+        chunks: Iterator[bytes],
+        chunked: bool = True,
+    ) -> None:
+        """
+        Send a response while it is rendered in a worker thread, caching it
+        once complete if it is small enough. The body is sent with chunked
+        transfer encoding, or for HTTP/1.0 clients, which don't support it,
+        delimited by closing the connection. The status is sent before the
+        body is rendered, so if rendering fails the connection is closed
+        without ending the body, letting the client tell the response was
+        cut short
+        """
+        headers = self.validator_headers(etag, last_modified)
+        if chunked:
+            headers["Transfer-Encoding"] = "chunked"
+        self.write_head(writer, 200, headers)
+        if method == "HEAD":
+            await writer.drain()
+            return
+
+        loop = asyncio.get_running_loop()
+        rendered: list[bytes] | None = []
+        size = 0
+        try:
+            while (
+                chunk := await loop.run_in_executor(None, next, chunks, None)
+            ) is not None:
+                if not chunk:
+                    continue
+                writer.write(
+                    b"%x\r\n%b\r\n" % (len(chunk), chunk) if chunked else chunk
+                )
+                await writer.drain()
+                if rendered is not None:
+                    size += len(chunk)
+                    rendered.append(chunk)
+                    if size > self.cache.max_entry_bytes:
+                        rendered = None
+        except ConnectionError:
+            raise
+        except Exception:
+            LOGGER.exception(
+                "Failed to render a sitemap after sending its headers; "
+                "closing the connection"
+            )
+            writer.transport.abort()
+            return
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        if rendered is not None:
+            self.cache.put(cache_key, b"".join(rendered))
+
+    @staticmethod
+    def validator_headers(etag: str, last_modified: float) -> dict[str, str]:
+        return {
+            "Content-Type": "application/xml",
+            "ETag": etag,
+            "Last-Modified": http_date(last_modified),
+        }
+
+    @staticmethod
+    def write_head(
+        writer: asyncio.StreamWriter, status: int, headers: dict[str, str]
+    ) -> None:
+        lines = [f"HTTP/1.1 {status} {STATUS_REASONS[status]}"]
+        lines += [f"{key}: {value}" for key, value in headers.items()]
+        lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+    async def start(self, host: str, port: int) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve_forever(self, host: str, port: int) -> None:
+        server = await self.start(host, port)
+        for sock in server.sockets:
+            LOGGER.info(f"Serving sitemaps on http://{sock.getsockname()[0]}:{port}")
+        async with server:
+            await server.serve_forever()
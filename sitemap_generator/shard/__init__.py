@@ -0,0 +1,132 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Merge the index fragments of a sharded build into the sitemap index"""
+
+import logging
+from pathlib import Path
+
+import click
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.manifest import BuildManifest
+from sitemap_generator.sharding import (
+    MERGE_ROOT,
+    combine_shard_manifests,
+    merge_index_fragments,
+    read_index_fragment,
+)
+from sitemap_generator.sink import LocalSink, OutputSink, S3Sink, is_s3_url
+from sitemap_generator.staging import remove_stale_outputs, reset_staging_dir
+from sitemap_generator.util import OPTION_VERBOSITY
+
+LOGGER = logging.getLogger(__name__)
+
+
+@click.command(name="merge-index")
+@click.pass_context
+@OPTION_VERBOSITY
+@click.argument(
+    "fragments",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "-o",
+    "--sitemap-output-dir",
+    type=str,
+    envvar="SITEMAP_DIR",
+    default="/tmp/sitemaps",
+    help="directory to write the sitemap index to, or an s3://bucket/prefix "
+    "url to upload it to",
+)
+@click.option(
+    "--work-dir",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    envvar="SITEMAP_WORK_DIR",
+    default=Path("/tmp/sitemap-work"),
+    help="local directory for the staged index when writing to s3",
+)
+def merge_index(
+    ctx,
+    verbosity,
+    fragments: tuple[Path, ...],
+    sitemap_output_dir: str,
+    work_dir: Path,
+):
+    """
+    Write the sitemap index of a build split with `run --shard` from the
+    index fragment of every shard. If the shards shared the output
+    directory, their build manifests are combined into the manifest of
+    the whole tree and files no longer part of it are removed
+    """
+    try:
+        sources, shard_counts, uri_base, settings = merge_index_fragments(
+            [read_index_fragment(path) for path in fragments]
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e)) from None
+
+    output_dir = Path(sitemap_output_dir)
+    sink: OutputSink = LocalSink(output_dir)
+    if is_s3_url(sitemap_output_dir):
+        sink = S3Sink.from_url(sitemap_output_dir)
+        output_dir = work_dir
+
+    handler = FileSystemHandler(
+        max_urls_per_sitemap=settings["max_urls_per_sitemap"],
+        compress=settings["compress"],
+    )
+    index = handler.make_sitemap_index(uri_base, sources, MERGE_ROOT, shard_counts)
+    staging = reset_staging_dir(output_dir)
+    try:
+        with sink:
+            names = []
+            for staged in handler.write_sitemap_index(index, uri_base, staging):
+                names.append(staged.relative_to(staging).as_posix())
+                sink.commit(staged, names[-1])
+            sink.flush()
+
+            manifest = combine_shard_manifests(output_dir, len(fragments), settings)
+            if manifest is None:
+                LOGGER.info(
+                    f"Not every shard's build manifest is in {output_dir}; "
+                    "leaving the build manifest as is"
+                )
+            else:
+                manifest.run_outputs.extend(names)
+                previous = BuildManifest.read(output_dir)
+                manifest.save(output_dir)
+                if previous is not None:
+                    remove_stale_outputs(sink, previous.outputs(), manifest.outputs())
+    finally:
+        reset_staging_dir(output_dir)
+    LOGGER.info(f"Merged {len(fragments)} index fragments into {sink}/sitemap.xml")
@@ -0,0 +1,260 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Split one build across several machines. Every machine scans the same
+namespace tree, generates the sources assigned to it and writes an index
+fragment; the fragments are merged into the sitemap index afterwards
+"""
+
+import datetime
+import hashlib
+import heapq
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+from sitemap_generator.manifest import MANIFEST_FILENAME, BuildManifest
+from sitemap_generator.staging import STAGING_DIR
+from sitemap_generator.util import SitemapSourceWithMetadata
+
+FRAGMENT_VERSION = 1
+
+# sources are rebuilt below this root from the relative paths in fragments
+MERGE_ROOT = Path("/namespaces")
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One of `count` machines a build is split across; `index` is 0-based"""
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, text: str) -> "Shard":
+        """
+        Parse the 1-based `i/N` form used on the command line
+
+        :raises ValueError: if `text` is not of that form
+        """
+        number, _, count = text.partition("/")
+        try:
+            shard = cls(int(number) - 1, int(count))
+        except ValueError:
+            raise ValueError(f"Expected a shard like 1/4, got {text!r}") from None
+        if not 0 <= shard.index < shard.count:
+            raise ValueError(f"Shard {text} is out of range")
+        return shard
+
+    def __str__(self) -> str:
+        return f"{self.index + 1}/{self.count}"
+
+    @property
+    def fragment_name(self) -> str:
+        return f"sitemap-index-{self.index + 1}-of-{self.count}.json"
+
+    @property
+    def staging_name(self) -> str:
+        """Staging directory of the shard, apart from those of the others"""
+        return f"{STAGING_DIR}-{self.index + 1}-of-{self.count}"
+
+    @property
+    def manifest_name(self) -> str:
+        """Build manifest of the sources generated by the shard"""
+        stem = MANIFEST_FILENAME.removesuffix(".json")
+        return f"{stem}-{self.index + 1}-of-{self.count}.json"
+
+
+def stable_hash(name: str) -> int:
+    """Hash that, unlike `hash`, is the same in every process and machine"""
+    return int.from_bytes(
+        hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+def assign_shards(
+    sources: list[SitemapSourceWithMetadata], root_dir: Path, count: int
+) -> list[int]:
+    """
+    Assign every source to one of `count` machines so each gets about the
+    same number of bytes to read. Sources are handed out largest first to
+    the machine with the least so far, with ties broken by a stable hash of
+    their sitemap name, so every machine computes the same assignment from
+    the same tree
+
+    :returns: `list` with the 0-based shard of each source
+    """
+    sizes = [max(source.path.stat().st_size, 1) for source in sources]
+    order = sorted(
+        range(len(sources)),
+        key=lambda i: (
+            -sizes[i],
+            stable_hash(sources[i].canonical_sitemap_name(root_dir)),
+            sources[i].path.as_posix(),
+        ),
+    )
+    loads = [(0, shard) for shard in range(count)]
+    assignment = [0] * len(sources)
+    for i in order:
+        load, shard = heapq.heappop(loads)
+        assignment[i] = shard
+        heapq.heappush(loads, (load + sizes[i], shard))
+    return assignment
+
+
+def tree_fingerprint(sources: list[SitemapSourceWithMetadata], root_dir: Path) -> str:
+    """Digest of the relative path and size of every source in scan order"""
+    digest = hashlib.sha256()
+    for source in sources:
+        relative = source.path.relative_to(root_dir).as_posix()
+        digest.update(f"{relative}\0{source.path.stat().st_size}\n".encode())
+    return digest.hexdigest()
+
+
+def make_index_fragment(
+    shard: Shard,
+    sources: list[SitemapSourceWithMetadata],
+    root_dir: Path,
+    shard_counts: dict[Path, int],
+    uri_base: str,
+    settings: dict,
+) -> dict:
+    """
+    Describe the index entries of the sources this machine generated,
+    which are those in `shard_counts`, along with their position in the
+    scan so the merged index keeps the order of a single machine build
+    """
+    return {
+        "version": FRAGMENT_VERSION,
+        "shard": shard.index,
+        "shards": shard.count,
+        "tree": tree_fingerprint(sources, root_dir),
+        "uri_base": uri_base,
+        "settings": settings,
+        "entries": [
+            {
+                "position": position,
+                "path": source.path.relative_to(root_dir).as_posix(),
+                "file_type": source.file_type,
+                "last_modified": source.last_modified.astimezone(
+                    datetime.timezone.utc
+                ).isoformat(),
+                "metadata": source.metadata,
+                "shards": shard_counts[source.path],
+            }
+            for position, source in enumerate(sources)
+            if source.path in shard_counts
+        ],
+    }
+
+
+def write_index_fragment(fragment: dict, path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # key order of the metadata is the order of the index elements
+    path.write_text(json.dumps(fragment, indent=2))
+    return path
+
+
+def merge_index_fragments(
+    fragments: list[dict],
+) -> tuple[list[SitemapSourceWithMetadata], dict[Path, int], str, dict]:
+    """
+    Combine the fragments of every shard of one build, rebuilding their
+    sources below `MERGE_ROOT` in scan order
+
+    :raises ValueError: if fragments are missing, repeated, or come from
+        builds of different trees or with different settings
+
+    :returns: `tuple` of the sources, their shard counts, the uri base and
+        the build settings
+    """
+    if not fragments:
+        raise ValueError("No index fragments to merge")
+    first = fragments[0]
+    for fragment in fragments:
+        if fragment.get("version") != FRAGMENT_VERSION:
+            raise ValueError(f"Unsupported fragment version {fragment.get('version')}")
+        for key in ("shards", "tree", "uri_base", "settings"):
+            if fragment[key] != first[key]:
+                raise ValueError(f"Fragments come from different builds: {key} differs")
+
+    shards = sorted(fragment["shard"] for fragment in fragments)
+    if shards != list(range(first["shards"])):
+        missing = sorted(set(range(first["shards"])) - set(shards))
+        repeated = sorted({s for s in shards if shards.count(s) > 1})
+        raise ValueError(
+            f"Expected one fragment for each of {first['shards']} shards; "
+            f"missing {[s + 1 for s in missing]}, "
+            f"repeated {[s + 1 for s in repeated]}"
+        )
+
+    entries = sorted(
+        (entry for fragment in fragments for entry in fragment["entries"]),
+        key=lambda entry: entry["position"],
+    )
+    sources = []
+    shard_counts: dict[Path, int] = {}
+    for entry in entries:
+        source = SitemapSourceWithMetadata(
+            path=MERGE_ROOT / entry["path"],
+            file_type=entry["file_type"],
+            last_modified=datetime.datetime.fromisoformat(entry["last_modified"]),
+            metadata=entry["metadata"],
+        )
+        sources.append(source)
+        shard_counts[source.path] = entry["shards"]
+    return sources, shard_counts, first["uri_base"], first["settings"]
+
+
+def read_index_fragment(path: Path) -> dict:
+    return json.loads(path.read_text())
+
+
+def combine_shard_manifests(
+    sitemap_output_dir: Path, count: int, settings: dict
+) -> BuildManifest | None:
+    """
+    Combine the build manifests written by the `count` shards of a build
+    that share an output directory into the manifest of the whole tree, so
+    a later run without `--shard` stays incremental
+
+    :returns: `BuildManifest`, or `None` if the manifest of a shard is
+        missing or was written with other settings
+    """
+    manifests = []
+    for index in range(count):
+        manifest = BuildManifest.read(
+            sitemap_output_dir, Shard(index, count).manifest_name
+        )
+        if manifest is None or manifest.settings != settings:
+            return None
+        manifests.append(manifest)
+    return BuildManifest.combine(manifests, settings)
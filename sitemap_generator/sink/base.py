@@ -0,0 +1,112 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Destinations that generated sitemaps are published to"""
+
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sitemap_generator.staging import commit_file
+
+if TYPE_CHECKING:
+    from typing import Self
+
+LOGGER = logging.getLogger(__name__)
+
+
+class OutputSink(ABC):
+    """
+    Receives finished files from the staging directory. Files are named by
+    their posix path relative to the root of the output, for example
+    `ref/hu08.xml` or `sitemap.xml`
+    """
+
+    def open(self) -> None:
+        """Prepare the sink before the first file is committed"""
+
+    @abstractmethod
+    def commit(self, staged: Path, name: str) -> bool:
+        """
+        Publish a staged file under `name`, consuming the staged file. If
+        the published file already holds the same bytes it is left as is
+
+        :returns: `bool` whether the published file changed
+        """
+
+    @abstractmethod
+    def exists(self, name: str) -> bool:
+        """Whether a file is published under `name`"""
+
+    @abstractmethod
+    def remove(self, name: str) -> bool:
+        """
+        Delete a published file
+
+        :returns: `bool` whether there was a file to delete
+        """
+
+    def flush(self) -> None:
+        """Wait for pending commits, raising the first error encountered"""
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "Self":
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class LocalSink(OutputSink):
+    """Publish files into a directory with atomic renames"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def commit(self, staged: Path, name: str) -> bool:
+        return commit_file(staged, self.root / name)
+
+    def exists(self, name: str) -> bool:
+        return (self.root / name).exists()
+
+    def remove(self, name: str) -> bool:
+        try:
+            (self.root / name).unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def __str__(self) -> str:
+        return str(self.root)
@@ -0,0 +1,264 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Publish sitemaps to S3 compatible object storage. Requires boto3, which
+is installed with the `s3` extra; any endpoint boto3 can reach works, so
+`AWS_ENDPOINT_URL` can point it at MinIO or another stand-in
+"""
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+from sitemap_generator.sink.base import OutputSink
+
+LOGGER = logging.getLogger(__name__)
+
+# S3 requires every part but the last to be at least 5 MiB
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_UPLOAD_WORKERS = 8
+
+# user metadata holding the sha256 of an object, compared when ETags can't be
+SHA256_METADATA_KEY = "sha256"
+
+CONTENT_TYPES = {
+    ".gz": "application/gzip",
+    ".xml": "application/xml",
+    ".txt": "text/plain",
+}
+
+
+def is_s3_url(location: str) -> bool:
+    return location.startswith("s3://")
+
+
+def parse_s3_url(url: str) -> tuple[str, str]:
+    """
+    Split `s3://bucket/prefix` into its bucket and key prefix
+
+    :returns: `tuple` of bucket and prefix without surrounding slashes
+    """
+    parsed = urlparse(url)
+    if parsed.scheme != "s3" or not parsed.netloc:
+        raise ValueError(f"Not an s3 url: {url}")
+    return parsed.netloc, parsed.path.strip("/")
+
+
+def file_digests(path: Path, part_size: int = DEFAULT_PART_SIZE) -> tuple[str, str]:
+    """
+    Compute the ETag S3 gives a file uploaded in `part_size` parts along
+    with its sha256, reading the file once
+
+    :returns: `tuple` of the ETag and the sha256 hex digest
+    """
+    sha256 = hashlib.sha256()
+    part_md5s = []
+    with open(path, "rb") as f:
+        while chunk := f.read(part_size):
+            sha256.update(chunk)
+            part_md5s.append(hashlib.md5(chunk).digest())
+
+    if len(part_md5s) <= 1:
+        etag = (part_md5s[0] if part_md5s else hashlib.md5().digest()).hex()
+    else:
+        etag = f"{hashlib.md5(b''.join(part_md5s)).hexdigest()}-{len(part_md5s)}"
+    return etag, sha256.hexdigest()
+
+
+class S3Sink(OutputSink):
+    """
+    Upload files to a bucket below a key prefix. Existing objects are listed
+    once when the sink is opened so unchanged files are skipped without a
+    request per file. Uploads run concurrently in a thread pool; files
+    larger than one part are sent as multipart uploads read from the staged
+    file a part at a time, so memory use is bounded by the part size
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client: Any = None,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_workers: int = DEFAULT_UPLOAD_WORKERS,
+    ):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = client
+        self.part_size = part_size
+        self.max_workers = max_workers
+        # name -> (etag, size) of every object below the prefix
+        self.objects: dict[str, tuple[str, int]] = {}
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: list[Future] = []
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "S3Sink":
+        bucket, prefix = parse_s3_url(url)
+        return cls(bucket, prefix, **kwargs)
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def open(self) -> None:
+        if self.client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise ImportError(
+                    "boto3 is required to write sitemaps to s3; "
+                    "install sitemap-generator[s3]"
+                ) from e
+            self.client = boto3.client("s3")
+
+        self.objects = {}
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                name = obj["Key"][len(prefix) :]
+                self.objects[name] = (obj["ETag"].strip('"'), obj["Size"])
+        LOGGER.info(f"Found {len(self.objects)} objects in s3://{self.bucket}/{prefix}")
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def commit(self, staged: Path, name: str) -> bool:
+        assert self._executor is not None, "sink has not been opened"
+        etag, sha256 = file_digests(staged, self.part_size)
+        size = staged.stat().st_size
+        with self._lock:
+            existing = self.objects.get(name)
+        if existing and self._matches(name, existing, etag, sha256, size):
+            staged.unlink()
+            return False
+
+        self._pending.append(
+            self._executor.submit(self._upload, staged, name, etag, sha256, size)
+        )
+        return True
+
+    def _matches(
+        self, name: str, existing: tuple[str, int], etag: str, sha256: str, size: int
+    ) -> bool:
+        existing_etag, existing_size = existing
+        if existing_etag == etag:
+            return True
+        if existing_size != size:
+            return False
+        # ETags are not content hashes for some encryption modes or when an
+        # object was uploaded with a different part size
+        head = self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        return head.get("Metadata", {}).get(SHA256_METADATA_KEY) == sha256
+
+    def _upload(
+        self, staged: Path, name: str, etag: str, sha256: str, size: int
+    ) -> None:
+        key = self.key(name)
+        extra = {
+            "ContentType": CONTENT_TYPES.get(staged.suffix, "binary/octet-stream"),
+            "Metadata": {SHA256_METADATA_KEY: sha256},
+        }
+        try:
+            with open(staged, "rb") as f:
+                if size <= self.part_size:
+                    self.client.put_object(
+                        Bucket=self.bucket, Key=key, Body=f.read(), **extra
+                    )
+                else:
+                    self._upload_multipart(f, key, extra)
+        finally:
+            staged.unlink(missing_ok=True)
+
+        with self._lock:
+            self.objects[name] = (etag, size)
+        LOGGER.info(f"Uploaded s3://{self.bucket}/{key}")
+
+    def _upload_multipart(self, f, key: str, extra: dict) -> None:
+        upload_id = self.client.create_multipart_upload(
+            Bucket=self.bucket, Key=key, **extra
+        )["UploadId"]
+        try:
+            parts = []
+            part_number = 1
+            while chunk := f.read(self.part_size):
+                response = self.client.upload_part(
+                    Bucket=self.bucket,
+                    Key=key,
+                    PartNumber=part_number,
+                    UploadId=upload_id,
+                    Body=chunk,
+                )
+                parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+                part_number += 1
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id
+            )
+            raise
+
+    def exists(self, name: str) -> bool:
+        with self._lock:
+            return name in self.objects
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            if self.objects.pop(name, None) is None:
+                return False
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+        return True
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        errors = [e for e in (future.exception() for future in pending) if e]
+        if errors:
+            raise errors[0]
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def __str__(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix}"
@@ -0,0 +1,134 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Sort more records than fit in memory. Records are sorted in bounded
+chunks, spilled to temporary files as sorted runs and merged back with a
+heap, dropping duplicates on the way
+"""
+
+import heapq
+import itertools
+import struct
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import BinaryIO, TypeVar
+
+from sitemap_generator.writer import WRITE_BUFFER_SIZE
+
+T = TypeVar("T")
+
+# records sorted in memory at once before being spilled as a run
+SORT_CHUNK_SIZE = 500_000
+
+# runs merged at once; more are first merged in groups so the number of
+# open files stays bounded
+MERGE_FAN_IN = 128
+
+# lengths of the two utf-8 strings of a pair
+PAIR_HEADER = struct.Struct(">II")
+
+
+def distinct(records: Iterable[T]) -> Iterator[T]:
+    """Drop records equal to the one before them"""
+    previous = None
+    for record in records:
+        if record != previous:
+            yield record
+        previous = record
+
+
+def write_pairs(records: Iterable[tuple[str, str]], f: BinaryIO) -> int:
+    count = 0
+    for first, second in records:
+        a, b = first.encode("utf-8"), second.encode("utf-8")
+        f.write(PAIR_HEADER.pack(len(a), len(b)))
+        f.write(a)
+        f.write(b)
+        count += 1
+    return count
+
+
+def read_pairs(path: Path) -> Iterator[tuple[str, str]]:
+    with open(path, "rb", buffering=WRITE_BUFFER_SIZE) as f:
+        while header := f.read(PAIR_HEADER.size):
+            a, b = PAIR_HEADER.unpack(header)
+            yield f.read(a).decode("utf-8"), f.read(b).decode("utf-8")
+
+
+def external_sort(
+    records: Iterable[T],
+    work_dir: Path,
+    write_run: Callable[[Iterable[T], BinaryIO], int],
+    read_run: Callable[[Path], Iterator[T]],
+    chunk_size: int = SORT_CHUNK_SIZE,
+    fan_in: int = MERGE_FAN_IN,
+) -> Iterator[T]:
+    """
+    Yield `records` in sorted order without duplicates, holding at most
+    `chunk_size` of them in memory. Records that fit in a single chunk
+    are never written to disk; otherwise every chunk is spilled with
+    `write_run` to a temporary directory below `work_dir` and the runs
+    are merged with `read_run`. The directory is removed once the
+    iterator is exhausted or closed
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        runs: list[Path] = []
+        names = itertools.count()
+
+        def spill(sorted_records: Iterable[T]) -> None:
+            run = Path(tmp) / f"run_{next(names)}"
+            with open(run, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+                write_run(sorted_records, f)
+            runs.append(run)
+
+        chunk: list[T] = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                chunk.sort()
+                spill(distinct(chunk))
+                chunk.clear()
+        chunk.sort()
+        if not runs:
+            yield from distinct(chunk)
+            return
+        if chunk:
+            spill(distinct(chunk))
+        del chunk
+
+        while len(runs) > fan_in:
+            group, runs = runs[:fan_in], runs[fan_in:]
+            spill(distinct(heapq.merge(*(read_run(run) for run in group))))
+            for run in group:
+                run.unlink()
+        yield from distinct(heapq.merge(*(read_run(run) for run in runs)))
@@ -0,0 +1,151 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Stage generated files next to the output directory and move them into
+place atomically, leaving files whose content did not change untouched
+"""
+
+import logging
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sitemap_generator.sink.base import OutputSink
+
+LOGGER = logging.getLogger(__name__)
+
+STAGING_DIR = ".staging"
+
+COMPARE_CHUNK_SIZE = 1024 * 1024
+
+
+def staging_dir(sitemap_output_dir: Path, name: str = STAGING_DIR) -> Path:
+    """
+    Staging directory inside the output directory so renames stay atomic.
+    Runs sharing an output directory, like the shards of a split build,
+    stage under different names so they don't clear each other's files
+    """
+    return sitemap_output_dir / name
+
+
+def reset_staging_dir(sitemap_output_dir: Path, name: str = STAGING_DIR) -> Path:
+    """Remove anything left behind by an interrupted run"""
+    staging = staging_dir(sitemap_output_dir, name)
+    shutil.rmtree(staging, ignore_errors=True)
+    return staging
+
+
+def staged_path(final: Path, sitemap_output_dir: Path, name: str = STAGING_DIR) -> Path:
+    return staging_dir(sitemap_output_dir, name) / final.relative_to(sitemap_output_dir)
+
+
+def final_path(staged: Path, sitemap_output_dir: Path, name: str = STAGING_DIR) -> Path:
+    return sitemap_output_dir / staged.relative_to(
+        staging_dir(sitemap_output_dir, name)
+    )
+
+
+def files_identical(a: Path, b: Path) -> bool:
+    """
+    Compare two files byte for byte, stopping at the first difference.
+    Files of different sizes are told apart from their stat alone
+    """
+    try:
+        if a.stat().st_size != b.stat().st_size:
+            return False
+        if os.path.samefile(a, b):
+            return True
+    except FileNotFoundError:
+        return False
+
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        while True:
+            chunk = fa.read(COMPARE_CHUNK_SIZE)
+            if chunk != fb.read(COMPARE_CHUNK_SIZE):
+                return False
+            if not chunk:
+                return True
+
+
+def commit_file(staged: Path, final: Path) -> bool:
+    """
+    Move a staged file over its final path with an atomic rename. If the
+    final file already holds the same bytes it is left untouched, keeping
+    its mtime, and the staged copy is discarded
+
+    :returns: `bool` whether the final file changed
+    """
+    if files_identical(staged, final):
+        staged.unlink()
+        return False
+    final.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(staged, final)
+    return True
+
+
+@dataclass
+class OutputChanges:
+    """Files in the output directory changed, unchanged and removed by a run"""
+
+    changed: list[Path] = field(default_factory=list)
+    unchanged: list[Path] = field(default_factory=list)
+    removed: list[Path] = field(default_factory=list)
+
+    def record(self, path: Path, changed: bool) -> None:
+        (self.changed if changed else self.unchanged).append(path)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.changed)} files changed, {len(self.unchanged)} unchanged, "
+            f"{len(self.removed)} removed"
+        )
+
+
+def remove_stale_outputs(
+    sink: "OutputSink", previous: set[str], current: set[str]
+) -> list[Path]:
+    """
+    Delete files a previous run wrote that this run no longer produces,
+    such as the sitemaps of deleted sources or shards that are no longer
+    needed. Names are relative to the root of the output
+
+    :returns: `list` of the names removed
+    """
+    removed = []
+    for name in sorted(previous - current):
+        if sink.remove(name):
+            LOGGER.info(f"Removed stale sitemap {name} from {sink}")
+            removed.append(Path(name))
+    return removed
@@ -30,16 +30,21 @@
 
 from dataclasses import dataclass
 import datetime
-from typing import Generator, Literal, NamedTuple, Any
+from typing import BinaryIO, Generator, Literal, NamedTuple, Any
 
 import click
 import csv
+import io
 import logging
+import os
 from pathlib import Path
 import sys
 import xml.etree.ElementTree as ET
 import json
 
+from sitemap_generator.bulk import BULK_DUMP_KEYS
+from sitemap_generator.writer import DEFAULT_COMPRESSION_LEVEL, open_for_writing
+
 
 LOGGER = logging.getLogger(__name__)
 
@@ -63,22 +68,71 @@ def csv_to_sitemap_url_list(csv_path: Path) -> Generator[UrlToGeoconnexPid, None
             )
 
 
-def write_tree_to_file(tree: ET.ElementTree | Any, file: Path):
+def write_tree(tree: ET.ElementTree | Any, f: BinaryIO):
+    """Serialize a sitemap tree to a binary file handle"""
     ET.register_namespace("", "http://www.sitemaps.org/schemas/sitemap/0.9")
     ET.register_namespace("geoconnex", "https://geoconnex.us")
-    tree.write(file_or_filename=file, encoding="utf-8", xml_declaration=True)
+    tree.write(f, encoding="utf-8", xml_declaration=True)
+
+
+def write_tree_to_file(
+    tree: ET.ElementTree | Any,
+    file: Path,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+):
+    with open_for_writing(file, compression_level) as f:
+        write_tree(tree, f)
+
+
+REGEX_CSV_MAX_ROWS = 5
+
+# Enough to hold the header and the first rows of any realistic csv, so
+# most files can be classified from one small read
+CSV_CLASSIFY_READ_SIZE = 64 * 1024
 
 
 def is_regex_csv(path: Path) -> bool:
     with open(path) as f:
         reader = csv.reader(f)
-        _ = next(reader)
+        _ = next(reader, None)
         rows = 0
         for _ in reader:
             rows += 1
-            if rows > 5:
+            if rows > REGEX_CSV_MAX_ROWS:
                 break
-        return rows < 5
+        return rows < REGEX_CSV_MAX_ROWS
+
+
+def classify_csv(path: Path, size: int) -> bool:
+    """
+    Same as `is_regex_csv` but decides from a single bounded read of the
+    start of the file, only falling back to reading row by row when the
+    first rows are too long to fit in that read
+
+    :param size: size of the file in bytes, as already known from a stat
+
+    :returns: `bool` whether the csv contains regex redirect rules
+    """
+    with open(path, "rb") as f:
+        chunk = f.read(CSV_CLASSIFY_READ_SIZE)
+
+    complete = size <= len(chunk)
+    if not complete:
+        # drop the trailing partial line, which may also split a utf-8 character
+        chunk = chunk[: chunk.rfind(b"\n") + 1]
+
+    reader = csv.reader(io.StringIO(chunk.decode("utf-8", errors="replace")))
+    _ = next(reader, None)
+    rows = 0
+    for _ in reader:
+        rows += 1
+        if rows > REGEX_CSV_MAX_ROWS:
+            break
+
+    # the last row parsed from a truncated read may itself be incomplete
+    if complete or rows > REGEX_CSV_MAX_ROWS:
+        return rows < REGEX_CSV_MAX_ROWS
+    return is_regex_csv(path)
 
 
 def datettime_to_sitemap_iso_format(timestamp: datetime.datetime) -> str:
@@ -107,7 +161,13 @@ class SitemapSourceWithMetadata:
 
         return cleaned_path.as_posix().replace("-", "_")
 
-    def source_to_xml_for_index(self, base_uri: str, root_dir: Path) -> ET.Element:
+    def source_to_xml_for_index(
+        self,
+        base_uri: str,
+        root_dir: Path,
+        shard: int | None = None,
+        suffix: str = ".xml",
+    ) -> ET.Element:
         SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
         GEOCONNEX_NS = "https://geoconnex.us"
         last_modified = datettime_to_sitemap_iso_format(self.last_modified)
@@ -118,10 +178,12 @@ class SitemapSourceWithMetadata:
         )
         ET.indent(sitemap_el, space=" ", level=0)
         sitemap_location = self.canonical_sitemap_name(root_relative_dir=root_dir)
+        if shard is not None:
+            sitemap_location = f"{sitemap_location}__{shard}"
 
         # loc
         loc = ET.SubElement(sitemap_el, f"{{{SITEMAP_NS}}}loc")
-        loc.text = f"{base_uri}/sitemap/{sitemap_location}.xml"
+        loc.text = f"{base_uri}/sitemap/{sitemap_location}{suffix}"
 
         # lastmod
         lastmod = ET.SubElement(sitemap_el, f"{{{SITEMAP_NS}}}lastmod")
@@ -134,8 +196,11 @@ class SitemapSourceWithMetadata:
         # implementation detail, not a part of the original data
         sitemap_id.text = sitemap_location.replace("/", ":").removeprefix("bulk:")
 
-        # metadata fields (safe escaping handled automatically)
+        # metadata fields (safe escaping handled automatically); the
+        # settings of a bulk dump only matter to the generator
         for key, value in self.metadata.items():
+            if key in BULK_DUMP_KEYS:
+                continue
             el = ET.SubElement(sitemap_el, f"{{{GEOCONNEX_NS}}}{key}")
             el.text = "" if value is None else str(value)
 
@@ -145,69 +210,95 @@ class SitemapSourceWithMetadata:
 def get_all_sitemap_sources(root_dir: Path) -> list[SitemapSourceWithMetadata]:
     """
     Given a root dir, iterate through it recursively, finding all files
-    ending with *.csv and returning metadata about them. All metadata files
-    are stored in a parallel file named metadata.json in the same directory.
+    ending with *.csv or *.xml and returning metadata about them. All
+    metadata files are stored in a parallel file named metadata.json in
+    the same directory.
 
-    If there are multiple csv files with one metadata.json, they share the
-    same metadata info
+    If there are multiple files with one metadata.json, they share the
+    same metadata info. The dump a bulk metadata.json names with
+    `bulk_dump` is not a source of its own, even if it is a csv
+
+    The tree is walked once with `os.scandir`, directories and files in
+    name order, reusing the stat results of each directory entry and
+    reading every metadata.json exactly once
 
     :param root_dir: `Path` of the root directory to search
 
-    :returns: `list` of `CsvWithMetadata`
+    :returns: `list` of `SitemapSourceWithMetadata`, csv sources first
     """
-    results: list[SitemapSourceWithMetadata] = []
-
-    # Cache metadata per directory so we only read each metadata.json once
-    metadata_cache: dict[Path, dict] = {}
-
-    for file_path in root_dir.rglob("*.csv"):
-        if file_path.parent not in metadata_cache:
-            metadata_file = file_path.parent / "metadata.json"
-            if metadata_file.exists():
-                metadata_cache[file_path.parent] = json.loads(metadata_file.read_text())
-
-            metadata = json.loads(metadata_file.read_text())
-            if metadata.get("bulk_container_image"):
-                results.append(
+    csv_sources: list[SitemapSourceWithMetadata] = []
+    xml_sources: list[SitemapSourceWithMetadata] = []
+
+    # bulk dumps named by the metadata of a directory or its parents
+    dumps: set[Path] = set()
+    pending = [root_dir]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+
+        metadata: dict = {}
+        subdirectories: list[Path] = []
+        files: list[tuple[os.DirEntry, str]] = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(directory / entry.name)
+            elif entry.name == "metadata.json":
+                with open(entry.path) as f:
+                    metadata = json.load(f)
+            elif entry.name.endswith(".csv") or entry.name.endswith(".xml"):
+                files.append((entry, entry.name[-4:]))
+
+        if metadata.get("bulk_dump"):
+            dumps.add(directory / metadata["bulk_dump"])
+
+        for entry, extension in files:
+            path = directory / entry.name
+            if path in dumps:
+                continue
+            stat = entry.stat()
+            last_modified = datetime.datetime.fromtimestamp(stat.st_mtime)
+            if extension == ".xml":
+                xml_sources.append(
                     SitemapSourceWithMetadata(
-                        last_modified=datetime.datetime.fromtimestamp(
-                            file_path.stat().st_mtime
-                        ),
+                        last_modified=last_modified,
                         metadata=metadata,
-                        path=file_path,
+                        path=path,
+                        file_type="pregenerated_xml",
+                    )
+                )
+            elif metadata.get("bulk_container_image") or metadata.get("bulk_dump"):
+                # the sitemap of a dump changes with the dump
+                dump = directory / metadata.get("bulk_dump", "")
+                if metadata.get("bulk_dump") and dump.exists():
+                    last_modified = max(
+                        last_modified,
+                        datetime.datetime.fromtimestamp(dump.stat().st_mtime),
+                    )
+                csv_sources.append(
+                    SitemapSourceWithMetadata(
+                        last_modified=last_modified,
+                        metadata=metadata,
+                        path=path,
                         file_type="bulk",
                     )
                 )
-                continue
-
-        results.append(
-            SitemapSourceWithMetadata(
-                last_modified=datetime.datetime.fromtimestamp(
-                    file_path.stat().st_mtime
-                ),
-                metadata=metadata_cache.get(file_path.parent) or {},
-                path=file_path,
-                file_type="regex_csv" if is_regex_csv(file_path) else "one_to_one_csv",
-            )
-        )
+            else:
+                csv_sources.append(
+                    SitemapSourceWithMetadata(
+                        last_modified=last_modified,
+                        metadata=metadata,
+                        path=path,
+                        file_type="regex_csv"
+                        if classify_csv(path, stat.st_size)
+                        else "one_to_one_csv",
+                    )
+                )
 
-    for file_path in root_dir.rglob("*.xml"):
-        if file_path.parent not in metadata_cache:
-            metadata_file = file_path.parent / "metadata.json"
-            if metadata_file.exists():
-                metadata_cache[file_path.parent] = json.loads(metadata_file.read_text())
-        results.append(
-            SitemapSourceWithMetadata(
-                last_modified=datetime.datetime.fromtimestamp(
-                    file_path.stat().st_mtime
-                ),
-                metadata=metadata_cache.get(file_path.parent) or {},
-                path=file_path,
-                file_type="pregenerated_xml",
-            )
-        )
+        # walk depth first in name order
+        pending.extend(reversed(subdirectories))
 
-    return results
+    return csv_sources + xml_sources
 
 
 def OPTION_VERBOSITY(f):
@@ -0,0 +1,147 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""Regenerate sitemaps as the namespace directory changes"""
+
+from pathlib import Path
+
+import click
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.sink import S3Sink, is_s3_url
+from sitemap_generator.util import OPTION_VERBOSITY
+from sitemap_generator.watch.watcher import (
+    DEFAULT_DEBOUNCE,
+    DEFAULT_POLL_INTERVAL,
+    open_watcher,
+    watch_namespace,
+)
+
+
+@click.command()
+@click.pass_context
+@OPTION_VERBOSITY
+@click.argument(
+    "namespace-input-dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "-u",
+    "--uri-base",
+    type=str,
+    default="https://geoconnex.us",
+    help="uri stem to be removed from short url for keyword",
+)
+@click.option(
+    "-o",
+    "--sitemap-output-dir",
+    type=str,
+    envvar="SITEMAP_DIR",
+    default="/tmp/sitemaps",
+    help="directory to write sitemaps to, or an s3://bucket/prefix url to "
+    "upload them to",
+)
+@click.option(
+    "--work-dir",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    envvar="SITEMAP_WORK_DIR",
+    default=Path("/tmp/sitemap-work"),
+    help="local directory for the build manifest and staged files when writing to s3",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    envvar="SITEMAP_WORKERS",
+    default=1,
+    help="number of processes used to generate sitemaps in parallel",
+)
+@click.option(
+    "--gzip",
+    "compress",
+    is_flag=True,
+    default=False,
+    help="write gzip compressed sitemaps (.xml.gz)",
+)
+@click.option(
+    "--debounce",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_DEBOUNCE,
+    help="seconds without further changes to wait before rebuilding",
+)
+@click.option(
+    "--poll",
+    is_flag=True,
+    default=False,
+    help="poll for changes instead of using inotify",
+)
+@click.option(
+    "--poll-interval",
+    type=click.FloatRange(min=0.1),
+    default=DEFAULT_POLL_INTERVAL,
+    help="seconds between scans when polling",
+)
+def watch(
+    ctx,
+    verbosity,
+    namespace_input_dir: Path,
+    uri_base: str,
+    sitemap_output_dir: str,
+    work_dir: Path,
+    workers: int,
+    compress: bool,
+    debounce: float,
+    poll: bool,
+    poll_interval: float,
+):
+    """
+    Generate sitemaps, then regenerate the ones affected whenever a csv,
+    xml or metadata.json in the namespace directory changes
+    """
+    sink = None
+    output_dir = Path(sitemap_output_dir)
+    if is_s3_url(sitemap_output_dir):
+        sink = S3Sink.from_url(sitemap_output_dir)
+        output_dir = work_dir
+
+    handler = FileSystemHandler(compress=compress, sink=sink)
+    with open_watcher(namespace_input_dir, poll_interval, poll) as watcher:
+        try:
+            watch_namespace(
+                handler,
+                namespace_input_dir,
+                uri_base,
+                output_dir,
+                watcher,
+                debounce,
+                workers,
+            )
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,365 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+"""
+Watch a namespace directory and regenerate the sitemaps of the sources
+that change, using inotify where the platform has it and polling elsewhere
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from sitemap_generator.handler.base import FileSystemHandler, SitemapGenerationError
+from sitemap_generator.util import SitemapSourceWithMetadata, get_all_sitemap_sources
+
+if TYPE_CHECKING:
+    from typing import Self
+
+LOGGER = logging.getLogger(__name__)
+
+WATCHED_SUFFIXES = (".csv", ".xml")
+METADATA_FILENAME = "metadata.json"
+
+# seconds without further changes before a burst of changes is rebuilt
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify(7) flags
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+
+# wd, mask, cookie and length of the name that follows
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def is_watched(path: Path) -> bool:
+    """Whether a change to `path` can change the sitemaps"""
+    return path.name == METADATA_FILENAME or path.suffix in WATCHED_SUFFIXES
+
+
+class Watcher(ABC):
+    """Reports paths below a root directory that changed"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    @abstractmethod
+    def read(self, timeout: float | None = None) -> set[Path]:
+        """
+        Wait up to `timeout` seconds, or indefinitely if `None`, for
+        changes. Directories are reported when everything below them may
+        have changed
+
+        :returns: `set` of changed paths, empty if none changed in time
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class InotifyWatcher(Watcher):
+    """
+    Watch every directory below the root with one inotify instance, adding
+    watches for directories as they are created
+
+    :raises OSError: if inotify is unavailable or out of watches
+    """
+
+    def __init__(self, root: Path):
+        super().__init__(root)
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except AttributeError as e:
+            raise OSError("inotify is not available on this platform") from e
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directories: dict[int, Path] = {}
+        try:
+            self.watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def watch_tree(self, directory: Path) -> None:
+        pending = [directory]
+        while pending:
+            path = pending.pop()
+            wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno, f"Can't watch {path}: {os.strerror(errno)}")
+            self.directories[wd] = path
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(Path(entry.path))
+
+    def read(self, timeout: float | None = None) -> set[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return set()
+
+        changed: set[Path] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped, so anything may have changed
+                changed.add(self.root)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.directories[wd]
+                continue
+            path = directory / name if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and path.is_dir():
+                    # files may already exist in a directory moved or
+                    # created before its watch was added
+                    try:
+                        self.watch_tree(path)
+                    except OSError as e:
+                        LOGGER.warning(e)
+                changed.add(path)
+            elif is_watched(path) or mask & IN_DELETE_SELF:
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher(Watcher):
+    """Compare the size and mtime of every watched file at an interval"""
+
+    def __init__(self, root: Path, interval: float = DEFAULT_POLL_INTERVAL):
+        super().__init__(root)
+        self.interval = interval
+        self.state = self.snapshot()
+
+    def snapshot(self) -> dict[Path, tuple[int, int]]:
+        state = {}
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(Path(entry.path))
+                elif is_watched(Path(entry.name)):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    state[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        return state
+
+    def read(self, timeout: float | None = None) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self.snapshot()
+            changed = {
+                path
+                for path in current.keys() | self.state.keys()
+                if current.get(path) != self.state.get(path)
+            }
+            self.state = current
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+            time.sleep(max(wait, 0))
+
+
+def open_watcher(
+    root: Path, poll_interval: float = DEFAULT_POLL_INTERVAL, polling: bool = False
+) -> Watcher:
+    """Watch `root` with inotify, falling back to polling"""
+    if not polling:
+        try:
+            return InotifyWatcher(root)
+        except OSError as e:
+            LOGGER.warning(f"Falling back to polling for changes: {e}")
+    return PollingWatcher(root, poll_interval)
+
+
+def wait_for_changes(watcher: Watcher, debounce: float = DEFAULT_DEBOUNCE) -> set[Path]:
+    """
+    Block until something changes, then keep collecting changes until
+    none arrive for `debounce` seconds, so a burst of writes or a checkout
+    of many files results in a single rebuild
+    """
+    changed = watcher.read()
+    while more := watcher.read(debounce):
+        changed |= more
+    return changed
+
+
+def affected_sources(
+    changed: Iterable[Path], sources: Iterable[SitemapSourceWithMetadata]
+) -> list[SitemapSourceWithMetadata]:
+    """
+    Sources whose sitemaps a set of changes can alter: changed files
+    themselves, every source next to a changed metadata.json, and every
+    source below a changed directory
+    """
+    changed = set(changed)
+    directories = {
+        path.parent for path in changed if path.name == METADATA_FILENAME
+    } | {path for path in changed if not path.suffix or path.is_dir()}
+    return [
+        source
+        for source in sources
+        if source.path in changed or not directories.isdisjoint(source.path.parents)
+    ]
+
+
+def watch_namespace(
+    handler: FileSystemHandler,
+    namespace_input_dir: Path,
+    uri_base: str,
+    sitemap_output_dir: Path,
+    watcher: Watcher,
+    debounce: float = DEFAULT_DEBOUNCE,
+    workers: int = 1,
+    max_builds: int | None = None,
+) -> None:
+    """
+    Generate the sitemaps once, then regenerate the sources affected by
+    every burst of changes reported by `watcher`. Each build goes through
+    the build manifest, so the sitemap index is rewritten atomically and
+    deleted sources lose their sitemaps. Failed builds are logged and the
+    sitemaps of the last good build are kept
+
+    :param max_builds: stop after this many rebuilds; runs until
+        interrupted if `None`
+    """
+    build(handler, namespace_input_dir, uri_base, sitemap_output_dir, workers)
+    builds = 0
+    while max_builds is None or builds < max_builds:
+        changed = wait_for_changes(watcher, debounce)
+        sources = get_all_sitemap_sources(namespace_input_dir)
+        affected = affected_sources(changed, sources)
+        LOGGER.info(f"{len(changed)} paths changed, rebuilding {len(affected)} sources")
+        build(
+            handler,
+            namespace_input_dir,
+            uri_base,
+            sitemap_output_dir,
+            workers,
+            {source.path for source in affected},
+        )
+        builds += 1
+
+
+def build(
+    handler: FileSystemHandler,
+    namespace_input_dir: Path,
+    uri_base: str,
+    sitemap_output_dir: Path,
+    workers: int,
+    rebuild: set[Path] | frozenset[Path] = frozenset(),
+) -> None:
+    try:
+        metrics = handler.generate(
+            namespace_input_dir,
+            uri_base,
+            sitemap_output_dir,
+            workers=workers,
+            rebuild=rebuild,
+        )
+    except SitemapGenerationError as e:
+        LOGGER.error(e)
+        return
+    except (OSError, ValueError) as e:
+        # a file may be half written or removed while it is read
+        LOGGER.error(f"Build failed, waiting for further changes: {e}")
+        return
+    LOGGER.info(
+        f"Built {metrics.count('written')} sources in {metrics.total_seconds:.2f}s"
+    )
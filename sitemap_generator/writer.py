@@ -0,0 +1,419 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#          Colton Loftus <cloftus@lincolninst.edu>
+#
+# Copyright (c) 2026 Lincoln Institute of Land Policy
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+"""Streaming sitemap writers that never hold a full document in memory"""
+
+import gzip
+import io
+import os
+import shutil
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING, BinaryIO
+from xml.etree import ElementTree as ET
+
+if TYPE_CHECKING:
+    from typing import Self
+
+# Byte layout matches what `write_tree_to_file` produces for a tree built
+# from `URLSET` and `URLSET_FOREACH` so both code paths are interchangeable
+URLSET_HEADER = (
+    b"<?xml version='1.0' encoding='utf-8'?>\n"
+    b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+URLSET_FOOTER = b"</urlset>"
+URL_ENTRY_START = b"<url>\n    <loc>"
+URL_ENTRY_END = b"</loc>\n</url>"
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Limits from https://www.sitemaps.org/protocol.html
+MAX_URLS_PER_SITEMAP = 50_000
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+DEFAULT_COMPRESSION_LEVEL = 6
+
+
+class ClosingGzipFile(gzip.GzipFile):
+    """A `GzipFile` that closes the file object it was given when closed"""
+
+    def close(self) -> None:
+        fileobj = self.fileobj
+        try:
+            super().close()
+        finally:
+            if fileobj is not None:
+                fileobj.close()
+
+
+def open_for_writing(
+    file: Path, compression_level: int = DEFAULT_COMPRESSION_LEVEL
+) -> BinaryIO:
+    """
+    Open a buffered binary handle for writing a sitemap. Files ending in
+    `.gz` are gzip compressed as they are written. The gzip header carries
+    no timestamp or file name, so identical content always produces
+    identical bytes whichever staged or part file it was written to
+    """
+    if file.suffix != ".gz":
+        return open(file, "wb", buffering=WRITE_BUFFER_SIZE)
+    compressed = ClosingGzipFile(
+        filename="",
+        mode="wb",
+        compresslevel=compression_level,
+        fileobj=open(file, "wb"),  # noqa: SIM115 - closed by ClosingGzipFile
+        mtime=0,
+    )
+    return io.BufferedWriter(compressed, buffer_size=WRITE_BUFFER_SIZE)  # type: ignore[arg-type]
+
+
+def escape_xml_text(text: str) -> str:
+    """Escape character data the same way ElementTree does"""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def url_entry(loc: str, lastmod: str | None = None) -> bytes:
+    """Serialize a single `<url>` record for a urlset"""
+    if lastmod is None:
+        return URL_ENTRY_START + escape_xml_text(loc).encode("utf-8") + URL_ENTRY_END
+    return (
+        URL_ENTRY_START
+        + escape_xml_text(loc).encode("utf-8")
+        + b"</loc>\n    <lastmod>"
+        + lastmod.encode("utf-8")
+        + b"</lastmod>\n</url>"
+    )
+
+
+def stream_urlset(locs: Iterable[str], f: BinaryIO) -> int:
+    """
+    Write a urlset containing every loc in `locs` to a binary file handle
+    without materializing the document
+
+    :returns: `int` number of urls written
+    """
+    count = 0
+    f.write(URLSET_HEADER)
+    for loc in locs:
+        f.write(url_entry(loc))
+        count += 1
+    f.write(URLSET_FOOTER)
+    return count
+
+
+def write_urlset_to_file(
+    locs: Iterable[str],
+    file: Path,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+) -> int:
+    """
+    Stream a urlset to disk through a buffered file handle, compressing it
+    if `file` ends in `.gz`
+
+    :returns: `int` number of urls written
+    """
+    with open_for_writing(file, compression_level) as f:
+        return stream_urlset(locs, f)
+
+
+def serialize_url_element(element: ET.Element) -> bytes:
+    """
+    Serialize a `<url>` element from an existing urlset so that it can be
+    embedded in a new urlset which already declares the sitemap namespace
+    """
+    element.tail = None
+    text = ET.tostring(element, encoding="unicode", default_namespace=SITEMAP_NS)
+    return text.replace(f' xmlns="{SITEMAP_NS}"', "", 1).encode("utf-8")
+
+
+def iter_urlset_entries(path: Path) -> Iterator[bytes]:
+    """
+    Incrementally parse a urlset and yield every `<url>` entry serialized
+    as bytes, discarding elements as soon as they have been consumed
+    """
+    url_tag = f"{{{SITEMAP_NS}}}url"
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, element in context:
+        if event == "end" and element.tag == url_tag:
+            yield serialize_url_element(element)
+            root.clear()
+
+
+def count_urlset_entries(path: Path) -> int:
+    """
+    Check that a file is a well formed urlset with a streaming parse and
+    count its `<url>` entries without building a tree
+
+    :returns: `int` number of urls in the file
+    """
+    url_tag = f"{{{SITEMAP_NS}}}url"
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    if root.tag != f"{{{SITEMAP_NS}}}urlset":
+        raise ValueError(f"{path} is not a sitemap urlset, found {root.tag}")
+
+    count = 0
+    for event, element in context:
+        if event == "end" and element.tag == url_tag:
+            count += 1
+            root.clear()
+    return count
+
+
+def scan_url_entry_count(path: Path) -> int:
+    """
+    Count the `</url>` closing tags in a file with a raw byte scan. Much
+    cheaper than `count_urlset_entries` but does not validate the xml
+    """
+    needle = b"</url>"
+    count = 0
+    tail = b""
+    with open(path, "rb") as f:
+        while chunk := f.read(WRITE_BUFFER_SIZE):
+            block = tail + chunk
+            count += block.count(needle)
+            # keep enough of the end of the block to match a split needle
+            # without counting a match in the overlap twice
+            tail = block[-(len(needle) - 1) :]
+    return count
+
+
+def copy_file(src: Path, dst: Path, hardlink: bool = False) -> None:
+    """
+    Copy a file byte for byte without passing its contents through python,
+    using `os.copy_file_range` where available and `shutil.copyfile`
+    (which uses `sendfile` on Linux) otherwise. With `hardlink` the file is
+    linked instead if `src` and `dst` are on the same filesystem.
+
+    `dst` is always unlinked first so that a previous hard link to `src`
+    can never be truncated
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.unlink(missing_ok=True)
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining == 0:
+                    return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+
+def compress_file(
+    src: Path, dst: Path, compression_level: int = DEFAULT_COMPRESSION_LEVEL
+) -> None:
+    """Stream the bytes of `src` into a gzip compressed `dst`"""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with open(src, "rb") as fsrc, open_for_writing(dst, compression_level) as fdst:
+        shutil.copyfileobj(fsrc, fdst, WRITE_BUFFER_SIZE)
+
+
+def sitemap_suffix(path: Path) -> str:
+    """The full sitemap extension of a path, i.e. `.xml` or `.xml.gz`"""
+    return ".xml.gz" if path.name.endswith(".xml.gz") else path.suffix
+
+
+def iter_urlset_locs(path: Path) -> Iterator[str]:
+    """Incrementally parse a urlset and yield the text of every `<loc>`"""
+    loc_tag = f"{{{SITEMAP_NS}}}loc"
+    url_tag = f"{{{SITEMAP_NS}}}url"
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, element in context:
+        if event != "end":
+            continue
+        if element.tag == loc_tag and element.text:
+            yield element.text.strip()
+        elif element.tag == url_tag:
+            root.clear()
+
+
+def shard_path(output_path: Path, shard: int) -> Path:
+    """Path of the numbered shard `shard` for a sitemap at `output_path`"""
+    suffix = sitemap_suffix(output_path)
+    stem = output_path.name.removesuffix(suffix)
+    return output_path.with_name(f"{stem}__{shard}{suffix}")
+
+
+def starts_new_shard(
+    shard_urls: int, shard_bytes: int, entry_size: int, max_urls: int, max_bytes: int
+) -> bool:
+    """
+    Whether an entry of `entry_size` bytes has to go into a new shard when
+    the current one holds `shard_urls` entries in `shard_bytes` bytes,
+    counting its header. A shard always takes at least one entry
+    """
+    if shard_urls == 0:
+        return False
+    too_big = shard_bytes + entry_size + len(URLSET_FOOTER) > max_bytes
+    return shard_urls >= max_urls or too_big
+
+
+def shard_starts(
+    entry_sizes: Iterable[int],
+    max_urls: int = MAX_URLS_PER_SITEMAP,
+    max_bytes: int = MAX_SITEMAP_BYTES,
+) -> list[int]:
+    """
+    Split entries of the given serialized sizes into shards exactly like
+    `ShardedUrlsetWriter` does, without writing anything
+
+    :returns: `list` of the index of the first entry of every shard
+    """
+    starts = [0]
+    shard_urls = 0
+    shard_bytes = len(URLSET_HEADER)
+    for i, entry_size in enumerate(entry_sizes):
+        if starts_new_shard(shard_urls, shard_bytes, entry_size, max_urls, max_bytes):
+            starts.append(i)
+            shard_urls = 0
+            shard_bytes = len(URLSET_HEADER)
+        shard_urls += 1
+        shard_bytes += entry_size
+    return starts
+
+
+class ShardedUrlsetWriter:
+    """
+    Write urlset entries to disk, rolling over into numbered shard files
+    (`name__0.xml`, `name__1.xml`, ...) whenever the next entry would
+    exceed either the url count or byte size limit of a single sitemap.
+    If everything fits in one file it is written to `output_path` itself.
+    When `output_path` ends in `.xml.gz` shards are compressed as they are
+    written; the byte limit always applies to the uncompressed size.
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        max_urls: int = MAX_URLS_PER_SITEMAP,
+        max_bytes: int = MAX_SITEMAP_BYTES,
+        compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+    ):
+        self.output_path = output_path
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self.shards: list[Path] = []
+        self.url_count = 0
+        self._file: BinaryIO | None = None
+        self._shard_urls = 0
+        self._shard_bytes = 0
+
+    def __enter__(self) -> "Self":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+
+    def _open_shard(self) -> BinaryIO:
+        path = shard_path(self.output_path, len(self.shards))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.shards.append(path)
+        self._file = open_for_writing(path, self.compression_level)
+        self._file.write(URLSET_HEADER)
+        self._shard_urls = 0
+        self._shard_bytes = len(URLSET_HEADER)
+        return self._file
+
+    def _close_shard(self) -> None:
+        assert self._file is not None
+        self._file.write(URLSET_FOOTER)
+        self._file.close()
+        self._file = None
+
+    def write(self, entry: bytes) -> None:
+        """Append a serialized `<url>` entry, starting a new shard if needed"""
+        f = self._file
+        if f is not None and starts_new_shard(
+            self._shard_urls,
+            self._shard_bytes,
+            len(entry),
+            self.max_urls,
+            self.max_bytes,
+        ):
+            self._close_shard()
+            f = None
+        if f is None:
+            f = self._open_shard()
+        f.write(entry)
+        self._shard_urls += 1
+        self._shard_bytes += len(entry)
+        self.url_count += 1
+
+    def write_loc(self, loc: str, lastmod: str | None = None) -> None:
+        """Append a `<url>` entry for a single loc"""
+        self.write(url_entry(loc, lastmod))
+
+    def close(self) -> list[Path]:
+        """
+        Finish the current shard and return the paths of all files written.
+        A sitemap with a single shard is renamed to `output_path`
+        """
+        if self._file is None and not self.shards:
+            self._open_shard()
+        if self._file is not None:
+            self._close_shard()
+        if len(self.shards) == 1 and self.shards[0] != self.output_path:
+            self.shards[0].replace(self.output_path)
+            self.shards[0] = self.output_path
+        return self.shards
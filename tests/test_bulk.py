@@ -0,0 +1,182 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import gzip
+import json
+import os
+from pathlib import Path
+from xml.etree import ElementTree
+
+import pytest
+
+from sitemap_generator.bulk import BulkDump, count_dump_records
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.plan.planner import plan_run
+from sitemap_generator.util import get_all_sitemap_sources
+
+GNIS = "https://geoconnex.us/usgs/gnis"
+
+
+def make_bulk_dir(root: Path, dump: str, contents: str, **metadata) -> Path:
+    directory = root / "bulk" / "gnis"
+    directory.mkdir(parents=True)
+    (directory / "metadata.json").write_text(
+        json.dumps(
+            {
+                "bulk_container_image": "internetofwater/gnis_bulk_rdf:latest",
+                "bulk_dump": dump,
+                **metadata,
+            }
+        )
+    )
+    (directory / "gnis.csv").write_text(
+        "id,target,creator,description\n"
+        f"{GNIS}/([0-9]+),https://example.com/$1,a@example.com,gnis\n"
+    )
+    path = directory / dump
+    if dump.endswith(".gz"):
+        path.write_bytes(gzip.compress(contents.encode("utf-8")))
+    else:
+        path.write_text(contents)
+    return directory
+
+
+def test_ndjson_dump_with_pattern(tmp_path):
+    lines = [
+        json.dumps({"uri": f"{GNIS}/1", "name": "a"}),
+        "",
+        json.dumps({"uri": "https://example.com/not-a-pid"}),
+        json.dumps({"name": "no uri"}),
+        json.dumps({"uri": f"{GNIS}/2"}),
+    ]
+    path = tmp_path / "dump.ndjson.gz"
+    path.write_bytes(gzip.compress("\n".join(lines).encode("utf-8")))
+    dump = BulkDump.from_metadata(
+        {
+            "bulk_dump": path.name,
+            "bulk_pid_field": "uri",
+            "bulk_pid_pattern": f"^{GNIS}/",
+        },
+        tmp_path,
+    )
+    assert dump and dump.format == "ndjson"
+    assert list(dump.iter_pids()) == [f"{GNIS}/1", f"{GNIS}/2"]
+    assert count_dump_records(path) == 5
+
+
+def test_csv_and_ntriples_dumps(tmp_path):
+    (tmp_path / "dump.csv").write_text("gnis_id,name\n1,a\n2,b\n2,b\n")
+    dump = BulkDump.from_metadata(
+        {
+            "bulk_dump": "dump.csv",
+            "bulk_pid_field": "gnis_id",
+            "bulk_pid_pattern": r"^(\d+)$",
+        },
+        tmp_path,
+    )
+    assert dump and list(dump.iter_pids()) == ["1", "2"]
+
+    (tmp_path / "dump.nt").write_text(
+        "# comment\n"
+        f'<{GNIS}/1> <http://schema.org/name> "a" .\n'
+        f"<{GNIS}/1> <http://schema.org/geo> _:b0 .\n"
+        '_:b0 <http://schema.org/latitude> "1.0" .\n'
+        f'<{GNIS}/2> <http://schema.org/name> "b" .\n'
+    )
+    dump = BulkDump.from_metadata({"bulk_dump": "dump.nt"}, tmp_path)
+    assert dump and list(dump.iter_pids()) == [f"{GNIS}/1", f"{GNIS}/2"]
+
+    assert BulkDump.from_metadata({}, tmp_path) is None
+    with pytest.raises(ValueError, match="format"):
+        BulkDump.from_metadata({"bulk_dump": "dump.bin"}, tmp_path)
+    dump = BulkDump.from_metadata({"bulk_dump": "dump.csv"}, tmp_path)
+    with pytest.raises(ValueError, match="no id column"):
+        list(dump.iter_pids())  # type: ignore[union-attr]
+
+
+def test_bulk_dump_is_streamed_into_shards(tmp_path):
+    namespaces = tmp_path / "namespaces"
+    lines = [json.dumps({"id": f"{GNIS}/{i}"}) for i in range(25)]
+    directory = make_bulk_dir(namespaces, "gnis.ndjson.gz", "\n".join(lines) + "\n")
+    output = tmp_path / "sitemaps"
+    handler = FileSystemHandler(max_urls_per_sitemap=10)
+
+    estimate = plan_run(handler, namespaces, output)
+    assert estimate.urls == 25
+    assert estimate.sitemaps == 3
+
+    metrics = handler.generate(namespaces, "https://geoconnex.us", output)
+    shards = [output / "bulk" / f"gnis__{i}.xml" for i in range(3)]
+    locs = [
+        loc.text
+        for shard in shards
+        for loc in ElementTree.parse(shard).findall(".//{*}loc")
+    ]
+    assert locs == [f"{GNIS}/{i}" for i in range(25)]
+    index = (output / "sitemap.xml").read_text()
+    assert all(f"/sitemap/bulk/gnis__{i}.xml" in index for i in range(3))
+    assert metrics.sources[0].url_count == 25
+
+    metrics = handler.generate(namespaces, "https://geoconnex.us", output)
+    assert metrics.sources[0].skip_reason == "unchanged"
+
+    # a new dump rebuilds the source even though its csv is unchanged
+    dump = directory / "gnis.ndjson.gz"
+    dump.write_bytes(gzip.compress("\n".join(lines[:5]).encode("utf-8")))
+    os.utime(dump, ns=(0, 10**18))
+    metrics = handler.generate(namespaces, "https://geoconnex.us", output)
+    assert metrics.sources[0].url_count == 5
+    assert (output / "bulk" / "gnis.xml").exists()
+    assert not shards[0].exists()
+
+
+def test_csv_dump_is_not_a_source(tmp_path):
+    namespaces = tmp_path / "namespaces"
+    rows = "".join(f"{GNIS}/{i},https://example.com/{i}\n" for i in range(5))
+    make_bulk_dir(
+        namespaces,
+        "dump.csv",
+        "id,target\n" + rows,
+        bulk_dump_format="csv",
+        bulk_pid_field="id",
+        bulk_pid_pattern=f"^{GNIS}/",
+    )
+    sources = get_all_sitemap_sources(namespaces)
+    assert [source.path.name for source in sources] == ["gnis.csv"]
+
+    output = tmp_path / "sitemaps"
+    metrics = FileSystemHandler().generate(namespaces, "https://geoconnex.us", output)
+    assert metrics.sources[0].url_count == 5
+    index = ElementTree.parse(output / "sitemap.xml").getroot()
+    (entry,) = index
+    tags = [child.tag.split("}", 1)[1] for child in entry]
+    assert "bulk_container_image" in tags
+    for key in ("bulk_dump", "bulk_dump_format", "bulk_pid_field", "bulk_pid_pattern"):
+        assert key not in tags
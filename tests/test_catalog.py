@@ -0,0 +1,113 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import io
+
+import pytest
+
+from sitemap_generator import SitemapCatalog
+from sitemap_generator.handler.base import FileSystemHandler
+
+
+def test_catalog_renders_the_same_bytes_as_generate(tmp_path, namespaces):
+    output_dir = tmp_path / "output"
+    FileSystemHandler().generate(namespaces, "https://geoconnex.us", output_dir)
+    catalog = SitemapCatalog(namespaces, "https://geoconnex.us")
+
+    sources = catalog.sources()
+    assert {source.name for source in sources} >= {"ref/hu08", "iow/links__0"}
+    for source in sources:
+        buffer = io.BytesIO()
+        written = catalog.write_sitemap(source.name, buffer)
+        expected = (output_dir / f"{source.name}.xml").read_bytes()
+        assert buffer.getvalue() == expected
+        assert written == len(expected)
+
+    assert b"".join(catalog.iter_index()) == (output_dir / "sitemap.xml").read_bytes()
+
+
+def test_catalog_pages_match_generated_shards(tmp_path, namespaces):
+    output_dir = tmp_path / "output"
+    FileSystemHandler(max_urls_per_sitemap=1000).generate(
+        namespaces, "https://geoconnex.us", output_dir
+    )
+    catalog = SitemapCatalog(
+        namespaces, "https://geoconnex.us", max_urls_per_sitemap=1000
+    )
+
+    hu08 = catalog.source("ref/hu08")
+    assert hu08 is not None and hu08.pages > 1
+    for page in range(hu08.pages):
+        chunks = list(catalog.iter_sitemap("ref/hu08", page))
+        assert len(chunks) > 2
+        expected = (output_dir / "ref" / f"hu08__{page}.xml").read_bytes()
+        assert b"".join(chunks) == expected
+
+    entries = [e for e in catalog.index_entries() if e.source == "ref/hu08"]
+    assert [e.page for e in entries] == list(range(hu08.pages))
+    assert entries[1].loc == "https://geoconnex.us/sitemap/ref/hu08__1.xml"
+    assert entries[1].sitemap_id == "ref:hu08__1"
+    assert entries[1].metadata == {
+        key: str(value) for key, value in hu08.metadata.items()
+    }
+
+    with pytest.raises(IndexError):
+        catalog.iter_sitemap("ref/hu08", hu08.pages)
+    with pytest.raises(KeyError):
+        catalog.iter_sitemap("ref/missing")
+
+
+def test_catalog_pages_split_at_the_byte_limit_like_generate(tmp_path, namespaces):
+    # a pregenerated sitemap with few urls but too many bytes
+    FileSystemHandler().generate(namespaces, "https://geoconnex.us", tmp_path / "a")
+    (namespaces / "big").mkdir()
+    (namespaces / "big" / "metadata.json").write_text("{}")
+    (tmp_path / "a" / "ref" / "hu08.xml").replace(namespaces / "big" / "xml.xml")
+
+    output_dir = tmp_path / "output"
+    FileSystemHandler(max_sitemap_bytes=20_000).generate(
+        namespaces, "https://geoconnex.us", output_dir
+    )
+    catalog = SitemapCatalog(
+        namespaces, "https://geoconnex.us", max_sitemap_bytes=20_000
+    )
+
+    for name in ("ref/hu08", "big/xml"):
+        source = catalog.source(name)
+        assert source is not None
+        shards = sorted(
+            (output_dir / name).parent.glob(f"{source.path.stem}__*.xml"),
+            key=lambda path: int(path.stem.rsplit("__", 1)[1]),
+        )
+        assert source.pages == len(shards) > 1
+        for page, shard in enumerate(shards):
+            buffer = io.BytesIO()
+            catalog.write_sitemap(name, buffer, page)
+            assert buffer.getvalue() == shard.read_bytes()
@@ -0,0 +1,205 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import csv
+from itertools import pairwise
+from pathlib import Path
+
+import pytest
+
+from sitemap_generator import csv_reader
+from sitemap_generator.csv_reader import (
+    iter_column,
+    iter_column_batches,
+    iter_rows,
+    record_ranges,
+)
+
+
+def csv_module_column(path: Path, column: str) -> list[str]:
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        index = next(reader).index(column)
+        return [row[index] for row in reader if row]
+
+
+def write_rows(
+    path: Path,
+    rows: list[list[str]],
+    lineterminator: str = "\n",
+    quoting: int = csv.QUOTE_MINIMAL,
+):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator=lineterminator, quoting=quoting)
+        writer.writerows(rows)
+
+
+@pytest.mark.parametrize("column", ["id", "target", "description"])
+def test_fast_path_matches_csv_module(tmp_path, column):
+    path = tmp_path / "plain.csv"
+    rows = [["id", "target", "creator", "description"]]
+    rows += [
+        [f"https://geoconnex.us/ref/{i}", f"https://e.com/{i}", "me", f"ü{i}"]
+        for i in range(5000)
+    ]
+    write_rows(path, rows)
+
+    batches = list(iter_column_batches(path, column, block_size=4096, backend="python"))
+    assert len(batches) > 1
+    assert [v for batch in batches for v in batch] == csv_module_column(path, column)
+
+
+def test_quoted_and_multiline_fields_fall_back_to_csv_module(tmp_path):
+    path = tmp_path / "quoted.csv"
+    rows = [["id", "target", "description"]]
+    rows += [
+        [f"https://geoconnex.us/ref/{i}", "https://e.com", "plain"] for i in range(2000)
+    ]
+    # quoting only starts well after the first block
+    rows += [
+        ["https://geoconnex.us/ref/a,b", "https://e.com", 'says "hi"'],
+        ["https://geoconnex.us/ref/multi", "https://e.com", "line one\nline two"],
+        ["https://geoconnex.us/ref/last", "https://e.com", "plain"],
+    ]
+    write_rows(path, rows)
+
+    for column in ("id", "description"):
+        values = list(iter_column(path, column, block_size=1024, backend="python"))
+        assert values == csv_module_column(path, column)
+    assert "https://geoconnex.us/ref/a,b" in iter_column(path, "id", backend="python")
+
+
+def test_fully_quoted_rows_use_fast_path(tmp_path, monkeypatch):
+    path = tmp_path / "hu08.csv"
+    rows = [["id", "target", "creator", "description"]]
+    rows += [
+        [f"https://geoconnex.us/ref/hu08/{i:08}", "https://e.com/a,b", "me", ""]
+        for i in range(2000)
+    ]
+    write_rows(path, rows, "\r\n", quoting=csv.QUOTE_ALL)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("fell back to the csv module")
+
+    monkeypatch.setattr(csv_reader, "_iter_csv_module", fail)
+    for column in ("id", "target", "description"):
+        values = list(iter_column(path, column, block_size=1024, backend="python"))
+        assert values == [row[rows[0].index(column)] for row in rows[1:]]
+
+    hu08 = Path(__file__).parent / "data/namespaces/ref/hu08/hu08.csv"
+    assert list(iter_column(hu08, "id", backend="python")) == csv_module_column(
+        hu08, "id"
+    )
+
+
+@pytest.mark.parametrize(
+    "row",
+    [
+        ["https://geoconnex.us/ref/x", 'says "hi"'],
+        ["https://geoconnex.us/ref/x", 'a","b'],
+        ["https://geoconnex.us/ref/x", "line one\nline two"],
+    ],
+)
+def test_quoted_rows_with_escapes_fall_back(tmp_path, row):
+    path = tmp_path / "quoted.csv"
+    rows = [["id", "description"], ["https://geoconnex.us/ref/a", "plain"], row]
+    write_rows(path, rows, quoting=csv.QUOTE_ALL)
+    assert list(iter_column(path, "description", backend="python")) == [
+        "plain",
+        row[1],
+    ]
+
+
+def test_mixed_quoting_falls_back(tmp_path):
+    path = tmp_path / "mixed.csv"
+    path.write_text('id,description\n"a",plain\nb,"quoted"\n"c","d"\n')
+    assert list(iter_column(path, "id", backend="python")) == ["a", "b", "c"]
+    assert list(iter_column(path, "description", backend="python")) == [
+        "plain",
+        "quoted",
+        "d",
+    ]
+
+
+def test_crlf_and_blank_lines(tmp_path):
+    path = tmp_path / "crlf.csv"
+    write_rows(path, [["target", "id"], ["t1", "a"], ["t2", "b"]], "\r\n")
+    with open(path, "a", newline="") as f:
+        f.write("\r\nt3,c\r\n")
+    assert list(iter_column(path, "id", backend="python")) == ["a", "b", "c"]
+
+    with pytest.raises(ValueError):
+        list(iter_column(path, "missing", backend="python"))
+
+
+def test_pyarrow_backend_matches_python_backend(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "quoted.csv"
+    write_rows(
+        path,
+        [["id", "description"], ["a", "x"], ['b,"c"', "line\nbreak"], ["d", "y"]],
+    )
+    assert list(iter_column(path, "id", backend="pyarrow")) == list(
+        iter_column(path, "id", backend="python")
+    )
+
+
+def test_record_ranges_never_split_quoted_newlines(tmp_path):
+    path = tmp_path / "multiline.csv"
+    rows = [["id", "description"]]
+    rows += [[f"https://geoconnex.us/ref/{i}", f'line\n"{i}"\nend'] for i in range(500)]
+    write_rows(path, rows)
+
+    ranges = record_ranges(path, range_size=1000)
+    assert ranges is not None and len(ranges) > 5
+    assert ranges[-1][1] == path.stat().st_size
+    for (_, end), (start, _) in pairwise(ranges):
+        assert end == start
+
+    ids = [
+        value
+        for byte_range in ranges
+        for batch in iter_column_batches(
+            path, "id", block_size=64, byte_range=byte_range
+        )
+        for value in batch
+    ]
+    assert ids == csv_module_column(path, "id")
+    assert [row for r in ranges for row in iter_rows(path, r)] == rows[1:]
+
+
+def test_record_ranges_give_up_on_unbalanced_quotes(tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_reader, "MAX_ROW_BYTES", 64)
+    path = tmp_path / "unbalanced.csv"
+    path.write_text("id,target\n" + 'a,"b\n' + "".join(f"{i},t\n" for i in range(100)))
+    assert record_ranges(path, range_size=100) is None
+
+    path.write_text("id,target\n" + "".join(f"{i},t\n" for i in range(100)))
+    assert len(record_ranges(path, range_size=100)) > 1
@@ -0,0 +1,117 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+import json
+from pathlib import Path
+from xml.etree import ElementTree
+
+from sitemap_generator.delta import (
+    DELTA_INDEX,
+    DELTA_REMOVED,
+    diff_snapshots,
+    read_records,
+    write_snapshot,
+)
+from sitemap_generator.handler.base import FileSystemHandler
+
+
+def test_snapshots_are_sorted_deduplicated_and_diffed(tmp_path: Path):
+    old_pids = [f"https://geoconnex.us/test/{i}" for i in range(50)]
+    new_pids = old_pids[10:] + [f"https://geoconnex.us/test/new/{i}" for i in range(5)]
+
+    # a tiny chunk size forces the snapshot to be merged from many sorted runs
+    assert write_snapshot(old_pids + old_pids[:5], tmp_path / "old", chunk_size=7) == 50
+    assert write_snapshot(new_pids, tmp_path / "new", chunk_size=7) == 45
+
+    records = list(read_records(tmp_path / "old"))
+    assert records == sorted(records)
+
+    changes = list(
+        diff_snapshots(read_records(tmp_path / "old"), read_records(tmp_path / "new"))
+    )
+    assert sorted(pid for added, pid in changes if added) == sorted(new_pids[40:])
+    assert sorted(pid for added, pid in changes if not added) == sorted(old_pids[:10])
+
+
+def test_delta_sitemaps_list_added_and_removed_urls(tmp_path: Path, namespaces):
+    output_dir = tmp_path / "output"
+    handler = FileSystemHandler(delta=True)
+
+    # the first run only records the baseline
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+    assert not (output_dir / DELTA_INDEX).exists()
+
+    hu08 = namespaces / "ref" / "hu08" / "hu08.csv"
+    lines = hu08.read_text().splitlines(keepends=True)
+    removed_pid = lines[1].split(",")[0].strip('"')
+    hu08.write_text(
+        lines[0] + "".join(lines[2:]) + "https://geoconnex.us/ref/hu08/new,target\n"
+    )
+    links = namespaces / "iow" / "links__0.xml"
+    link_pids = [loc.text for loc in ElementTree.parse(links).findall(".//{*}loc")]
+    links.unlink()
+
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+
+    added = ElementTree.parse(output_dir / "delta" / "ref" / "hu08.xml")
+    assert [loc.text for loc in added.findall(".//{*}loc")] == [
+        "https://geoconnex.us/ref/hu08/new"
+    ]
+    removed = (output_dir / "delta" / "ref" / "hu08.removed.txt").read_text()
+    assert removed.splitlines() == [removed_pid]
+
+    removed_links = (output_dir / "delta" / "iow" / "links__0.removed.txt").read_text()
+    assert sorted(removed_links.splitlines()) == sorted(link_pids)
+
+    index = ElementTree.parse(output_dir / DELTA_INDEX)
+    entries = {
+        entry.findtext("{*}sitemap_id"): entry for entry in index.findall("{*}sitemap")
+    }
+    # removed lists are not sitemaps, so they are only referenced as such
+    assert set(entries) == {"ref:hu08"}
+    assert entries["ref:hu08"].findtext("{*}added") == "1"
+    assert entries["ref:hu08"].findtext("{*}removed") == "1"
+    assert entries["ref:hu08"].findtext("{*}removed_list") == (
+        "https://geoconnex.us/sitemap/delta/ref/hu08.removed.txt"
+    )
+    removed_manifest = json.loads((output_dir / DELTA_REMOVED).read_text())
+    assert {
+        source["sitemap_id"]: source["removed_list"]
+        for source in removed_manifest["sources"]
+    } == {
+        "ref:hu08": "https://geoconnex.us/sitemap/delta/ref/hu08.removed.txt",
+        "iow:links__0": "https://geoconnex.us/sitemap/delta/iow/links__0.removed.txt",
+    }
+    assert not (output_dir / ".staging").exists()
+
+    # nothing changed, so the next delta is empty
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+    assert not [path for path in (output_dir / "delta").rglob("*") if path.is_file()]
+    assert not ElementTree.parse(output_dir / DELTA_INDEX).findall("{*}sitemap")
+    assert not json.loads((output_dir / DELTA_REMOVED).read_text())["sources"]
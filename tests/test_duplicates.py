@@ -0,0 +1,175 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from sitemap_generator import cli
+from sitemap_generator.duplicates import detector
+from sitemap_generator.duplicates.detector import find_duplicates, pid_sources
+from sitemap_generator.handler.base import FileSystemHandler, SitemapGenerationError
+from sitemap_generator.util import get_all_sitemap_sources
+
+URLSET = '<?xml version="1.0"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+def write_csv(path: Path, rows: list[tuple[str, str]]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    (path.parent / "metadata.json").write_text("{}")
+    lines = ["id,target"] + [
+        f"https://geoconnex.us/{pid},{target}" for pid, target in rows
+    ]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def make_namespaces(root: Path) -> Path:
+    filler = [(f"a/{i}", f"https://a.example/{i}") for i in range(10)]
+    write_csv(root / "a" / "one.csv", filler + [("shared/1", "https://t/1")])
+    write_csv(
+        root / "b" / "two.csv",
+        [(f"b/{i}", f"https://b.example/{i}") for i in range(10)]
+        + [("shared/1", "https://t/1"), ("shared/2", "https://t/2")]
+        + [("b/0", "https://b.example/0")],
+    )
+    write_csv(
+        root / "c" / "three.csv",
+        [(f"c/{i}", f"https://c.example/{i}") for i in range(10)]
+        + [("shared/2", "https://elsewhere/2")],
+    )
+    (root / "c" / "links.xml").write_text(
+        URLSET
+        + "<url><loc>https://geoconnex.us/c/3</loc></url>"
+        + "<url><loc>https://geoconnex.us/x/1</loc></url>"
+        + "</urlset>"
+    )
+    return root
+
+
+@pytest.mark.parametrize("chunk_size", [3, 1_000_000])
+def test_find_duplicates(tmp_path, chunk_size):
+    root = make_namespaces(tmp_path / "namespaces")
+    sources = pid_sources(get_all_sitemap_sources(root))
+    report = find_duplicates(sources, tmp_path, chunk_size)
+
+    assert report.sources == 4
+    assert report.pids == 37
+    found = {d.pid: d for d in report.duplicates}
+    assert list(found) == [
+        "https://geoconnex.us/b/0",
+        "https://geoconnex.us/c/3",
+        "https://geoconnex.us/shared/1",
+        "https://geoconnex.us/shared/2",
+    ]
+    # a repeated row within one file is a duplicate too
+    assert [o.path.name for o in found["https://geoconnex.us/b/0"].occurrences] == [
+        "two.csv",
+        "two.csv",
+    ]
+    assert [o.target for o in found["https://geoconnex.us/c/3"].occurrences] == [
+        "https://c.example/3",
+        None,
+    ]
+    assert [d.pid for d in report.conflicts] == ["https://geoconnex.us/shared/2"]
+    assert not found["https://geoconnex.us/c/3"].conflicting
+    # sorted runs are cleaned up
+    assert not list(tmp_path.glob(".duplicates-*"))
+
+
+def test_hash_collisions_are_confirmed(tmp_path, monkeypatch):
+    root = make_namespaces(tmp_path / "namespaces")
+    monkeypatch.setattr(detector, "_pid_hash", lambda pid: 1 << 40)
+    report = find_duplicates(pid_sources(get_all_sitemap_sources(root)))
+
+    assert report.candidates == 1
+    assert len(report.duplicates) == 4
+
+
+def test_bulk_dumps_are_checked(tmp_path):
+    root = make_namespaces(tmp_path / "namespaces")
+    directory = root / "bulk" / "gnis"
+    directory.mkdir(parents=True)
+    (directory / "metadata.json").write_text(
+        json.dumps({"bulk_dump": "gnis.ndjson", "bulk_pid_field": "uri"})
+    )
+    (directory / "gnis.csv").write_text(
+        "id,target\nhttps://geoconnex.us/gnis/([0-9]+),https://example.com/$1\n"
+    )
+    (directory / "gnis.ndjson").write_text(
+        "\n".join(
+            json.dumps({"uri": f"https://geoconnex.us/{pid}"})
+            for pid in ["gnis/1", "gnis/2", "x/1"]
+        )
+    )
+
+    sources = pid_sources(get_all_sitemap_sources(root))
+    assert [s.file_type for s in sources].count("dump") == 1
+    report = find_duplicates(sources)
+    assert report.pids == 40
+    found = {d.pid: d for d in report.duplicates}
+    assert [o.path.name for o in found["https://geoconnex.us/x/1"].occurrences] == [
+        "gnis.ndjson",
+        "links.xml",
+    ]
+
+
+def test_duplicates_command(tmp_path):
+    root = make_namespaces(tmp_path / "namespaces")
+    result = CliRunner().invoke(cli, ["duplicates", str(root), "--json"])
+    assert result.exit_code == 1
+    report = json.loads(result.stdout)
+    assert report["duplicate_pids"] == 4
+    assert report["conflicting_pids"] == 1
+    assert report["duplicates"][-1]["occurrences"] == [
+        {"source": "b/two.csv", "target": "https://t/2"},
+        {"source": "c/three.csv", "target": "https://elsewhere/2"},
+    ]
+
+
+def test_run_checks_duplicates(tmp_path):
+    root = make_namespaces(tmp_path / "namespaces")
+    output = tmp_path / "sitemaps"
+
+    metrics = FileSystemHandler(check_duplicates="warn").generate(
+        root, "https://geoconnex.us", output
+    )
+    assert metrics.duplicate_pids == 4
+    assert metrics.conflicting_pids == 1
+    assert 'sitemap_generator_run_duplicate_pids{kind="conflicting"} 1' in (
+        metrics.to_prometheus()
+    )
+
+    with pytest.raises(SitemapGenerationError, match="4 duplicate pids"):
+        FileSystemHandler(check_duplicates="fail").generate(
+            root, "https://geoconnex.us", tmp_path / "other"
+        )
+    assert not (tmp_path / "other" / "sitemap.xml").exists()
@@ -0,0 +1,118 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+import datetime
+import sqlite3
+from pathlib import Path
+from xml.etree import ElementTree
+
+from sitemap_generator.fingerprint import LastmodStore
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.util import SitemapSourceWithMetadata
+
+UTC = datetime.timezone.utc
+
+
+def test_lastmod_only_moves_when_a_row_changes(tmp_path: Path):
+    store_path = tmp_path / "lastmod.sqlite"
+    rows = [
+        ("https://geoconnex.us/a", ["https://geoconnex.us/a", "https://a.com"]),
+        ("https://geoconnex.us/b", ["https://geoconnex.us/b", "https://b.com"]),
+    ]
+
+    with LastmodStore(store_path, now=datetime.datetime(2024, 1, 1, tzinfo=UTC)) as s:
+        assert s.lastmods(rows) == ["2024-01-01T00:00:00Z", "2024-01-01T00:00:00Z"]
+
+    changed = [rows[0], (rows[1][0], [rows[1][0], "https://moved.com"])]
+    with LastmodStore(store_path, now=datetime.datetime(2025, 6, 1, tzinfo=UTC)) as s:
+        assert s.lastmods(changed) == ["2024-01-01T00:00:00Z", "2025-06-01T00:00:00Z"]
+
+    # reordering fields between columns is a change too
+    swapped = [(rows[0][0], ["https://a.com", "https://geoconnex.us/a"])]
+    with LastmodStore(store_path, now=datetime.datetime(2026, 1, 1, tzinfo=UTC)) as s:
+        assert s.lastmods(swapped) == ["2026-01-01T00:00:00Z"]
+
+
+def test_one_to_one_csv_urls_get_stable_lastmods(tmp_path: Path):
+    csv_path = tmp_path / "mapping.csv"
+    csv_path.write_text(
+        "id,target\n"
+        + "".join(
+            f"https://geoconnex.us/{i},https://example.com/{i}\n" for i in range(8)
+        )
+    )
+    source = SitemapSourceWithMetadata(
+        path=csv_path,
+        file_type="one_to_one_csv",
+        last_modified=datetime.datetime.now(),
+        metadata={},
+    )
+    store_path = tmp_path / "lastmod.sqlite"
+    handler = FileSystemHandler(lastmod_store=store_path)
+
+    handler.write_sitemap(source, tmp_path / "first.xml")
+    with sqlite3.connect(store_path) as connection:
+        connection.execute("UPDATE fingerprints SET lastmod = 0")
+
+    csv_path.write_text(
+        csv_path.read_text().replace("example.com/3", "example.com/moved")
+    )
+    handler.write_sitemap(source, tmp_path / "second.xml")
+
+    urls = ElementTree.parse(tmp_path / "second.xml").findall("{*}url")
+    lastmods = {url.findtext("{*}loc"): url.findtext("{*}lastmod") for url in urls}
+    assert len(lastmods) == 8
+    assert lastmods.pop("https://geoconnex.us/3") != "1970-01-01T00:00:00Z"
+    assert set(lastmods.values()) == {"1970-01-01T00:00:00Z"}
+
+
+def test_lastmod_store_skips_blank_rows(tmp_path: Path):
+    csv_path = tmp_path / "mapping.csv"
+    csv_path.write_bytes(
+        b"id,target\r\n"
+        b"https://geoconnex.us/a,https://example.com/a\r\n"
+        b"\r\n"
+        b'https://geoconnex.us/b,"https://example.com/b\r\nsecond line"\r\n'
+    )
+    source = SitemapSourceWithMetadata(
+        path=csv_path,
+        file_type="one_to_one_csv",
+        last_modified=datetime.datetime.now(),
+        metadata={},
+    )
+    plain = FileSystemHandler()
+    handler = FileSystemHandler(lastmod_store=tmp_path / "lastmod.sqlite")
+
+    plain.write_sitemap(source, tmp_path / "plain.xml")
+    handler.write_sitemap(source, tmp_path / "lastmod.xml")
+    locs = [
+        [loc.text for loc in ElementTree.parse(tmp_path / name).findall(".//{*}loc")]
+        for name in ("plain.xml", "lastmod.xml")
+    ]
+    assert locs[0] == locs[1] == ["https://geoconnex.us/a", "https://geoconnex.us/b"]
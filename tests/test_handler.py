@@ -27,13 +27,21 @@
 #
 # =================================================================
 
+import datetime
+import gzip
 from pathlib import Path
 from xml.etree import ElementTree
 
 from sitemap_generator.handler.base import FileSystemHandler
+import pytest
 from pytest import fixture
 
-from sitemap_generator.util import get_all_sitemap_sources, write_tree_to_file
+from sitemap_generator.util import (
+    SitemapSourceWithMetadata,
+    get_all_sitemap_sources,
+    write_tree_to_file,
+)
+from sitemap_generator.writer import ShardedUrlsetWriter
 import tempfile
 
 
@@ -166,3 +174,287 @@ def test_sitemap_bulk_handler(handler: FileSystemHandler):
     assert root is not None
     # compare root elements
     assert_elements_equal(root, expected)
+
+
+def test_streamed_one_to_one_csv_matches_tree_output(
+    tmp_path, handler: FileSystemHandler
+):
+    sources = get_all_sitemap_sources(Path(__file__).parent / "data" / "namespaces")
+    csv_source = next(src for src in sources if src.file_type == "one_to_one_csv")
+
+    from_tree = tmp_path / "tree.xml"
+    write_tree_to_file(handler.make_sitemap(csv_source), from_tree)
+
+    streamed = tmp_path / "streamed.xml"
+    assert handler.write_sitemap(csv_source, streamed).outputs
+
+    assert streamed.read_bytes() == from_tree.read_bytes()
+
+
+def test_streamed_urlset_escapes_special_characters(
+    tmp_path, handler: FileSystemHandler
+):
+    csv_path = tmp_path / "escape.csv"
+    pids = [f"https://geoconnex.us/test/{i}?a=1&b=<{i}>" for i in range(6)]
+    csv_path.write_text(
+        "id,target\n" + "".join(f'"{pid}",https://example.com\n' for pid in pids)
+    )
+    source = SitemapSourceWithMetadata(
+        path=csv_path,
+        file_type="one_to_one_csv",
+        last_modified=datetime.datetime.now(),
+        metadata={},
+    )
+
+    streamed = tmp_path / "streamed.xml"
+    assert handler.write_sitemap(source, streamed).outputs
+
+    assert b"&amp;b=&lt;0&gt;" in streamed.read_bytes()
+    locs = [loc.text for loc in ElementTree.parse(streamed).findall(".//{*}loc")]
+    assert locs == pids
+
+
+def test_large_sources_are_split_into_shards(tmp_path):
+    namespaces = Path(__file__).parent / "data" / "namespaces"
+    handler = FileSystemHandler(max_urls_per_sitemap=1000)
+
+    output_dir = tmp_path
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+
+    shards = sorted((output_dir / "ref").glob("hu08__*.xml"))
+    assert [shard.name for shard in shards] == [
+        "hu08__0.xml",
+        "hu08__1.xml",
+        "hu08__2.xml",
+    ]
+    assert not (output_dir / "ref" / "hu08.xml").exists()
+    urls = [len(ElementTree.parse(shard).findall("{*}url")) for shard in shards]
+    assert urls == [1000, 1000, 399]
+
+    index = ElementTree.parse(output_dir / "sitemap.xml")
+    locs = [loc.text for loc in index.findall(".//{*}loc")]
+    for shard in shards:
+        assert f"https://geoconnex.us/sitemap/ref/{shard.name}" in locs
+    assert "https://geoconnex.us/sitemap/iow/links__0.xml" in locs
+
+
+def test_shards_roll_over_at_byte_limit(tmp_path):
+    output_path = tmp_path / "test.xml"
+    with ShardedUrlsetWriter(output_path, max_bytes=400) as writer:
+        for i in range(10):
+            writer.write_loc(f"https://geoconnex.us/test/{i}")
+
+    assert len(writer.shards) > 1
+    assert writer.url_count == 10
+    for shard in writer.shards:
+        assert shard.stat().st_size <= 400
+        ElementTree.parse(shard)
+
+
+def test_oversized_sitemap_index_is_nested(tmp_path):
+    namespaces = Path(__file__).parent / "data" / "namespaces"
+    handler = FileSystemHandler(max_urls_per_sitemap=2)
+
+    output_dir = tmp_path
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+
+    top = ElementTree.parse(output_dir / "sitemap.xml")
+    children = [loc.text for loc in top.findall(".//{*}loc")]
+    assert children[0] == "https://geoconnex.us/sitemap/sitemap__0.xml"
+
+    entries = 0
+    for child in children:
+        assert child
+        name = child.rsplit("/", 1)[1]
+        child_index = ElementTree.parse(output_dir / name)
+        assert len(child_index.findall("{*}sitemap")) <= 2
+        entries += len(child_index.findall("{*}sitemap"))
+    assert entries > 2
+
+
+def test_sitemap_index_is_split_by_bytes(tmp_path):
+    namespaces = Path(__file__).parent / "data" / "namespaces"
+    handler = FileSystemHandler(max_sitemap_bytes=4096)
+    handler.generate(namespaces, "https://geoconnex.us", tmp_path)
+
+    top = ElementTree.parse(tmp_path / "sitemap.xml")
+    children = top.findall("{*}sitemap")
+    assert len(children) > 1
+    entries = 0
+    for child in children:
+        name = child.findtext("{*}loc", "").rsplit("/", 1)[1]
+        child_path = tmp_path / name
+        assert child_path.stat().st_size <= 4096
+        child_index = ElementTree.parse(child_path)
+        entries += len(child_index.findall("{*}sitemap"))
+        lastmods = [el.text for el in child_index.findall(".//{*}lastmod")]
+        assert child.findtext("{*}lastmod") == max(lastmods)
+    assert entries > len(children)
+
+
+def test_parallel_generation_matches_serial(tmp_path):
+    namespaces = Path(__file__).parent / "data" / "namespaces"
+    handler = FileSystemHandler(max_urls_per_sitemap=1000)
+
+    serial_dir = tmp_path / "serial"
+    parallel_dir = tmp_path / "parallel"
+    handler.generate(namespaces, "https://geoconnex.us", serial_dir)
+    handler.generate(namespaces, "https://geoconnex.us", parallel_dir, workers=4)
+
+    serial = sorted(p.relative_to(serial_dir) for p in serial_dir.rglob("*.xml"))
+    parallel = sorted(p.relative_to(parallel_dir) for p in parallel_dir.rglob("*.xml"))
+    assert serial == parallel
+    for path in serial:
+        assert (serial_dir / path).read_bytes() == (parallel_dir / path).read_bytes()
+
+
+def test_large_csv_is_split_into_ranges(tmp_path):
+    namespaces = Path(__file__).parent / "data" / "namespaces"
+    split = FileSystemHandler(max_urls_per_sitemap=1000, csv_range_size=100_000)
+
+    serial_dir = tmp_path / "serial"
+    split_dir = tmp_path / "split"
+    parallel_dir = tmp_path / "parallel"
+    FileSystemHandler().generate(namespaces, "https://geoconnex.us", serial_dir)
+    split.generate(namespaces, "https://geoconnex.us", split_dir)
+    metrics = split.generate(
+        namespaces, "https://geoconnex.us", parallel_dir, workers=3
+    )
+
+    def locs(paths: list[Path]) -> list[str | None]:
+        return [
+            loc.text
+            for path in paths
+            for loc in ElementTree.parse(path).findall(".//{*}loc")
+        ]
+
+    shards = sorted(
+        (split_dir / "ref").glob("hu08__*.xml"),
+        key=lambda p: int(p.stem.split("__")[1]),
+    )
+    # every range starts a shard of its own
+    assert len(shards) > 3
+    assert locs(shards) == locs([serial_dir / "ref" / "hu08.xml"])
+    assert not list(split_dir.rglob("*.part*"))
+    for shard in shards:
+        name = shard.relative_to(split_dir).as_posix()
+        assert (parallel_dir / name).read_bytes() == shard.read_bytes()
+        assert name in (split_dir / "sitemap.xml").read_text()
+
+    hu08 = next(r for r in metrics.sources if r.source_path.name == "hu08.csv")
+    assert hu08.url_count == 2399
+    assert len(hu08.outputs) == len(shards)
+
+    metrics = split.generate(namespaces, "https://geoconnex.us", split_dir)
+    assert metrics.count("written") == 0
+
+
+def test_failing_source_does_not_stop_other_sources(tmp_path, namespaces):
+    broken = namespaces / "broken" / "broken.csv"
+    broken.parent.mkdir()
+    (broken.parent / "metadata.json").write_text("{}")
+    broken.write_text("not_an_id,target\n" + "a,b\n" * 10)
+
+    output_dir = tmp_path / "output"
+    with pytest.raises(RuntimeError, match="broken.csv"):
+        FileSystemHandler().generate(
+            namespaces, "https://geoconnex.us", output_dir, workers=2
+        )
+
+    assert (output_dir / "ref" / "hu08.xml").exists()
+    index = (output_dir / "sitemap.xml").read_text()
+    assert "ref/hu08.xml" in index
+    assert "broken" not in index
+
+
+def test_gzip_output_matches_uncompressed_output(tmp_path):
+    namespaces = Path(__file__).parent / "data" / "namespaces"
+
+    plain_dir = tmp_path / "plain"
+    gzip_dir = tmp_path / "gzip"
+    FileSystemHandler(max_urls_per_sitemap=1000).generate(
+        namespaces, "https://geoconnex.us", plain_dir
+    )
+    FileSystemHandler(max_urls_per_sitemap=1000, compress=True).generate(
+        namespaces, "https://geoconnex.us", gzip_dir
+    )
+
+    compressed = sorted(gzip_dir.rglob("*.xml.gz"))
+    assert compressed
+    for path in compressed:
+        relative = path.relative_to(gzip_dir).with_suffix("")
+        data = path.read_bytes()
+        assert gzip.decompress(data) == (plain_dir / relative).read_bytes()
+        # no FNAME field naming the staged file the shard was written to
+        assert not data[3] & 0x08
+    assert (gzip_dir / "ref" / "hu08__2.xml.gz").exists()
+
+    index = ElementTree.parse(gzip_dir / "sitemap.xml")
+    locs = [loc.text or "" for loc in index.findall(".//{*}loc")]
+    assert "https://geoconnex.us/sitemap/ref/hu08__0.xml.gz" in locs
+    assert all(loc.endswith(".xml.gz") for loc in locs)
+
+
+def test_pregenerated_xml_is_copied_without_reserializing(tmp_path: Path):
+    sources = get_all_sitemap_sources(Path(__file__).parent / "data" / "namespaces")
+    xml_source = next(src for src in sources if src.file_type == "pregenerated_xml")
+    expected_urls = len(ElementTree.parse(xml_source.path).findall("{*}url"))
+
+    copied = tmp_path / "copied.xml"
+    result = FileSystemHandler().write_sitemap(xml_source, copied)
+    assert result.outputs == [copied]
+    assert result.url_count == expected_urls
+    assert copied.read_bytes() == xml_source.path.read_bytes()
+
+    linked = tmp_path / "linked.xml"
+    FileSystemHandler(hardlink_pregenerated_xml=True).write_sitemap(xml_source, linked)
+    assert linked.stat().st_ino == xml_source.path.stat().st_ino
+
+    unverified = FileSystemHandler(verify_pregenerated_xml=False).write_sitemap(
+        xml_source, tmp_path / "unverified.xml"
+    )
+    assert unverified.url_count == expected_urls
+
+    sharded = FileSystemHandler(max_urls_per_sitemap=2).write_sitemap(
+        xml_source, tmp_path / "sharded.xml"
+    )
+    assert len(sharded.outputs) == (expected_urls + 1) // 2
+    assert sharded.url_count == expected_urls
+
+
+def test_pregenerated_xml_must_be_a_urlset(tmp_path: Path):
+    index = tmp_path / "index.xml"
+    index.write_text(
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"/>'
+    )
+    source = SitemapSourceWithMetadata(
+        path=index,
+        file_type="pregenerated_xml",
+        last_modified=datetime.datetime.now(),
+        metadata={},
+    )
+    with pytest.raises(ValueError, match="not a sitemap urlset"):
+        FileSystemHandler().write_sitemap(source, tmp_path / "out.xml")
+
+
+def test_sorted_ids_are_deduplicated_and_stable(tmp_path):
+    rows = [f"https://geoconnex.us/ref/test/{i}" for i in (5, 1, 3, 1, 4, 5, 2)]
+
+    def build(name: str, ordered: list[str]) -> Path:
+        directory = tmp_path / name / "ref" / "test"
+        directory.mkdir(parents=True)
+        (directory / "metadata.json").write_text("{}")
+        (directory / "test.csv").write_text(
+            "id,target\n" + "".join(f"{pid},https://example.com\n" for pid in ordered)
+        )
+        output = tmp_path / f"{name}_out"
+        FileSystemHandler(sort_ids=True).generate(
+            tmp_path / name, "https://geoconnex.us", output
+        )
+        return output / "ref" / "test.xml"
+
+    first = build("first", rows)
+    second = build("second", rows[::-1])
+    locs = [loc.text for loc in ElementTree.parse(first).findall(".//{*}loc")]
+    assert locs == sorted(set(rows))
+    assert first.read_bytes() == second.read_bytes()
@@ -0,0 +1,91 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+import json
+import os
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.manifest import MANIFEST_FILENAME
+
+
+def test_unchanged_sources_are_not_regenerated(tmp_path, namespaces):
+    handler = FileSystemHandler()
+    output_dir = tmp_path / "output"
+
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+    manifest = json.loads((output_dir / MANIFEST_FILENAME).read_text())
+    assert manifest["entries"]["ref/hu08/hu08.csv"]["outputs"] == ["ref/hu08.xml"]
+
+    hu08 = output_dir / "ref" / "hu08.xml"
+    links = output_dir / "iow" / "links__0.xml"
+    os.utime(hu08, ns=(0, 0))
+    os.utime(links, ns=(0, 0))
+
+    # touching a source without changing its content should not rebuild it
+    os.utime(namespaces / "ref" / "hu08" / "hu08.csv")
+    with open(namespaces / "iow" / "links__0.xml", "a") as f:
+        f.write("\n")
+
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+    assert hu08.stat().st_mtime_ns == 0
+    assert links.stat().st_mtime_ns != 0
+
+    index = (output_dir / "sitemap.xml").read_text()
+    assert "https://geoconnex.us/sitemap/ref/hu08.xml" in index
+
+
+def test_full_rebuild_and_metadata_changes_regenerate(tmp_path, namespaces):
+    handler = FileSystemHandler()
+    output_dir = tmp_path / "output"
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+
+    def hu08_status(metrics):
+        (result,) = [r for r in metrics.sources if r.source_path.stem == "hu08"]
+        return result.status
+
+    # sources are regenerated, but identical output is left untouched
+    hu08 = output_dir / "ref" / "hu08.xml"
+    os.utime(hu08, ns=(0, 0))
+    metrics = handler.generate(
+        namespaces, "https://geoconnex.us", output_dir, full=True
+    )
+    assert hu08_status(metrics) == "written"
+    assert metrics.files_changed == 0
+    assert hu08.stat().st_mtime_ns == 0
+
+    (namespaces / "ref" / "hu08" / "metadata.json").write_text(
+        json.dumps({"contact_email": "changed"})
+    )
+    metrics = handler.generate(namespaces, "https://geoconnex.us", output_dir)
+    assert hu08_status(metrics) == "written"
+
+    # a deleted output forces the source to be rebuilt
+    hu08.unlink()
+    handler.generate(namespaces, "https://geoconnex.us", output_dir)
+    assert hu08.exists()
@@ -0,0 +1,99 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+import json
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from sitemap_generator.handler import run
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.metrics import RunMetrics, SourceResult
+
+
+def test_run_writes_json_and_prometheus_metrics(tmp_path: Path):
+    namespaces = Path(__file__).parent / "data" / "namespaces"
+    metrics_file = tmp_path / "metrics.json"
+    prometheus_file = tmp_path / "sitemap.prom"
+    args = [
+        str(namespaces),
+        "--sitemap-output-dir",
+        str(tmp_path / "output"),
+        "--metrics-file",
+        str(metrics_file),
+        "--prometheus-textfile",
+        str(prometheus_file),
+    ]
+
+    result = CliRunner().invoke(run, args)
+    assert result.exit_code == 0, result.output
+
+    metrics = json.loads(metrics_file.read_text())
+    sources = {source["source"]: source for source in metrics["sources"]}
+    hu08 = sources["ref/hu08/hu08.csv"]
+    assert hu08["status"] == "written"
+    assert hu08["file_type"] == "one_to_one_csv"
+    assert hu08["url_count"] == 2399
+    assert hu08["bytes"] == (tmp_path / "output" / "ref" / "hu08.xml").stat().st_size
+    assert sources["dummy_redirect_no_crawl/test.csv"]["skip_reason"] == (
+        "skip_crawling"
+    )
+    assert metrics["sources_written"] == 3
+
+    prometheus = prometheus_file.read_text()
+    assert (
+        'sitemap_generator_source_urls{source="ref/hu08/hu08.csv",'
+        'file_type="one_to_one_csv"} 2399'
+    ) in prometheus
+    assert 'sitemap_generator_run_duration_seconds{stage="scan"}' in prometheus
+
+    # unchanged sources still report their url counts and sizes
+    result = CliRunner().invoke(run, args)
+    assert result.exit_code == 0, result.output
+    metrics = json.loads(metrics_file.read_text())
+    hu08 = next(s for s in metrics["sources"] if s["source"] == "ref/hu08/hu08.csv")
+    assert hu08["skip_reason"] == "unchanged"
+    assert hu08["url_count"] == 2399
+    assert hu08["bytes"] > 0
+
+
+def test_generate_returns_per_stage_timings(tmp_path: Path):
+    namespaces = Path(__file__).parent / "data" / "namespaces"
+    metrics = FileSystemHandler().generate(namespaces, "https://geoconnex.us", tmp_path)
+    assert metrics.total_seconds >= metrics.scan_seconds + metrics.index_seconds
+    hu08 = next(r for r in metrics.sources if r.source_path.name == "hu08.csv")
+    assert hu08.parse_seconds > 0
+    assert hu08.write_seconds > 0
+
+
+def test_prometheus_label_values_are_escaped(tmp_path: Path):
+    metrics = RunMetrics(
+        tmp_path, sources=[SourceResult(tmp_path / 'we"ird\\name.csv', url_count=1)]
+    )
+    assert 'source="we\\"ird\\\\name.csv"' in metrics.to_prometheus()
@@ -0,0 +1,121 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import json
+
+from click.testing import CliRunner
+
+from sitemap_generator import cli
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.plan.planner import count_lines, plan_run
+
+
+def test_count_lines(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes(b"")
+    assert count_lines(path) == 0
+    path.write_bytes(b"id\na\nb\n")
+    assert count_lines(path, block_size=2) == 3
+    path.write_bytes(b"id\na\nb")
+    assert count_lines(path, block_size=2) == 3
+
+
+def test_plan_predicts_run(tmp_path, namespaces):
+    output = tmp_path / "sitemaps"
+    handler = FileSystemHandler()
+
+    plan = plan_run(handler, namespaces, output)
+    metrics = handler.generate(namespaces, "https://geoconnex.us", output)
+    assert plan.urls == metrics.url_count
+    assert plan.sitemaps == sum(len(result.outputs) for result in metrics.sources)
+    assert abs(plan.bytes - metrics.bytes_written) < 0.02 * metrics.bytes_written
+    assert plan.count("new") == 3
+    assert plan.files_changed == plan.sitemaps + 1
+
+    plan = plan_run(handler, namespaces, output)
+    assert plan.count("new") == plan.count("changed") == 0
+    assert plan.files_changed == 0
+    assert plan.urls == metrics.url_count
+    assert plan.bytes == metrics.bytes_written
+
+    hu08 = namespaces / "ref" / "hu08" / "hu08.csv"
+    hu08.write_text(hu08.read_text() + hu08.read_text().splitlines()[1] + "\n")
+    (namespaces / "iow" / "links__0.xml").unlink()
+    plan = plan_run(handler, namespaces, output)
+    assert [s.source for s in plan.sources if s.status == "changed"] == [
+        "ref/hu08/hu08.csv"
+    ]
+    assert plan.removed_sources == ["iow/links__0.xml"]
+    assert plan.files_changed == 2
+    assert plan.removed_sitemaps == 1
+
+    plan = plan_run(FileSystemHandler(compress=True), namespaces, output)
+    assert plan.settings_changed
+    assert plan.count("unchanged") == 0
+
+
+def test_plan_command_warns_about_limits(tmp_path, namespaces):
+    plan = plan_run(
+        FileSystemHandler(max_urls_per_sitemap=1000), namespaces, tmp_path / "out"
+    )
+    hu08 = next(s for s in plan.sources if s.source == "ref/hu08/hu08.csv")
+    assert hu08.over_limit
+    assert hu08.sitemaps == 3
+    assert len(plan.warnings) == 1
+
+    result = CliRunner().invoke(
+        cli, ["plan", str(namespaces), "-o", str(tmp_path / "out"), "--json"]
+    )
+    assert result.exit_code == 0
+    report = json.loads(result.stdout)
+    assert report["sources_new"] == 3
+    assert report["sources_skipped"] == 1
+    assert report["warnings"] == []
+
+
+def test_plan_command_can_fail_on_warnings(tmp_path, namespaces):
+    metadata = namespaces / "bulk" / "big_dataset" / "metadata.json"
+    metadata.write_text(json.dumps({"bulk_dump": "missing.ndjson"}))
+    args = ["plan", str(namespaces), "-o", str(tmp_path / "out")]
+
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0
+    assert "warning: Can't estimate bulk/big_dataset" in result.stderr
+
+    result = CliRunner().invoke(cli, [*args, "--fail-on-warning"])
+    assert result.exit_code == 1
+
+    result = CliRunner().invoke(cli, [*args, "--json", "--fail-on-warning"])
+    assert result.exit_code == 1
+    assert len(json.loads(result.stdout)["warnings"]) == 1
+
+    metadata.unlink()
+    result = CliRunner().invoke(cli, [*args, "--fail-on-warning"])
+    assert result.exit_code == 0
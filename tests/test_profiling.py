@@ -0,0 +1,158 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import json
+import pstats
+import signal
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from sitemap_generator import cli
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.profiling import (
+    COLLAPSED_FILENAME,
+    PSTATS_FILENAME,
+    SPANS_FILENAME,
+    Profiler,
+)
+
+
+def busy(seconds: float) -> list[bytes]:
+    held = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        held.append(bytes(1024))
+    return held
+
+
+def test_spans_only_time_stages(tmp_path):
+    profiler = Profiler("spans")
+    with profiler:
+        for _ in range(2):
+            with profiler.span("generate"), profiler.span("one_to_one_csv"):
+                busy(0.01)
+
+    assert list(profiler.spans) == ["generate;one_to_one_csv", "generate"]
+    stats = profiler.spans["generate;one_to_one_csv"]
+    assert stats.calls == 2
+    assert stats.seconds >= 0.02
+    assert stats.peak_memory_bytes is None
+    assert profiler.write(tmp_path) == [tmp_path / SPANS_FILENAME]
+
+
+def test_full_profile(tmp_path):
+    profiler = Profiler("full", interval=0.001)
+    with profiler:
+        with profiler.span("scan"):
+            busy(0.02)
+        with profiler.span("generate"):
+            with profiler.span("csv"):
+                held = busy(0.05)
+            del held
+
+    # the memory held by a nested span counts towards its parent too
+    csv = profiler.spans["generate;csv"].peak_memory_bytes
+    assert csv and csv > 100_000
+    assert (profiler.spans["generate"].peak_memory_bytes or 0) >= csv
+
+    profiler.write(tmp_path)
+    stats = pstats.Stats(str(tmp_path / PSTATS_FILENAME))
+    assert any(name == "busy" for _, _, name in stats.stats)
+    lines = (tmp_path / COLLAPSED_FILENAME).read_text().splitlines()
+    assert lines
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines)
+    assert any(line.startswith("generate;csv;") for line in lines)
+
+
+@pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="no interval timers")
+def test_full_profile_restores_the_alarm(tmp_path):
+    alarms = []
+
+    def on_alarm(signum, frame):
+        alarms.append(signum)
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, 60)
+        with Profiler("full", interval=0.001):
+            busy(0.01)
+        assert signal.getsignal(signal.SIGALRM) is on_alarm
+        assert 50 < signal.getitimer(signal.ITIMER_REAL)[0] < 60
+
+        # an alarm that falls due while sampling goes off afterwards
+        signal.setitimer(signal.ITIMER_REAL, 0.01)
+        with Profiler("full", interval=0.001):
+            busy(0.02)
+        busy(0.01)
+        assert alarms == [signal.SIGALRM]
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def test_run_writes_profile(tmp_path, namespaces):
+    profile_dir = tmp_path / "profile"
+    result = CliRunner().invoke(
+        cli,
+        [
+            "run",
+            str(namespaces),
+            "-o",
+            str(tmp_path / "out"),
+            "--profile",
+            "spans",
+            "--profile-dir",
+            str(profile_dir),
+            "--gzip",
+            "--lastmod-store",
+            str(tmp_path / "lastmod.sqlite"),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    spans = json.loads((profile_dir / SPANS_FILENAME).read_text())["spans"]
+    names = [span["name"] for span in spans]
+    for stage in ("scan", "select", "generate", "index", "publish"):
+        assert stage in names
+    assert "generate;one_to_one_csv" in names
+    for stage in ("read", "resolve", "write", "compress"):
+        assert f"generate;one_to_one_csv;{stage}" in names
+    assert "generate;pregenerated_xml;compress" in names
+    assert "generate;commit" in names
+    assert "index;commit" in names
+
+
+def test_split_csv_is_scanned_in_a_span(tmp_path, namespaces):
+    profiler = Profiler("spans")
+    handler = FileSystemHandler(csv_range_size=100_000, profiler=profiler)
+    with profiler:
+        handler.generate(namespaces, "https://geoconnex.us", tmp_path / "out")
+    assert "generate;scan" in profiler.spans
@@ -0,0 +1,172 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from sitemap_generator import cli
+from sitemap_generator.resolve.resolver import (
+    WILDCARD,
+    PidResolver,
+    RegexRule,
+    RuleBucket,
+    literal_prefix,
+)
+
+
+def test_literal_prefix():
+    assert (
+        literal_prefix(r"https://geoconnex\.us/ref/(.*)") == "https://geoconnex.us/ref/"
+    )
+    assert literal_prefix(r"^https://g\.us/a/b?") == "https://g.us/a/"
+    assert literal_prefix("https://g.us/(.*)") == f"https://g{WILDCARD}us/"
+    assert literal_prefix(r"https://x/\d+") == "https://x/"
+    assert literal_prefix("https://x/a+") == "https://x/a"
+    assert literal_prefix("https://x/a.*") == "https://x/a"
+    assert literal_prefix("a|b") == ""
+
+
+def test_combined_bucket_keeps_rule_order_and_groups():
+    rules = [
+        RegexRule(r"https://g/(x)/(\d+)$", "https://a/$2/$1", "one.csv"),
+        RegexRule(r"https://g/(\w)/(\w+)$", "https://b/$1-$2", "two.csv"),
+        RegexRule(r"https://g/.*", "https://c", "three.csv"),
+    ]
+    bucket = RuleBucket(rules)
+    assert bucket.combined is not None
+    assert bucket.resolve("https://g/x/42") == ("https://a/42/x", rules[0])
+    assert bucket.resolve("https://g/y/abc") == ("https://b/y-abc", rules[1])
+    assert bucket.resolve("https://g/y/a/b") == ("https://c", rules[2])
+    assert bucket.resolve("https://h/") is None
+
+    # backreferences can't be renumbered, so each rule is matched on its own
+    rules.insert(0, RegexRule(r"https://g/(a)\1/(.*)", "https://d/$2", "four.csv"))
+    bucket = RuleBucket(rules)
+    assert bucket.combined is None
+    assert bucket.resolve("https://g/aa/z")[0] == "https://d/z"
+    assert bucket.resolve("https://g/x/42")[0] == "https://a/42/x"
+
+
+def test_exact_pids_and_first_declared_rule_win():
+    resolver = PidResolver(
+        exact={"https://g/ref/1": "https://exact/1"},
+        rules=[
+            RegexRule(r"https://g/ref/a(.*)", "https://ref-a/$1", "a.csv"),
+            RegexRule(r"https://g/(.*)", "https://generic/$1", "b.csv"),
+            RegexRule(r"https://g/ref/(.*)", "https://ref/$1", "c.csv"),
+            RegexRule(r"https://g.us/(.*)", "https://dotted/$1", "d.csv"),
+        ],
+    )
+    assert list(
+        resolver.resolve_many(
+            [
+                "https://g/ref/1",
+                "https://g/ref/a2",
+                "https://g/ref/2",
+                "https://g/x",
+                "https://g.us/x",
+                "z",
+            ]
+        )
+    ) == [
+        ("https://g/ref/1", "https://exact/1"),
+        ("https://g/ref/a2", "https://ref-a/2"),
+        # the generic rule is declared before the longer prefix
+        ("https://g/ref/2", "https://generic/ref/2"),
+        ("https://g/x", "https://generic/x"),
+        ("https://g.us/x", "https://dotted/x"),
+        ("z", None),
+    ]
+    assert resolver.match("https://g/ref/2")[1] is resolver.rules[1]
+
+
+def test_substitution_of_more_than_nine_groups():
+    pattern = "https://g/" + "/".join(["(\\w)"] * 11)
+    resolver = PidResolver(rules=[RegexRule(pattern, "https://t/$11-$10-$1", "a")])
+    pid = "https://g/" + "/".join("abcdefghijk")
+    assert resolver.resolve(pid) == "https://t/k-j-a"
+
+
+def test_index_is_plain_json(tmp_path):
+    index_path = tmp_path / "resolver.json"
+    resolver = PidResolver(
+        exact={"https://g/1": "https://t/1"},
+        rules=[RegexRule(r"https://g/(.*)", "https://r/$1", "a.csv")],
+        fingerprint=[("a.csv", 10, 20)],
+    )
+    resolver.save(index_path)
+    assert json.loads(index_path.read_text())["exact"] == resolver.exact
+
+    loaded = PidResolver.load(index_path)
+    assert loaded.exact == resolver.exact
+    assert loaded.rules == resolver.rules
+    assert loaded.fingerprint == resolver.fingerprint
+
+    index_path.write_bytes(b"\x80\x05not json")
+    with pytest.raises(ValueError):
+        PidResolver.load(index_path)
+
+
+def test_index_is_reused_until_a_csv_changes(tmp_path, namespaces):
+    index_path = tmp_path / "resolver.json"
+
+    resolver = PidResolver.load_or_build(namespaces, index_path)
+    assert resolver.resolve("https://geoconnex.us/ref/hu08/03030003") == (
+        "https://reference.geoconnex.us/collections/hu08/items/03030003"
+    )
+    assert resolver.resolve("https://geoconnex.us//usgs/gnis/123_4x") == (
+        "https://edits.nationalmap.gov/apps/gaz-domestic/public/summary/123_4"
+    )
+    os.utime(index_path, ns=(0, 0))
+
+    PidResolver.load_or_build(namespaces, index_path)
+    assert index_path.stat().st_mtime_ns == 0
+
+    with open(namespaces / "ref" / "hu08" / "hu08.csv", "a") as f:
+        f.write('"https://geoconnex.us/ref/hu08/new","https://example.com/new"\n')
+    resolver = PidResolver.load_or_build(namespaces, index_path)
+    assert index_path.stat().st_mtime_ns != 0
+    assert (
+        resolver.resolve("https://geoconnex.us/ref/hu08/new")
+        == "https://example.com/new"
+    )
+
+
+def test_resolve_command(namespaces):
+    result = CliRunner().invoke(
+        cli,
+        ["resolve", str(namespaces), "--unresolved-only", "-i", "-"],
+        input="https://geoconnex.us/ref/hu08/03030003\nhttps://nowhere/1\n",
+    )
+    assert result.exit_code == 1
+    assert result.stdout == "https://nowhere/1\t\n"
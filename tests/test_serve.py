@@ -0,0 +1,247 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree as ET
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.serve.cache import LRUByteCache
+from sitemap_generator.serve.server import SitemapServer, is_not_modified
+
+NS = {"s": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+
+
+def decode_chunked(body: bytes) -> bytes:
+    decoded = b""
+    while True:
+        size, _, body = body.partition(b"\r\n")
+        size = int(size, 16)
+        if size == 0:
+            return decoded
+        decoded += body[:size]
+        body = body[size + 2 :]
+
+
+def exchange(server: SitemapServer, *requests: bytes) -> list[bytes]:
+    """Send each raw request to a running server and read the raw response"""
+
+    async def main():
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        responses = []
+        for request in requests:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            responses.append(await reader.read())
+            writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return responses
+
+    return asyncio.run(main())
+
+
+def fetch(
+    server: SitemapServer, *requests: tuple[str, dict], version: str = "HTTP/1.1"
+) -> list:
+    """Send each request to a running server and parse the responses"""
+    raw_requests = []
+    for target, headers in requests:
+        head = f"GET {target} {version}\r\nHost: localhost\r\n"
+        head += "".join(f"{key}: {value}\r\n" for key, value in headers.items())
+        raw_requests.append((head + "\r\n").encode())
+
+    responses = []
+    for raw in exchange(server, *raw_requests):
+        head, _, body = raw.partition(b"\r\n\r\n")
+        status_line, *lines = head.decode().split("\r\n")
+        response_headers = dict(line.split(": ", 1) for line in lines)
+        if response_headers.get("Transfer-Encoding") == "chunked":
+            body = decode_chunked(body)
+        responses.append((int(status_line.split()[1]), response_headers, body))
+    return responses
+
+
+def test_lru_byte_cache_evicts_least_recently_used():
+    cache = LRUByteCache(max_bytes=10, max_entry_bytes=6)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert not cache.put("d", b"d" * 7)
+    assert cache.size == 8
+
+
+def test_lru_byte_cache_is_shared_between_threads():
+    cache = LRUByteCache(max_bytes=1000, max_entry_bytes=100)
+
+    def churn(thread: int) -> None:
+        for i in range(2000):
+            cache.put((thread, i % 50), bytes(i % 100))
+            cache.get((thread - 1, i % 50))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(churn, range(8)))
+    assert cache.size == sum(map(len, cache._entries.values())) <= 1000
+
+
+def test_is_not_modified():
+    last_modified = 1_700_000_000.5
+    assert is_not_modified({"if-none-match": 'W/"x", "abc"'}, '"abc"', 0)
+    assert not is_not_modified({"if-none-match": '"x"'}, '"abc"', 0)
+    since = {"if-modified-since": "Tue, 14 Nov 2023 22:13:20 GMT"}
+    assert is_not_modified(since, '"abc"', last_modified)
+    assert not is_not_modified(since, '"abc"', last_modified + 1)
+    # If-None-Match wins over If-Modified-Since
+    assert not is_not_modified({**since, "if-none-match": '"x"'}, '"abc"', 0)
+
+
+def test_served_sitemaps_match_generated_files(tmp_path, namespaces):
+    output_dir = tmp_path / "output"
+    FileSystemHandler().generate(namespaces, "https://geoconnex.us", output_dir)
+    server = SitemapServer(namespaces, "https://geoconnex.us")
+
+    (index, hu08, links, missing, again) = fetch(
+        server,
+        ("/sitemap.xml", {}),
+        ("/sitemap/ref/hu08.xml", {}),
+        ("/sitemap/iow/links__0.xml", {}),
+        ("/sitemap/nope.xml", {}),
+        ("/sitemap/ref/hu08.xml", {}),
+    )
+    assert index[0] == 200
+    assert index[2] == (output_dir / "sitemap.xml").read_bytes()
+    assert hu08[0] == 200 and hu08[1]["Transfer-Encoding"] == "chunked"
+    assert hu08[2] == (output_dir / "ref" / "hu08.xml").read_bytes()
+    assert links[2] == (output_dir / "iow" / "links__0.xml").read_bytes()
+    assert missing[0] == 404
+
+    # the second request is answered from the cache
+    assert again[2] == hu08[2] and "Transfer-Encoding" not in again[1]
+    assert again[1]["ETag"] == hu08[1]["ETag"]
+
+    (not_modified, since) = fetch(
+        server,
+        ("/sitemap/ref/hu08.xml", {"If-None-Match": hu08[1]["ETag"]}),
+        ("/sitemap.xml", {"If-Modified-Since": index[1]["Last-Modified"]}),
+    )
+    assert not_modified[0] == 304 and not_modified[2] == b""
+    assert since[0] == 304
+
+
+def test_large_sources_are_split_into_pages(namespaces):
+    server = SitemapServer(namespaces, "https://geoconnex.us", 1000)
+
+    (index, first, second, past_end, bad) = fetch(
+        server,
+        ("/sitemap.xml", {}),
+        ("/sitemap/ref/hu08.xml?page=0", {}),
+        ("/sitemap/ref/hu08.xml?page=1", {}),
+        ("/sitemap/ref/hu08.xml?page=100", {}),
+        ("/sitemap/ref/hu08.xml?page=x", {}),
+    )
+    locs = [loc.text for loc in ET.fromstring(index[2]).findall(".//s:loc", NS)]
+    assert "https://geoconnex.us/sitemap/ref/hu08.xml?page=1" in locs
+
+    first_urls = ET.fromstring(first[2]).findall("s:url", NS)
+    second_urls = ET.fromstring(second[2]).findall("s:url", NS)
+    assert len(first_urls) == 1000
+    assert 0 < len(second_urls) <= 1000
+    assert first_urls[0][0].text != second_urls[0][0].text
+    assert first[1]["ETag"] != second[1]["ETag"]
+    assert past_end[0] == 404
+    assert bad[0] == 400
+
+
+def test_rewritten_bulk_dump_is_rendered_again(tmp_path):
+    namespaces = tmp_path / "namespaces"
+    directory = namespaces / "bulk" / "gnis"
+    directory.mkdir(parents=True)
+    (directory / "metadata.json").write_text(json.dumps({"bulk_dump": "gnis.ndjson"}))
+    (directory / "gnis.csv").write_text(
+        "id,target\nhttps://geoconnex.us/usgs/gnis/([0-9]+),https://example.com/$1\n"
+    )
+    dump = directory / "gnis.ndjson"
+    pids = [json.dumps({"id": f"https://geoconnex.us/usgs/gnis/{i}"}) for i in range(9)]
+    dump.write_text("\n".join(pids[:5]))
+    server = SitemapServer(namespaces, "https://geoconnex.us", 3)
+
+    (index, page) = fetch(server, ("/sitemap.xml", {}), ("/sitemap/bulk/gnis.xml", {}))
+    assert len(ET.fromstring(index[2]).findall("s:sitemap", NS)) == 2
+
+    # only the dump changes; the csv the source was found by is untouched
+    dump.write_text("\n".join(pids))
+    os.utime(dump, ns=(0, dump.stat().st_mtime_ns + 10**9))
+    (new_index, new_page, conditional) = fetch(
+        server,
+        ("/sitemap.xml", {"If-None-Match": index[1]["ETag"]}),
+        ("/sitemap/bulk/gnis.xml", {}),
+        ("/sitemap/bulk/gnis.xml", {"If-None-Match": page[1]["ETag"]}),
+    )
+    assert new_index[0] == 200
+    assert len(ET.fromstring(new_index[2]).findall("s:sitemap", NS)) == 3
+    assert new_page[1]["ETag"] != page[1]["ETag"]
+    assert new_page[2] == page[2]
+    assert conditional[0] == 200
+
+
+def test_http_1_0_clients_get_an_unchunked_body(tmp_path, namespaces):
+    output_dir = tmp_path / "output"
+    FileSystemHandler().generate(namespaces, "https://geoconnex.us", output_dir)
+    server = SitemapServer(namespaces, "https://geoconnex.us")
+
+    ((status, headers, body),) = fetch(
+        server, ("/sitemap/ref/hu08.xml", {}), version="HTTP/1.0"
+    )
+    assert status == 200
+    assert "Transfer-Encoding" not in headers
+    assert headers["Connection"] == "close"
+    assert body == (output_dir / "ref" / "hu08.xml").read_bytes()
+
+
+def test_failed_render_cuts_the_response_short(namespaces):
+    server = SitemapServer(namespaces, "https://geoconnex.us")
+
+    def failing_sitemap(name, page):
+        yield b"<?xml"
+        raise OSError("disk went away")
+
+    server.catalog.iter_sitemap = failing_sitemap  # type: ignore[method-assign]
+    (raw,) = exchange(
+        server, b"GET /sitemap/ref/hu08.xml HTTP/1.1\r\nHost: localhost\r\n\r\n"
+    )
+    head, _, body = raw.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 ")
+    # no second status line and no final zero-length chunk
+    assert body == b"5\r\n<?xml\r\n"
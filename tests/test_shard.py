@@ -0,0 +1,199 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from sitemap_generator import cli
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.manifest import MANIFEST_FILENAME
+from sitemap_generator.sharding import (
+    Shard,
+    assign_shards,
+    make_index_fragment,
+    merge_index_fragments,
+)
+from sitemap_generator.util import get_all_sitemap_sources
+
+
+def published(output: Path) -> dict[str, bytes]:
+    return {
+        path.relative_to(output).as_posix(): path.read_bytes()
+        for path in output.rglob("*")
+        if path.is_file()
+        and not path.name.startswith(MANIFEST_FILENAME.removesuffix(".json"))
+        and not path.name.startswith("sitemap-index-")
+    }
+
+
+def test_parse_shard():
+    assert Shard.parse("1/4") == Shard(0, 4)
+    assert str(Shard.parse("4/4")) == "4/4"
+    assert Shard(2, 3).fragment_name == "sitemap-index-3-of-3.json"
+    for text in ("0/4", "5/4", "1", "a/b", "1/0"):
+        with pytest.raises(ValueError):
+            Shard.parse(text)
+
+
+def test_assignment_is_stable_and_balanced(tmp_path):
+    root = tmp_path / "namespaces"
+    for i, size in enumerate([900, 500, 400, 300, 200, 100, 100]):
+        directory = root / f"ns{i}"
+        directory.mkdir(parents=True)
+        (directory / "metadata.json").write_text("{}")
+        (directory / "a.csv").write_text("id,target\n" + "x" * size)
+    sources = get_all_sitemap_sources(root)
+
+    assignment = assign_shards(sources, root, 2)
+    assert assignment == assign_shards(list(sources), root, 2)
+    loads = [0, 0]
+    for source, shard in zip(sources, assignment):
+        loads[shard] += source.path.stat().st_size
+    assert abs(loads[0] - loads[1]) <= 200
+    assert assign_shards(sources, root, 1) == [0] * len(sources)
+
+
+def test_sharded_build_matches_single_build(tmp_path, namespaces):
+    single = tmp_path / "single"
+    sharded = tmp_path / "sharded"
+    FileSystemHandler(max_urls_per_sitemap=50).generate(
+        namespaces, "https://geoconnex.us", single
+    )
+
+    for shard in ("1/3", "2/3", "3/3"):
+        FileSystemHandler(max_urls_per_sitemap=50, shard=Shard.parse(shard)).generate(
+            namespaces, "https://geoconnex.us", sharded
+        )
+    fragments = sorted(sharded.glob("sitemap-index-*-of-3.json"))
+    assert len(fragments) == 3
+    assert not (sharded / "sitemap.xml").exists()
+
+    result = CliRunner().invoke(
+        cli, ["merge-index", *map(str, fragments), "-o", str(sharded)]
+    )
+    assert result.exit_code == 0, result.output
+    assert published(sharded) == published(single)
+
+    # rerunning one shard in the shared directory leaves the others, and
+    # what they have staged, alone
+    in_flight = sharded / Shard(1, 3).staging_name / "ref" / "hu08.xml"
+    in_flight.parent.mkdir(parents=True)
+    in_flight.write_text("")
+    FileSystemHandler(max_urls_per_sitemap=50, shard=Shard(0, 3)).generate(
+        namespaces, "https://geoconnex.us", sharded
+    )
+    assert in_flight.exists()
+    shutil.rmtree(in_flight.parent.parent)
+    assert published(sharded) == published(single)
+    assert len(list(sharded.glob("sitemap-index-*-of-3.json"))) == 3
+
+    # merge-index combined the shard manifests, so an unsharded run in the
+    # same directory finds every source unchanged
+    metrics = FileSystemHandler(max_urls_per_sitemap=50).generate(
+        namespaces, "https://geoconnex.us", sharded
+    )
+    assert {result.skip_reason for result in metrics.sources} <= {
+        "unchanged",
+        "skip_crawling",
+    }
+    assert published(sharded) == published(single)
+    assert not list(sharded.glob("sitemap-index-*-of-3.json"))
+
+
+def test_merge_index_to_s3(tmp_path, monkeypatch, namespaces):
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    sharded = tmp_path / "sharded"
+    for i in range(2):
+        FileSystemHandler(shard=Shard(i, 2)).generate(
+            namespaces, "https://geoconnex.us", sharded
+        )
+    fragments = sorted(sharded.glob("sitemap-index-*-of-2.json"))
+    local = tmp_path / "local"
+    result = CliRunner().invoke(
+        cli, ["merge-index", *map(str, fragments), "-o", str(local)]
+    )
+    assert result.exit_code == 0, result.output
+
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="sitemaps")
+        result = CliRunner().invoke(
+            cli,
+            [
+                "merge-index",
+                *map(str, fragments),
+                "-o",
+                "s3://sitemaps/prod",
+                "--work-dir",
+                str(tmp_path / "work"),
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        index = client.get_object(Bucket="sitemaps", Key="prod/sitemap.xml")
+        assert index["Body"].read() == (local / "sitemap.xml").read_bytes()
+
+    assert not (tmp_path / "work" / ".staging").exists()
+
+
+def test_run_rejects_bad_shard(tmp_path, namespaces):
+    result = CliRunner().invoke(
+        cli, ["run", str(namespaces), "-o", str(tmp_path / "out"), "--shard", "3/2"]
+    )
+    assert result.exit_code == 2
+    assert "out of range" in result.output
+
+
+def test_merge_rejects_incomplete_or_mixed_fragments(namespaces):
+    sources = get_all_sitemap_sources(namespaces)
+    settings = FileSystemHandler().manifest_settings
+    first, second = (
+        make_index_fragment(
+            Shard(i, 2), sources, namespaces, {}, "https://geoconnex.us", settings
+        )
+        for i in range(2)
+    )
+
+    with pytest.raises(ValueError, match="missing"):
+        merge_index_fragments([first])
+    with pytest.raises(ValueError, match="repeated"):
+        merge_index_fragments([first, first])
+    with pytest.raises(ValueError, match="uri_base"):
+        merge_index_fragments([first, {**second, "uri_base": "https://example.com"}])
+    assert merge_index_fragments([second, first])[0] == []
+
+
+def test_shard_rejects_delta():
+    with pytest.raises(ValueError):
+        FileSystemHandler(delta=True, shard=Shard(0, 2))
@@ -0,0 +1,143 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import hashlib
+import time
+
+import pytest
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.manifest import MANIFEST_FILENAME
+from sitemap_generator.sink import LocalSink, OutputSink, S3Sink
+from sitemap_generator.sink.s3 import file_digests, parse_s3_url
+from sitemap_generator.staging import STAGING_DIR
+
+
+def test_parse_s3_url():
+    assert parse_s3_url("s3://bucket/sitemaps/prod/") == ("bucket", "sitemaps/prod")
+    assert parse_s3_url("s3://bucket") == ("bucket", "")
+    with pytest.raises(ValueError):
+        parse_s3_url("/tmp/sitemaps")
+
+
+def test_file_digests_match_s3_etags(tmp_path):
+    path = tmp_path / "a.xml"
+    path.write_bytes(b"x" * 250)
+
+    etag, sha256 = file_digests(path, part_size=1000)
+    assert etag == hashlib.md5(b"x" * 250).hexdigest()
+    assert sha256 == hashlib.sha256(b"x" * 250).hexdigest()
+
+    # multipart ETags are the md5 of the part md5s and the number of parts
+    parts = [b"x" * 100, b"x" * 100, b"x" * 50]
+    etag, _ = file_digests(path, part_size=100)
+    joined = b"".join(hashlib.md5(part).digest() for part in parts)
+    assert etag == f"{hashlib.md5(joined).hexdigest()}-3"
+
+
+def test_sinks_must_implement_publishing(tmp_path):
+    class PartialSink(OutputSink):
+        def commit(self, staged, name):
+            return True
+
+    with pytest.raises(TypeError):
+        PartialSink()
+    assert not LocalSink(tmp_path).exists("sitemap.xml")
+
+
+def test_local_sink_keeps_state_out_of_the_published_tree(tmp_path, namespaces):
+    work_dir, published = tmp_path / "work", tmp_path / "published"
+    handler = FileSystemHandler(sink=LocalSink(published))
+
+    metrics = handler.generate(namespaces, "https://geoconnex.us", work_dir)
+    assert (published / "sitemap.xml").exists()
+    assert (published / "ref" / "hu08.xml").exists()
+    assert not (published / MANIFEST_FILENAME).exists()
+    assert not (work_dir / "sitemap.xml").exists()
+
+    metrics = handler.generate(namespaces, "https://geoconnex.us", work_dir, full=True)
+    assert metrics.files_changed == 0
+
+
+def test_workers_only_stage_the_sources_in_flight(tmp_path):
+    namespaces = tmp_path / "namespaces"
+    for i in range(12):
+        source = namespaces / f"ns{i}" / "ids.csv"
+        source.parent.mkdir(parents=True)
+        (source.parent / "metadata.json").write_text("{}")
+        source.write_text(
+            "id,target\n"
+            + "".join(
+                f"https://geoconnex.us/{i}/{j},https://example.com\n" for j in range(10)
+            )
+        )
+    work_dir = tmp_path / "work"
+    staged_counts = []
+
+    class SlowSink(LocalSink):
+        def commit(self, staged, name):
+            staged_counts.append(len(list((work_dir / STAGING_DIR).rglob("*.xml"))))
+            time.sleep(0.05)
+            return super().commit(staged, name)
+
+    handler = FileSystemHandler(sink=SlowSink(tmp_path / "published"))
+    handler.generate(namespaces, "https://geoconnex.us", work_dir, workers=2)
+    # the one being committed and at most one per worker
+    assert staged_counts and max(staged_counts) <= 3
+
+
+def test_s3_sink_skips_unchanged_objects(tmp_path, namespaces):
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="sitemaps")
+        handler = FileSystemHandler(
+            sink=S3Sink.from_url("s3://sitemaps/prod", client=client)
+        )
+
+        handler.generate(namespaces, "https://geoconnex.us", tmp_path / "work")
+        keys = {
+            obj["Key"] for obj in client.list_objects_v2(Bucket="sitemaps")["Contents"]
+        }
+        assert {"prod/sitemap.xml", "prod/ref/hu08.xml"} <= keys
+
+        metrics = handler.generate(
+            namespaces, "https://geoconnex.us", tmp_path / "work", full=True
+        )
+        assert metrics.files_changed == 0
+
+        (namespaces / "ref" / "hu08" / "hu08.csv").unlink()
+        metrics = handler.generate(
+            namespaces, "https://geoconnex.us", tmp_path / "work"
+        )
+        assert metrics.files_removed == 1
+        objects = client.list_objects_v2(Bucket="sitemaps", Prefix="prod/ref/")
+        assert "Contents" not in objects
@@ -0,0 +1,56 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import random
+
+import pytest
+
+from sitemap_generator.sorting import external_sort, read_pairs, write_pairs
+
+
+@pytest.mark.parametrize("chunk_size, fan_in", [(1_000, 128), (7, 128), (3, 2)])
+def test_external_sort(tmp_path, chunk_size, fan_in):
+    pairs = [(f"pid{i % 40}", f"2024-01-{i % 3 + 1:02}") for i in range(200)]
+    random.Random(0).shuffle(pairs)
+
+    result = list(
+        external_sort(
+            pairs, tmp_path, write_pairs, read_pairs, chunk_size, fan_in=fan_in
+        )
+    )
+    assert result == sorted(set(pairs))
+    # spilled runs are removed once the sort is exhausted
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_external_sort_orders_by_code_point(tmp_path):
+    pairs = [("é", ""), ("z", ""), ("a", ""), ("日本", "")]
+    result = external_sort(pairs, tmp_path, write_pairs, read_pairs, chunk_size=1)
+    assert [pid for pid, _ in result] == ["a", "z", "é", "日本"]
@@ -0,0 +1,80 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import os
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.staging import STAGING_DIR, commit_file
+
+
+def test_commit_file_skips_identical_content(tmp_path):
+    final = tmp_path / "out" / "a.xml"
+    staged = tmp_path / "a.xml"
+
+    staged.write_bytes(b"<urlset/>")
+    assert commit_file(staged, final)
+    assert not staged.exists()
+
+    os.utime(final, ns=(0, 0))
+    staged.write_bytes(b"<urlset/>")
+    assert not commit_file(staged, final)
+    assert not staged.exists()
+    assert final.stat().st_mtime_ns == 0
+
+    staged.write_bytes(b"<urlset></urlset>")
+    assert commit_file(staged, final)
+    assert final.read_bytes() == b"<urlset></urlset>"
+
+
+def test_rerun_leaves_output_untouched_and_removes_stale_sitemaps(tmp_path, namespaces):
+    handler = FileSystemHandler()
+    output_dir = tmp_path / "output"
+
+    metrics = handler.generate(namespaces, "https://geoconnex.us", output_dir)
+    assert metrics.files_changed > 0
+    assert metrics.files_removed == 0
+    assert not (output_dir / STAGING_DIR).exists()
+
+    for path in output_dir.rglob("*.xml"):
+        os.utime(path, ns=(0, 0))
+    metrics = handler.generate(
+        namespaces, "https://geoconnex.us", output_dir, full=True
+    )
+    assert metrics.files_changed == 0
+    assert metrics.files_unchanged == len(list(output_dir.rglob("*.xml")))
+    assert all(p.stat().st_mtime_ns == 0 for p in output_dir.rglob("*.xml"))
+
+    # the sitemap of a deleted source is removed and dropped from the index
+    (namespaces / "ref" / "hu08" / "hu08.csv").unlink()
+    metrics = handler.generate(namespaces, "https://geoconnex.us", output_dir)
+    assert metrics.files_removed == 1
+    assert not (output_dir / "ref" / "hu08.xml").exists()
+    assert "ref/hu08.xml" not in (output_dir / "sitemap.xml").read_text()
+    assert metrics.to_dict()["files_changed"] == 1
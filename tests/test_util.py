@@ -46,3 +46,40 @@ def test_list_sources():
     assert len(sources) == 2, (
         "There should be exactly 2 sources since there are 2 files in the namespaces with missing metadata directory"
     )
+
+
+def test_classify_csv_matches_is_regex_csv(tmp_path: Path):
+    for rows in range(9):
+        for row_length in (10, 40_000):
+            csv_path = tmp_path / f"{rows}_{row_length}.csv"
+            csv_path.write_text(
+                "id,target\n"
+                + "".join(f"{i},{'x' * row_length}\n" for i in range(rows))
+            )
+            size = csv_path.stat().st_size
+            assert util.classify_csv(csv_path, size) == util.is_regex_csv(csv_path), (
+                f"Mismatch for {rows=} {row_length=}"
+            )
+
+
+def test_list_sources_without_metadata_and_with_shared_bulk_metadata(
+    tmp_path: Path,
+):
+    (tmp_path / "no_metadata").mkdir()
+    (tmp_path / "no_metadata" / "rules.csv").write_text("id,target\na,b\n")
+
+    bulk = tmp_path / "bulk" / "dump"
+    bulk.mkdir(parents=True)
+    (bulk / "metadata.json").write_text('{"bulk_container_image": "image:latest"}')
+    (bulk / "a.csv").write_text("id,target\n")
+    (bulk / "b.csv").write_text("id,target\n")
+
+    sources = util.get_all_sitemap_sources(tmp_path)
+    assert [
+        (src.path.relative_to(tmp_path).as_posix(), src.file_type) for src in sources
+    ] == [
+        ("bulk/dump/a.csv", "bulk"),
+        ("bulk/dump/b.csv", "bulk"),
+        ("no_metadata/rules.csv", "regex_csv"),
+    ]
+    assert sources[2].metadata == {}
@@ -0,0 +1,157 @@
+# =================================================================
+#
+# Authors: Benjamin Webb <bwebb@lincolninst.edu>
+#
+# Copyright (c) 2023 Benjamin Webb
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use,
+# copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following
+# conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES
+# OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+#
+# =================================================================
+
+
+import os
+from pathlib import Path
+
+import pytest
+
+from sitemap_generator.handler.base import FileSystemHandler
+from sitemap_generator.util import get_all_sitemap_sources
+from sitemap_generator.watch.watcher import (
+    InotifyWatcher,
+    PollingWatcher,
+    Watcher,
+    affected_sources,
+    wait_for_changes,
+    watch_namespace,
+)
+
+
+def write_csv(path: Path, name: str, rows: int = 10):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    (path.parent / "metadata.json").write_text("{}")
+    lines = ["id,target"] + [
+        f"https://geoconnex.us/{name}/{i},https://example.com/{name}/{i}"
+        for i in range(rows)
+    ]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def make_namespaces(root: Path) -> Path:
+    write_csv(root / "a" / "one.csv", "one")
+    write_csv(root / "a" / "two.csv", "two")
+    write_csv(root / "b" / "nested" / "three.csv", "three")
+    return root
+
+
+class ScriptedWatcher(Watcher):
+    """Applies one edit per burst and reports the paths it touched"""
+
+    def __init__(self, root: Path, edits: list):
+        super().__init__(root)
+        self.edits = edits
+
+    def read(self, timeout: float | None = None) -> set[Path]:
+        if timeout is not None or not self.edits:
+            return set()
+        return self.edits.pop(0)()
+
+
+def test_affected_sources(tmp_path):
+    root = make_namespaces(tmp_path / "namespaces")
+    sources = get_all_sitemap_sources(root)
+
+    def affected(*changed: Path) -> list[str]:
+        return [s.path.name for s in affected_sources(changed, sources)]
+
+    assert affected(root / "a" / "two.csv") == ["two.csv"]
+    assert affected(root / "a" / "metadata.json") == ["one.csv", "two.csv"]
+    assert affected(root / "b") == ["three.csv"]
+    assert affected(root) == ["one.csv", "two.csv", "three.csv"]
+    assert affected(root / "a" / "gone.csv") == []
+
+
+def test_watchers_must_implement_read(tmp_path):
+    with pytest.raises(TypeError):
+        Watcher(tmp_path)
+
+
+def test_polling_watcher(tmp_path):
+    root = make_namespaces(tmp_path / "namespaces")
+    watcher = PollingWatcher(root, interval=0.01)
+    assert watcher.read(0) == set()
+
+    (root / "a" / "one.csv").unlink()
+    (root / "b" / "new.xml").write_text("<urlset/>")
+    (root / "b" / "notes.txt").write_text("ignored")
+    assert watcher.read(1) == {root / "a" / "one.csv", root / "b" / "new.xml"}
+    assert watcher.read(0) == set()
+
+
+def test_inotify_watcher(tmp_path):
+    root = make_namespaces(tmp_path / "namespaces")
+    try:
+        watcher = InotifyWatcher(root)
+    except OSError:
+        pytest.skip("inotify is not available")
+
+    with watcher:
+        (root / "a" / "one.csv").write_text("id,target\n")
+        (root / "c").mkdir()
+        assert wait_for_changes(watcher, debounce=0.05) >= {
+            root / "a" / "one.csv",
+            root / "c",
+        }
+        # the new directory is watched too
+        (root / "c" / "four.csv").write_text("id,target\n")
+        assert watcher.read(1) == {root / "c" / "four.csv"}
+
+
+def test_watch_rebuilds_affected_sources(tmp_path):
+    root = make_namespaces(tmp_path / "namespaces")
+    output = tmp_path / "sitemaps"
+    one = output / "a" / "one.xml"
+    three = output / "b" / "nested" / "three.xml"
+
+    def edit_with_same_size_and_mtime():
+        path = root / "a" / "one.csv"
+        stat = path.stat()
+        path.write_text(path.read_text().replace("one/9,", "one/8,"))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        return {path}
+
+    def delete_directory():
+        (root / "b" / "nested" / "three.csv").unlink()
+        return {root / "b" / "nested"}
+
+    watcher = ScriptedWatcher(root, [edit_with_same_size_and_mtime, delete_directory])
+    watch_namespace(
+        FileSystemHandler(), root, "https://geoconnex.us", output, watcher, 0, 1, 1
+    )
+    # the change can only be seen through the watcher, not the manifest
+    assert "https://geoconnex.us/one/9<" not in one.read_text()
+    assert three.exists()
+
+    watch_namespace(
+        FileSystemHandler(), root, "https://geoconnex.us", output, watcher, 0, 1, 1
+    )
+    assert not three.exists()
+    assert "three" not in (output / "sitemap.xml").read_text()